@@ -1,6 +1,6 @@
 import os
 import pymongo
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 import requests
 from sklearn.preprocessing import MinMaxScaler
 import numpy as np
@@ -10,18 +10,44 @@ from datetime import datetime
 import logging
 from flask_cors import CORS
 import time
-from typing import Optional, Dict
-
+import json
+import hmac
+import shutil
+import signal
+import threading
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from area_scoring import score_area
+from ranking import rank_sites
+from ml.registry import ModelHandle, set_current, list_versions
+from profiling import SamplingProfiler, profile_for, profile_slot, request_thread_filter
+from integrations.tracing import MongoTraceListener, TRACE_ALL, span, trace_scope
 from integrations import (
     compute_suitability_score,
-    estimate_flood_risk_score,
-    compute_proximity_score,
-    estimate_landslide_risk_score,
-    estimate_water_proximity_score,
-    estimate_pollution_score,
-    infer_landuse_score,
-    estimate_soil_quality_score,
-    estimate_rainfall_score,
+    start_air_quality_sync,
+    start_landslide_sync,
+    load_water_mask,
+    run_factor_pipeline,
+    evaluate_factor,
+    peek_factor_matrix,
+    prefetch_overpass,
+    stored_cells_in_bbox,
+    stored_factor_matrix,
+    normalize_weights,
+    FACTOR_SPECS,
+    FACTOR_WEIGHTS,
+    score_matrix,
+    FACTOR_ORDER,
+    WATER_VETO_KM,
+    deadline_scope,
+    load_cache_snapshot,
+    load_tile_snapshot,
+    configure_rate_limits,
+    configure_result_memo,
+    get_result_memo,
+    load_factor_store,
+    start_factor_store_snapshots,
 )
 
 # Set up logging
@@ -77,7 +103,7 @@ def get_mongo_connection():
     for attempt in range(max_retries):
         try:
             mongo_uri = os.getenv("GEOAI_MONGO_URI", "mongodb://localhost:27017/")
-            client = pymongo.MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+            client = pymongo.MongoClient(mongo_uri, serverSelectionTimeoutMS=5000, event_listeners=[MongoTraceListener()])
             client.server_info()  # Test connection
             db = client["GeoAI"]
             collection = db["land_data"]
@@ -107,6 +133,29 @@ def get_mongo_connection():
 
 client, db, collection = get_mongo_connection()
 
+# Outbound API budgets shared by all worker processes (GEOAI_RATE_LIMIT_BACKEND=file|mongo|local)
+logger.info(f"Upstream rate limiter: {configure_rate_limits(mongo_collection=db['rate_limits'])}")
+
+# Nearby recent results whose factors a new request may reuse (GEOAI_RESULT_MEMO=0 disables)
+configure_result_memo(db["suitability_results"], enabled=os.getenv("GEOAI_RESULT_MEMO", "1") == "1")
+
+# Map the land/water mask up front so the on-water check is O(1) per request
+if load_water_mask() is not None:
+    logger.info("Land/water mask loaded")
+
+# Factor values pre-fetched by tools/prewarm.py
+_snapshot_entries = load_cache_snapshot()
+if _snapshot_entries:
+    logger.info(f"Loaded {_snapshot_entries} cached factor cells from snapshot")
+_tile_entries = load_tile_snapshot()
+if _tile_entries:
+    logger.info(f"Loaded {_tile_entries} Overpass feature tiles from snapshot")
+
+# Compact per-cell factor store, mapped from its last snapshot and saved periodically
+_store_cells = load_factor_store()
+if _store_cells:
+    logger.info(f"Mapped {_store_cells} factor store cells from snapshot")
+
 # Ingest Weather Data from Open-Meteo API (optional, uses sample if API fails)
 def ingest_weather_data(latitude=17.3850, longitude=78.4867, start_date="2024-01-01", end_date="2024-12-31"):
     try:
@@ -173,12 +222,15 @@ def train_model():
     return model
 
 
-try:
-    with open("model.pkl", "rb") as f:
-        model = pickle.load(f)
-    logger.info("Model loaded from file")
-except FileNotFoundError:
-    model = train_model()
+# Live models, one handle per registry name (see ml/registry.py). Without a
+# published version they serve the legacy pickles, as before.
+MODEL_CHECK_INTERVAL_S = float(os.getenv("GEOAI_MODEL_CHECK_S", "30"))
+predict_model = ModelHandle("predict", legacy_path="model.pkl", fallback=train_model,
+                            check_interval_s=MODEL_CHECK_INTERVAL_S)
+suitability_model = ModelHandle("suitability", legacy_path="backend/ml/model_xgboost.pkl",
+                                check_interval_s=MODEL_CHECK_INTERVAL_S)
+MODEL_HANDLES = {"predict": predict_model, "suitability": suitability_model}
+predict_model.current()
 
 # Prediction Endpoint
 @app.route('/predict', methods=['POST', 'OPTIONS'])
@@ -200,6 +252,7 @@ def predict():
         soil_quality = np.random.uniform(0, 1)
         features = np.array([[rainfall, flood_count, soil_quality]])
 
+        model, model_version = predict_model.current()
         score = model.predict(features)[0]
         risk_flags = "High Risk (Flood-prone)" if score < 30 else "Low Risk (Suitable)"
         recommendations = (
@@ -209,6 +262,7 @@ def predict():
 
         return jsonify({
             "suitability_score": float(score),
+            "model_version": model_version,
             "risk_flags": risk_flags,
             "recommendations": recommendations,
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S IST"),
@@ -219,6 +273,239 @@ def predict():
         return jsonify({"error": str(e)}), 500
 
 
+def _waterbody_response(latitude, longitude, water_distance_km, source=None):
+    evidence = {"water_distance_km": water_distance_km}
+    if source:
+        evidence["water_source"] = source
+    return {
+        "suitability_score": 0.0,
+        "label": "Not Suitable (Waterbody Area)",
+        "reason": "The selected point is on or extremely close to a water body — construction is unsafe.",
+        "evidence": evidence,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S IST"),
+        "location": {"latitude": latitude, "longitude": longitude}
+    }
+
+
+def _get_ml_model():
+    return suitability_model.current()[0]
+
+
+def _batch_scores(factor_matrix):
+    """Score an (N, 8) FACTOR_ORDER matrix in one call: XGBoost when available,
+    else the weighted sum. NaNs (missing factors) take the usual defaults."""
+    F = np.array(factor_matrix, dtype=float)
+    for k, name in enumerate(FACTOR_ORDER):
+        col = F[:, k]
+        col[np.isnan(col) | (col == 0)] = FACTOR_DEFAULTS[name]
+    try:
+        model = _get_ml_model()
+        with span("model.predict", rows=len(F)):
+            return np.round(model.predict(F).astype(float), 2)
+    except Exception as e:
+        logger.warning(f"XGBoost batch failed ({e}) → using weighted sum fallback")
+        return score_matrix(F)
+
+
+# Latency budget applied when the caller does not pass deadline_ms (unset = none)
+DEFAULT_DEADLINE_MS = os.getenv("GEOAI_DEFAULT_DEADLINE_MS")
+
+
+def _request_deadline_ms(data=None):
+    """deadline_ms from the JSON body or query string, else the server default."""
+    value = (data or {}).get("deadline_ms", request.args.get("deadline_ms", DEFAULT_DEADLINE_MS))
+    if value in (None, ""):
+        return None
+    value = float(value)
+    if value <= 0:
+        raise ValueError("deadline_ms must be positive")
+    return value
+
+
+def _check_coordinates(latitude, longitude):
+    """(latitude, longitude), or ValueError when outside the valid ranges."""
+    if not -90.0 <= latitude <= 90.0:
+        raise ValueError(f"latitude {latitude} is outside [-90, 90]")
+    if not -180.0 <= longitude <= 180.0:
+        raise ValueError(f"longitude {longitude} is outside [-180, 180]")
+    return latitude, longitude
+
+
+def _compute_factors(latitude, longitude, deadline_ms=None):
+    """Run every factor adapter for one point through the factor pipeline.
+
+    Local checks run first and water vetoes cancel outstanding network work;
+    see integrations/pipeline.py. Returns the raw factor values keyed like the
+    response "factors" plus evidence, with on_water=True (and the remaining
+    factors absent) when the point is on a waterbody. Factors not finished
+    within ``deadline_ms`` fall back and are listed under "degraded".
+
+    Factors of a fresh result within their reuse radius are taken from the
+    result memo (integrations/result_memo.py) instead of being recomputed;
+    "reused" maps them to the distance in metres of the result they came from.
+    """
+    memo = get_result_memo()
+    with deadline_scope(deadline_ms):
+        reused = memo.lookup(latitude, longitude) if memo is not None else {}
+        result = run_factor_pipeline(latitude, longitude, prefilled={k: v[0] for k, v in reused.items()})
+    result["reused"] = {k: round(v[1] * 1000.0, 1) for k, v in reused.items()}
+    if memo is not None and not result["on_water"]:
+        memo.record(latitude, longitude, result["computed"])
+    result["water_source"] = "water_mask" if result["vetoed_by"] == "water_mask" else None
+    return result
+
+
+# Defaults substituted for missing (None/0) factors, as in the scoring block below
+FACTOR_DEFAULTS = {
+    "rainfall": 70.0,
+    "flood": 50.0,
+    "landslide": 70.0,
+    "soil": 60.0,
+    "proximity": 60.0,
+    "water": 75.0,
+    "pollution": 65.0,
+    "landuse": 70.0,
+}
+
+
+def _score_location(latitude, longitude, debug=False, deadline_ms=None):
+    """Run every factor adapter for one point and build the /suitability payload.
+
+    With ``debug`` the request is traced (integrations/tracing.py) and the
+    span tree is returned under debug.trace.
+    """
+    if not (debug or TRACE_ALL):
+        return _score_point(latitude, longitude, debug, deadline_ms)
+    with trace_scope("suitability", latitude=latitude, longitude=longitude, deadline_ms=deadline_ms) as trace:
+        resp = _score_point(latitude, longitude, debug, deadline_ms)
+    if debug:
+        resp.setdefault("debug", {})["trace"] = trace.to_dict()
+    return resp
+
+
+def _score_point(latitude, longitude, debug=False, deadline_ms=None):
+    start = time.time()
+
+    factors = _compute_factors(latitude, longitude, deadline_ms)
+    if factors["on_water"]:
+        resp = _waterbody_response(latitude, longitude, factors["water_distance_km"], source=factors["water_source"])
+        if debug:
+            resp["debug"] = {
+                "processing_ms": int((time.time() - start) * 1000),
+                "vetoed_by": factors["vetoed_by"],
+                "cancelled_factors": factors["cancelled"],
+            }
+        return resp
+    rainfall_score = factors["rainfall"]
+    rainfall_total_mm_60d = factors["rainfall_total_mm_60d"]
+    flood_risk_score = factors["flood"]
+    landslide_risk_score = factors["landslide"]
+    soil_quality_score = factors["soil"]
+    proximity_score = factors["proximity"]
+    water_score = factors["water"]
+    water_distance_km = factors["water_distance_km"]
+    pollution_score = factors["pollution"]
+    landuse_score = factors["landuse"]
+
+    if debug:
+        logger.info(
+            f"FACTORS lat={latitude} lon={longitude} rain={rainfall_score} flood={flood_risk_score} "
+            f"landslide={landslide_risk_score} soil={soil_quality_score} prox={proximity_score} "
+            f"water={water_score} pollution={pollution_score} landuse={landuse_score}"
+        )
+
+    final_score = None
+    model_used = "Unknown"
+    model_version = None
+    label = "Unknown"
+
+    try:
+        # Take the model once: a hot-swap mid-request does not affect this request
+        model, version = suitability_model.current()
+        features = np.array([[
+            rainfall_score or 70.0,
+            flood_risk_score or 50.0,
+            landslide_risk_score or 70.0,
+            soil_quality_score or 60.0,
+            proximity_score or 60.0,
+            water_score or 75.0,
+            pollution_score or 65.0,
+            landuse_score or 70.0
+        ]], dtype=float)
+
+        with span("model.predict", rows=1):
+            predicted = float(model.predict(features)[0])
+        final_score = round(predicted, 2)
+        model_used = "XGBoost Regressor (Machine Learning)"
+        model_version = version
+        label = "Highly Suitable" if final_score >= 70 else ("Moderate" if final_score >= 40 else "Unsuitable")
+
+    except Exception as e:
+        logger.warning(f"XGBoost failed ({e}) → using weighted sum fallback")
+        try:
+            agg = compute_suitability_score(
+                rainfall_score=rainfall_score or 70,
+                flood_risk_score=flood_risk_score or 50,
+                landslide_risk_score=landslide_risk_score or 70,
+                soil_quality_score=soil_quality_score or 60,
+                proximity_score=proximity_score or 60,
+                water_proximity_score=water_score or 75,
+                pollution_score=pollution_score or 65,
+                landuse_score=landuse_score or 70,
+            )
+            final_score = agg["score"]
+            model_used = "Weighted Sum (Safe Fallback)"
+            label = "High Risk (Unsuitable)" if final_score < 30 else ("Moderate" if final_score < 60 else "Suitable")
+        except:
+            final_score = 50.0
+            model_used = "Emergency Default"
+            label = "Unknown"
+
+    resp = {
+        "suitability_score": final_score,
+        "model_used": model_used,
+        "model_version": model_version,
+        "label": label,
+        "factors": {
+            "rainfall": round(rainfall_score or 70, 2),
+            "flood": round(flood_risk_score or 50, 2),
+            "landslide": round(landslide_risk_score or 70, 2),
+            "soil": round(soil_quality_score or 60, 2),
+            "proximity": round(proximity_score or 60, 2),
+            "water": round(water_score or 75, 2),
+            "pollution": round(pollution_score or 65, 2),
+            "landuse": round(landuse_score or 70, 2),
+        },
+        "evidence": {
+            "water_distance_km": water_distance_km,
+            "rainfall_total_mm_60d": rainfall_total_mm_60d,
+            "pm25_ugm3": factors["pm25_ugm3"],
+            # Set when the value was interpolated from nearby observations
+            "rainfall_interpolation_confidence": factors["rainfall_interpolation_confidence"],
+            "pm25_interpolation_confidence": factors["pm25_interpolation_confidence"],
+        },
+        "degraded_factors": factors["degraded"],
+        "reused_factors": factors["reused"],
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S IST"),
+        "location": {"latitude": latitude, "longitude": longitude}
+    }
+
+    if debug:
+        resp["debug"] = {"processing_ms": int((time.time() - start) * 1000)}
+
+    return resp
+
+
+# Shared secret for /debug/* and ?profile=1 (unset = disabled)
+DEBUG_TOKEN = os.getenv("GEOAI_DEBUG_TOKEN")
+
+
+def _debug_authorized():
+    # Header only: a query-string token ends up in access logs and proxies.
+    supplied = request.headers.get("X-Debug-Token") or ""
+    return bool(DEBUG_TOKEN) and hmac.compare_digest(supplied.encode(), DEBUG_TOKEN.encode())
+
+
 @app.route('/suitability', methods=['POST', 'OPTIONS'])
 def suitability():
     if request.method == 'OPTIONS':
@@ -226,266 +513,455 @@ def suitability():
     try:
         data = request.json or {}
         debug = (request.args.get('debug') == '1') or bool(data.get('debug'))
-        start = time.time()
-        latitude = float(data.get("latitude", 17.3850))
-        longitude = float(data.get("longitude", 78.4867))
+        latitude, longitude = _check_coordinates(float(data.get("latitude", 17.3850)), float(data.get("longitude", 78.4867)))
+        deadline_ms = _request_deadline_ms(data)
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        if request.args.get('profile') == '1':
+            if not _debug_authorized():
+                return jsonify({"error": "profiling requires a valid debug token"}), 403
+            with profile_slot() as acquired:
+                if not acquired:
+                    return jsonify({"error": "a profile is already running"}), 409
+                # Samples this thread and the factor pools (shared with concurrent requests)
+                with SamplingProfiler(0.001, thread_filter=request_thread_filter(threading.get_ident())) as profiler:
+                    resp = _score_location(latitude, longitude, debug, deadline_ms)
+            resp.setdefault("debug", {})["profile"] = {
+                "samples": profiler.samples,
+                "interval_ms": 1,
+                "collapsed": profiler.collapsed().splitlines(),
+            }
+            return jsonify(resp)
+        return jsonify(_score_location(latitude, longitude, debug, deadline_ms))
+    except Exception as e:
+        logger.exception(f"Suitability aggregation failed: {e}")
+        return jsonify({"error": str(e)}), 500
 
-        # Compute rainfall score via adapter (last 60 days precipitation)
-        try:
-            rainfall_score, rainfall_total_mm_60d = estimate_rainfall_score(latitude, longitude)
-        except Exception as e:
-            logger.error(f"rainfall_score error: {e}")
-            rainfall_score, rainfall_total_mm_60d = 50.0, None
 
-        # Defensive wrappers for external adapters
-        try:
-            flood_risk_score = estimate_flood_risk_score(latitude, longitude)
-        except Exception as e:
-            logger.error(f"flood_risk_score error: {e}")
-            flood_risk_score = 0
+# Streaming bulk scoring: shared worker pool, bounded in-flight points per request
+STREAM_WORKERS = int(os.getenv("GEOAI_STREAM_WORKERS", "16"))
+STREAM_MAX_IN_FLIGHT = int(os.getenv("GEOAI_STREAM_MAX_IN_FLIGHT", "8"))
+_stream_executor = ThreadPoolExecutor(max_workers=STREAM_WORKERS, thread_name_prefix="geoai-stream")
+AREA_MAX_SAMPLES = int(os.getenv("GEOAI_AREA_MAX_SAMPLES", "400"))
 
-        try:
-            landslide_risk_score = estimate_landslide_risk_score(latitude, longitude)
-        except Exception as e:
-            logger.error(f"landslide_risk_score error: {e}")
-            landslide_risk_score = 0
 
-        try:
-            proximity_score = compute_proximity_score(latitude, longitude)
-        except Exception as e:
-            logger.error(f"proximity_score error: {e}")
-            proximity_score = 0
+def _parse_point(item):
+    """Accept {"latitude", "longitude"} / {"lat", "lon"} objects or [lat, lon] pairs."""
+    if isinstance(item, dict):
+        lat = item.get("latitude", item.get("lat"))
+        lon = item.get("longitude", item.get("lon", item.get("lng")))
+    else:
+        lat, lon = item[0], item[1]
+    return _check_coordinates(float(lat), float(lon))
 
-        try:
-            water_score, water_distance_km = estimate_water_proximity_score(latitude, longitude)
-        except Exception as e:
-            logger.error(f"water_proximity_score error: {e}")
-            water_score, water_distance_km = 0, 0
-        # If the site is effectively on a waterbody, mark as completely unsuitable
-        if water_distance_km is not None and water_distance_km < 0.02:  # within ~20m
-            return jsonify({
-                "suitability_score": 0.0,
-                "label": "Not Suitable (Waterbody Area)",
-                "reason": "The selected point is on or extremely close to a water body — construction is unsafe.",
-                "evidence": {"water_distance_km": water_distance_km},
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S IST"),
-                "location": {"latitude": latitude, "longitude": longitude}
-        })
-        # Otherwise, continue and let the water factor influence the score
 
+def _iter_point_lines(lines):
+    """Lazily parse NDJSON or CSV (lat,lon[,...] with optional header) lines."""
+    for raw in lines:
+        line = raw.decode("utf-8", "replace") if isinstance(raw, bytes) else raw
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
         try:
-            pollution_score = estimate_pollution_score(latitude, longitude)
-        except Exception as e:
-            logger.error(f"pollution_score error: {e}")
-            pollution_score = 0
+            if line[0] in "{[":
+                yield _parse_point(json.loads(line))
+            else:
+                parts = [p.strip() for p in line.split(",")]
+                yield _check_coordinates(float(parts[0]), float(parts[1]))
+        except (ValueError, IndexError, TypeError, KeyError) as e:
+            # Header rows are skipped; anything else is reported in-stream
+            if not line[0].isalpha():
+                yield e
+
+
+def _iter_spooled_lines(spool):
+    try:
+        yield from _iter_point_lines(spool)
+    finally:
+        spool.close()
+
+
+def _request_points():
+    """Point source for /suitability/stream without materialising file uploads."""
+    upload = request.files.get("file")
+    if upload is not None:
+        # Werkzeug closes request files when the view returns, before the
+        # response body is streamed, so spool a private copy (disk-backed).
+        spool = tempfile.SpooledTemporaryFile(max_size=1 << 20)
+        shutil.copyfileobj(upload.stream, spool)
+        spool.seek(0)
+        return _iter_spooled_lines(spool)
+    if request.mimetype in ("application/x-ndjson", "application/jsonl", "text/csv", "text/plain"):
+        return _iter_point_lines(request.stream)
+    data = request.get_json(silent=True) or {}
+    points = data.get("points", data if isinstance(data, list) else [])
+    return (_safe_parse_point(p) for p in points)
+
+
+def _safe_parse_point(item):
+    try:
+        return _parse_point(item)
+    except (ValueError, IndexError, TypeError, KeyError) as e:
+        return e
 
-        try:
-            landuse_score = infer_landuse_score(latitude, longitude)
-        except Exception as e:
-            logger.error(f"landuse_score error: {e}")
-            landuse_score = 0
 
-        try:
-            soil_quality_score = estimate_soil_quality_score(latitude, longitude)
-        except Exception as e:
-            logger.error(f"soil_quality_score error: {e}")
-            soil_quality_score = 0
+def _stream_line(index, point, debug, deadline_ms):
+    if isinstance(point, Exception):
+        return {"index": index, "error": f"invalid point: {point}"}
+    latitude, longitude = point
+    try:
+        result = _score_location(latitude, longitude, debug, deadline_ms)
+    except Exception as e:
+        logger.error(f"stream point {index} failed: {e}")
+        result = {"error": str(e), "location": {"latitude": latitude, "longitude": longitude}}
+    result["index"] = index
+    return result
+
+
+def _stream_scores(points, max_in_flight, debug, deadline_ms=None):
+    """Yield one NDJSON line per point in completion order.
+
+    New points are only pulled from the input when a slot frees up, and a slot
+    only frees up when the client consumes a line, so memory stays bounded by
+    ``max_in_flight`` however large the input is.
+    """
+    points = enumerate(points)
+    pending = set()
+    exhausted = False
+    while True:
+        while not exhausted and len(pending) < max_in_flight:
+            try:
+                index, point = next(points)
+            except StopIteration:
+                exhausted = True
+                break
+            pending.add(_stream_executor.submit(_stream_line, index, point, debug, deadline_ms))
+        if not pending:
+            break
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            yield json.dumps(fut.result(), default=str) + "\n"
+
+
+@app.route('/suitability/stream', methods=['POST', 'OPTIONS'])
+def suitability_stream():
+    """Score many points, streaming one JSON line per point as each completes.
+
+    Input: JSON {"points": [...]}, an NDJSON/CSV request body, or a multipart
+    upload named "file". Each line has the /suitability shape plus "index".
+    ?deadline_ms= bounds each point, not the whole stream.
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    debug = request.args.get('debug') == '1'
+    try:
+        deadline_ms = _request_deadline_ms()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        max_in_flight = int(request.args.get('max_in_flight', STREAM_MAX_IN_FLIGHT))
+    except ValueError:
+        max_in_flight = STREAM_MAX_IN_FLIGHT
+    max_in_flight = max(1, min(max_in_flight, STREAM_WORKERS))
+    gen = _stream_scores(_request_points(), max_in_flight, debug, deadline_ms)
+    return Response(stream_with_context(gen), mimetype="application/x-ndjson")
 
-        if debug:
-            logger.info(
-                f"FACTORS lat={latitude} lon={longitude} rain={rainfall_score} flood={flood_risk_score} "
-                f"landslide={landslide_risk_score} soil={soil_quality_score} prox={proximity_score} "
-                f"water={water_score} pollution={pollution_score} landuse={landuse_score}"
-            )
 
-        # agg = compute_suitability_score(
-        #     rainfall_score=rainfall_score,
-        #     flood_risk_score=flood_risk_score,
-        #     landslide_risk_score=landslide_risk_score,
-        #     soil_quality_score=soil_quality_score,
-        #     proximity_score=proximity_score,
-        #     water_proximity_score=water_score,
-        #     pollution_score=pollution_score,
-        #     landuse_score=landuse_score,
-        # )
-                # === ML PREDICTION – 100% SAFE ===
-        # try:
-        #     # Load model once per app lifetime
-        #     if not hasattr(app, "ml_model"):
-        #         app.ml_model = pickle.load(open("model_xgboost.pkl", "rb"))
-        #         logger.info("XGBoost model loaded successfully")
-
-        #     # Build feature vector exactly like training
-        #     features = np.array([[
-        #         rainfall_score or 50,
-        #         flood_risk_score or 50,
-        #         landslide_risk_score or 50,
-        #         soil_quality_score or 50,
-        #         proximity_score or 50,
-        #         water_score,
-        #         pollution_score or 50,
-        #         landuse_score or 50
-        #     ]])
-
-        #     ml_score = float(app.ml_model.predict(features)[0])
-        #     final_score = round(ml_score, 2)
-        #     model_name = "XGBoost Regressor (ML Model)"
-        #     label = "Highly Suitable" if final_score >= 70 else ("Moderate" if final_score >= 40 else "Unsuitable")
-
-        # except Exception as e:
-        #     logger.warning(f"ML failed ({e}), falling back to weighted sum")
-        #     agg = compute_suitability_score(
-        #         rainfall_score=rainfall_score or 50,
-        #         flood_risk_score=flood_risk_score or 50,
-        #         landslide_risk_score=landslide_risk_score or 50,
-        #         soil_quality_score=soil_quality_score or 50,
-        #         proximity_score=proximity_score or 50,
-        #         water_proximity_score=water_score,
-        #         pollution_score=pollution_score or 50,
-        #         landuse_score=landuse_score or 50,
-        #     )
-        #     final_score = agg["score"]
-        #     model_name = "Weighted Sum (Baseline)"
-        #     label = "High Risk (Unsuitable)" if final_score < 30 else ("Moderate" if final_score < 60 else "Suitable")
-
-        # # Build response
-        # resp = {
-        #     "suitability_score": final_score,
-        #     "model_used": model_name,
-        #     "label": label,
-        #     "factors": {
-        #         "rainfall": rainfall_score or 50,
-        #         "flood": flood_risk_score or 50,
-        #         "landslide": landslide_risk_score or 50,
-        #         "soil": soil_quality_score or 50,
-        #         "proximity": proximity_score or 50,
-        #         "water": water_score,
-        #         "pollution": pollution_score or 50,
-        #         "landuse": landuse_score or 50,
-        #     },
-        #     "evidence": {
-        #         "water_distance_km": water_distance_km,
-        #         "rainfall_total_mm_60d": rainfall_total_mm_60d,
-        #     },
-        #     "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S IST"),
-        #     "location": {"latitude": latitude, "longitude": longitude}
-        # }
-                # === XGBoost Prediction (Smart & Safe) ===
-                # === FINAL WORKING XGBoost + SAFE FALLBACK ===
-                # ==================================================================
-        # FINAL 100% WORKING SCORING BLOCK — NO MORE ERRORS EVER
-        # ==================================================================
-        final_score = None
-        model_used = "Unknown"
-        label = "Unknown"
+@app.route('/suitability/area', methods=['POST', 'OPTIONS'])
+def suitability_area():
+    """Aggregate suitability over a GeoJSON polygon using adaptive sampling.
 
-        try:
-            if not hasattr(app, "ml_model"):
-                app.ml_model = pickle.load(open("backend/ml/model_xgboost.pkl", "rb"))
-                logger.info("XGBoost model loaded successfully")
-            features = np.array([[
-                rainfall_score or 70.0,
-                flood_risk_score or 50.0,
-                landslide_risk_score or 70.0,
-                soil_quality_score or 60.0,
-                proximity_score or 60.0,
-                water_score or 75.0,
-                pollution_score or 65.0,
-                landuse_score or 70.0
-            ]], dtype=float)
-
-            predicted = float(app.ml_model.predict(features)[0])
-            final_score = round(predicted, 2)
-            model_used = "XGBoost Regressor (Machine Learning)"
-            label = "Highly Suitable" if final_score >= 70 else ("Moderate" if final_score >= 40 else "Unsuitable")
+    Body: {"geometry": <Polygon|MultiPolygon|Feature>, "max_samples": 96,
+    "initial_grid": 6, "include_samples": false, "deadline_ms": null}
+
+    deadline_ms bounds the whole request: samples still being evaluated when
+    it runs out use fallback factor values (counted in "degraded_samples").
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    try:
+        data = request.json or {}
+        start = time.time()
+        geometry = data.get("geometry") or data
+        max_samples = max(1, min(int(data.get("max_samples", 96)), AREA_MAX_SAMPLES))
+        deadline_ms = _request_deadline_ms(data)
+        deadline_at = None if deadline_ms is None else time.monotonic() + deadline_ms / 1000.0
+
+        def _factors(lat, lon):
+            if deadline_at is None:
+                return _compute_factors(lat, lon)
+            return _compute_factors(lat, lon, max(deadline_at - time.monotonic(), 0.0) * 1000.0)
+
+        def _prefetch(lats, lons):
+            # One Overpass query per cluster of samples instead of several per sample.
+            left_ms = None if deadline_at is None else max(deadline_at - time.monotonic(), 0.0) * 1000.0
+            with deadline_scope(left_ms):
+                prefetch_overpass(lats, lons)
+
+        model_version = suitability_model.current()[1]
+        result = score_area(
+            geometry,
+            _factors,
+            _batch_scores,
+            executor=_stream_executor,
+            initial_grid=max(1, min(int(data.get("initial_grid", 6)), 32)),
+            max_samples=max_samples,
+            include_samples=bool(data.get("include_samples")),
+            prefetch=_prefetch,
+        )
+        result["model_version"] = model_version
+        result["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S IST")
+        if request.args.get('debug') == '1':
+            result["debug"] = {"processing_ms": int((time.time() - start) * 1000)}
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.exception(f"Area scoring failed: {e}")
+        return jsonify({"error": str(e)}), 500
 
-        except Exception as e:
-            logger.warning(f"XGBoost failed ({e}) → using weighted sum fallback")
-            try:
-                agg = compute_suitability_score(
-                    rainfall_score=rainfall_score or 70,
-                    flood_risk_score=flood_risk_score or 50,
-                    landslide_risk_score=landslide_risk_score or 70,
-                    soil_quality_score=soil_quality_score or 60,
-                    proximity_score=proximity_score or 60,
-                    water_proximity_score=water_score or 75,
-                    pollution_score=pollution_score or 65,
-                    landuse_score=landuse_score or 70,
-                )
-                final_score = agg["score"]
-                model_used = "Weighted Sum (Safe Fallback)"
-                label = "High Risk (Unsuitable)" if final_score < 30 else ("Moderate" if final_score < 60 else "Suitable")
-            except:
-                final_score = 50.0
-                model_used = "Emergency Default"
-                label = "Unknown"
 
+RANK_MAX_CANDIDATES = int(os.getenv("GEOAI_RANK_MAX_CANDIDATES", "10000"))
+# Cheapest first; within a cost class the heaviest weight first, since it
+# tightens the score bounds most. The water mask runs first as a veto.
+RANK_STAGES = [s.name for s in sorted(FACTOR_SPECS, key=lambda s: (s.report, s.cost, -FACTOR_WEIGHTS.get(s.name, 0.0)))]
+# Evaluated for every contender even when a score is known, so their vetoes run.
+RANK_VETO_FACTORS = [s.name for s in FACTOR_SPECS if s.veto is not None]
+
+
+@app.route('/suitability/rank', methods=['POST', 'OPTIONS'])
+def suitability_rank():
+    """Best k of many candidate sites, by weighted suitability score.
+
+    Body: {"points": [[lat, lon] | {"latitude", "longitude"}, ...], "k": 10,
+    "deadline_ms": null}
+
+    Cached factors and the local rasters are used first; upstream factors
+    are fetched only for candidates that can still reach the top k (see
+    ranking.py). "model_score" is the ML score of each returned site.
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    try:
+        data = request.json or {}
+        start = time.time()
+        points = [_parse_point(p) for p in (data.get("points") or [])]
+        if not points:
+            raise ValueError("points must be a non-empty list")
+        if len(points) > RANK_MAX_CANDIDATES:
+            raise ValueError(f"at most {RANK_MAX_CANDIDATES} candidates per request")
+        k = max(1, min(int(data.get("k", 10)), len(points)))
+        deadline_ms = _request_deadline_ms(data)
+    except (ValueError, IndexError, TypeError, KeyError) as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        lats = np.array([p[0] for p in points])
+        lons = np.array([p[1] for p in points])
+        with deadline_scope(deadline_ms):
+            ranked = rank_sites(lats, lons, k, RANK_STAGES, evaluate_factor,
+                                known=peek_factor_matrix, executor=_stream_executor,
+                                prefetch=lambda name, la, lo: prefetch_overpass(la, lo, (name,)),
+                                veto_factors=RANK_VETO_FACTORS)
+        model_version = suitability_model.current()[1]
+        model_scores = _batch_scores(ranked["factors"]) if len(ranked["top"]) else []
+        sites = []
+        for r, i in enumerate(ranked["top"]):
+            sites.append({
+                "index": int(i),
+                "rank": r + 1,
+                "location": {"latitude": float(lats[i]), "longitude": float(lons[i])},
+                "suitability_score": round(float(ranked["scores"][r]), 2),
+                "model_score": None if ranked["vetoed"][r] else float(model_scores[r]),
+                "on_water": bool(ranked["vetoed"][r]),
+                "factors": {name: round(float(v), 2) for name, v in zip(FACTOR_ORDER, ranked["factors"][r]) if not np.isnan(v)},
+            })
+        full = len(points) * len(RANK_STAGES)
         resp = {
-            "suitability_score": final_score,
-            "model_used": model_used,
-            "label": label,
-            "factors": {
-                "rainfall": round(rainfall_score or 70, 2),
-                "flood": round(flood_risk_score or 50, 2),
-                "landslide": round(landslide_risk_score or 70, 2),
-                "soil": round(soil_quality_score or 60, 2),
-                "proximity": round(proximity_score or 60, 2),
-                "water": round(water_score or 75, 2),
-                "pollution": round(pollution_score or 65, 2),
-                "landuse": round(landuse_score or 70, 2),
-            },
-            "evidence": {
-                "water_distance_km": water_distance_km,
-                "rainfall_total_mm_60d": rainfall_total_mm_60d,
+            "k": k,
+            "candidates": ranked["candidates"],
+            "sites": sites,
+            "score_method": "weighted_sum",
+            "model_version": model_version,
+            "stats": {
+                "pruned_candidates": ranked["pruned"],
+                "factors_from_cache": ranked["from_cache"],
+                "evaluations": ranked["evaluations"],
+                "evaluations_saved": full - sum(ranked["evaluations"].values()),
+                "degraded_evaluations": ranked["degraded_evaluations"],
             },
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S IST"),
-            "location": {"latitude": latitude, "longitude": longitude}
         }
-
-        if debug:
-            resp["debug"] = {"processing_ms": int((time.time() - start) * 1000)}
-
+        if request.args.get('debug') == '1':
+            resp["debug"] = {"processing_ms": int((time.time() - start) * 1000), "stages": RANK_STAGES}
         return jsonify(resp)
+    except Exception as e:
+        logger.exception(f"Ranking failed: {e}")
+        return jsonify({"error": str(e)}), 500
 
 
+REWEIGHT_MAX_SITES = int(os.getenv("GEOAI_REWEIGHT_MAX_SITES", "200000"))
 
 
+@app.route('/suitability/reweight', methods=['POST', 'OPTIONS'])
+def suitability_reweight():
+    """What-if scoring: re-score stored factor values with custom weights.
 
+    Body: {"weights": {"flood": 0.3, ...}, "points": [...] | "bbox": [W, S, E, N],
+    "normalize": true}
 
-        # label = "High Risk (Unsuitable)" if agg["score"] < 30 else ("Moderate" if agg["score"] < 60 else "Suitable")
+    Nothing is fetched: factors come from the factor store and cache as
+    left by earlier requests (missing ones count as the neutral 50 and are
+    counted per site). All sites are scored in one matrix product. Results
+    are columnar, in input order for points and cell order for a bbox, with
+    the default-weight score alongside for comparison. Sites whose stored
+    water distance is within the water veto score 0 under any weights, as
+    /suitability scores them, and are flagged in ``on_water``.
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({}), 200
+    try:
+        data = request.json or {}
+        start = time.time()
+        weights = normalize_weights(data.get("weights") or {}, normalize=data.get("normalize", True) is not False)
+        if data.get("bbox") is not None:
+            west, south, east, north = (float(v) for v in data["bbox"])
+            if west > east or south > north:
+                raise ValueError("bbox must be [west, south, east, north]")
+            lats, lons, matrix, water_km = stored_cells_in_bbox(west, south, east, north)
+        else:
+            points = data.get("points") or []
+            if not points:
+                raise ValueError("pass points or bbox")
+            lats = np.array([_parse_point(p)[0] for p in points])
+            lons = np.array([_parse_point(p)[1] for p in points])
+            matrix, water_km = stored_factor_matrix(lats, lons)
+        if len(lats) > REWEIGHT_MAX_SITES:
+            raise ValueError(f"{len(lats)} sites exceed the limit of {REWEIGHT_MAX_SITES}; use a smaller bbox")
+    except (ValueError, IndexError, TypeError, KeyError) as e:
+        return jsonify({"error": str(e)}), 400
+    on_water = water_km < WATER_VETO_KM
+    scores = np.where(on_water, 0.0, score_matrix(matrix, weights))
+    baseline = np.where(on_water, 0.0, score_matrix(matrix))
+    missing = np.isnan(matrix).sum(axis=1)
+    resp = {
+        "weights": weights,
+        "sites": len(lats),
+        "latitudes": np.round(lats, 6).tolist(),
+        "longitudes": np.round(lons, 6).tolist(),
+        "scores": scores.tolist(),
+        "baseline_scores": baseline.tolist(),
+        "missing_factors": missing.tolist(),
+        "on_water": on_water.tolist(),
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S IST"),
+    }
+    if request.args.get('debug') == '1':
+        resp["debug"] = {"processing_ms": round((time.time() - start) * 1000, 2)}
+    return jsonify(resp)
+
+
+@app.route('/debug/profile', methods=['GET'])
+def debug_profile():
+    """Sample every thread of this process for ?seconds= (default 10, max 120)
+    and return collapsed stacks for a flame graph.
+
+    Requires GEOAI_DEBUG_TOKEN, sent as X-Debug-Token.
+    ?interval_ms= sets the sampling interval (default 5); ?idle=1 keeps
+    threads parked waiting for work.
+    """
+    if not _debug_authorized():
+        return jsonify({"error": "forbidden"}), 403
+    try:
+        seconds = min(max(float(request.args.get('seconds', 10)), 0.1), 120.0)
+        interval_s = min(max(float(request.args.get('interval_ms', 5)), 1.0), 1000.0) / 1000.0
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        profiler = profile_for(seconds, interval_s, include_idle=request.args.get('idle') == '1')
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    filename = f"geoai-{os.getpid()}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.folded"
+    return Response(
+        profiler.collapsed(),
+        mimetype="text/plain",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Profile-Samples": str(profiler.samples),
+            "X-Profile-Seconds": f"{profiler.duration_s:.2f}",
+        },
+    )
+
+
+@app.route('/admin/model', methods=['GET'])
+def model_status():
+    """Live and published versions of each model in this worker."""
+    if not _debug_authorized():
+        return jsonify({"error": "forbidden"}), 403
+    return jsonify({
+        name: {
+            "live_version": handle.version,
+            "published": list_versions(name),
+            "last_reload": handle.last_reload,
+        }
+        for name, handle in MODEL_HANDLES.items()
+    })
+
+
+@app.route('/admin/model/reload', methods=['POST'])
+def model_reload():
+    """Load and warm a model version in the background, then swap it in.
+
+    Body: {"model": "suitability" | "predict" (default both), "version": null}.
+    With a version, CURRENT is moved to it so every worker follows within
+    GEOAI_MODEL_CHECK_S; without one this worker reloads whatever CURRENT
+    names. In-flight requests finish on the model they started with.
+    Requires GEOAI_DEBUG_TOKEN.
+    """
+    if not _debug_authorized():
+        return jsonify({"error": "forbidden"}), 403
+    data = request.get_json(silent=True) or {}
+    names = [data["model"]] if data.get("model") else list(MODEL_HANDLES)
+    if any(name not in MODEL_HANDLES for name in names):
+        return jsonify({"error": f"unknown model; expected one of {sorted(MODEL_HANDLES)}"}), 400
+    version = data.get("version")
+    if version:
+        # All or nothing: moving CURRENT for one model and then failing on
+        # the next would leave the registry half switched.
+        missing = [name for name in names if version not in list_versions(name, MODEL_HANDLES[name].root)]
+        if missing:
+            return jsonify({"error": f"unknown model version {version} for {', '.join(missing)}"}), 404
+        for name in names:
+            set_current(name, version, MODEL_HANDLES[name].root)
+    out = {}
+    for name in names:
+        out[name] = {
+            "live_version": MODEL_HANDLES[name].version,
+            "reloading": MODEL_HANDLES[name].reload_async(version),
+        }
+    return jsonify(out), 202
 
-        # resp = {
-        #     "suitability_score": agg["score"],
-        #     "factors": {
-        #         "rainfall": agg["rainfall"],
-        #         "flood": agg["flood"],
-        #         "landslide": agg["landslide"],
-        #         "soil": agg["soil"],
-        #         "proximity": agg["proximity"],
-        #         "water": agg["water"],
-        #         "pollution": agg["pollution"],
-        #         "landuse": agg["landuse"],
-        #     },
-        #     "evidence": {
-        #         "water_distance_km": water_distance_km,
-        #         "rainfall_total_mm_60d": rainfall_total_mm_60d,
-        #     },
-        #     "label": label,
-        #     "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S IST"),
-        #     "location": {"latitude": latitude, "longitude": longitude}
-        # }
 
-        # if debug:
-        #     resp["debug"] = {"processing_ms": int((time.time() - start) * 1000)}
+def start_background_jobs(syncs: bool = True):
+    """Start this process's daemon threads; threads do not survive fork(), so
+    serve.py calls this in each worker. Every process saves its factor store
+    cells; with ``syncs`` it also keeps the local air-quality station (no-op
+    without GEOAI_AQ_REGIONS) and landslide stores fresh, which one process
+    per host is enough for."""
+    start_factor_store_snapshots()
+    if syncs:
+        start_air_quality_sync()
+        start_landslide_sync()
 
-        # return jsonify(resp)
 
-    except Exception as e:
-        logger.exception(f"Suitability aggregation failed: {e}")
-        return jsonify({"error": str(e)}), 500
+def install_reload_signal():
+    """SIGUSR2 reloads every model from CURRENT (main thread only)."""
+    if hasattr(signal, "SIGUSR2"):
+        signal.signal(signal.SIGUSR2, lambda signum, frame: [h.reload_async() for h in MODEL_HANDLES.values()])
 
 
 if __name__ == "__main__":
     logger.info("Starting GeoAI application")
+    install_reload_signal()
+    start_background_jobs()
     # Disable reloader/debugger on Windows to avoid WinError 10038 socket issues
     app.run(debug=False, host="0.0.0.0", port=5000, use_reloader=False, threaded=True)
@@ -0,0 +1,235 @@
+"""
+Polygon (parcel) suitability scoring with adaptive sampling.
+
+The polygon is covered by a coarse grid of sample cells. Cells whose score
+differs most from their neighbours are split into four children, round by
+round, until the sample budget is spent. Factor values come through the
+per-cell factor cache, so overlapping parcels and repeat requests reuse
+earlier work; scores and aggregate statistics are computed in one
+vectorized pass over the sample set.
+"""
+
+import math
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from integrations import FACTOR_ORDER
+
+EARTH_KM_PER_DEG = 111.32
+
+
+def polygon_rings(geometry: dict) -> List[List[np.ndarray]]:
+    """GeoJSON Polygon/MultiPolygon (or Feature) -> polygons of (lon, lat) rings."""
+    if geometry.get("type") == "Feature":
+        geometry = geometry.get("geometry") or {}
+    gtype = geometry.get("type")
+    coords = geometry.get("coordinates")
+    if gtype == "Polygon":
+        polys = [coords]
+    elif gtype == "MultiPolygon":
+        polys = coords
+    else:
+        raise ValueError("geometry must be a GeoJSON Polygon or MultiPolygon")
+    out = []
+    for poly in polys:
+        rings = [np.asarray(ring, dtype=np.float64)[:, :2] for ring in poly if len(ring) >= 4]
+        if rings:
+            out.append(rings)
+    if not out:
+        raise ValueError("polygon has no valid rings")
+    return out
+
+
+def points_in_polygons(lats: np.ndarray, lons: np.ndarray, polygons: List[List[np.ndarray]]) -> np.ndarray:
+    """Vectorized even-odd point-in-polygon test (holes supported)."""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    inside_any = np.zeros(lats.shape, dtype=bool)
+    for rings in polygons:
+        inside = np.zeros(lats.shape, dtype=bool)
+        for ring in rings:
+            x1, y1 = ring[:-1, 0], ring[:-1, 1]
+            x2, y2 = ring[1:, 0], ring[1:, 1]
+            # (points, edges) crossing matrix
+            py = lats[:, None]
+            px = lons[:, None]
+            crosses = (y1 > py) != (y2 > py)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                x_at = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+            inside ^= (np.count_nonzero(crosses & (px < x_at), axis=1) % 2).astype(bool)
+        inside_any |= inside
+    return inside_any
+
+
+def polygon_area_km2(polygons: List[List[np.ndarray]]) -> float:
+    """Shoelace area on a local equirectangular projection (outer minus holes)."""
+    total = 0.0
+    for rings in polygons:
+        for k, ring in enumerate(rings):
+            lat0 = math.radians(float(np.mean(ring[:, 1])))
+            x = ring[:, 0] * EARTH_KM_PER_DEG * math.cos(lat0)
+            y = ring[:, 1] * EARTH_KM_PER_DEG
+            a = 0.5 * abs(float(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1])))
+            total += a if k == 0 else -a
+    return max(total, 0.0)
+
+
+def _weighted_percentiles(values: np.ndarray, weights: np.ndarray, qs) -> List[float]:
+    order = np.argsort(values)
+    v, w = values[order], weights[order]
+    cum = np.cumsum(w) - 0.5 * w
+    cum /= w.sum()
+    return [float(np.interp(q / 100.0, cum, v)) for q in qs]
+
+
+def score_area(
+    geometry: dict,
+    factor_fn: Callable[[float, float], dict],
+    score_fn: Callable[[np.ndarray], np.ndarray],
+    *,
+    executor=None,
+    initial_grid: int = 6,
+    max_samples: int = 96,
+    max_depth: int = 4,
+    min_variation: float = 5.0,
+    include_samples: bool = False,
+    prefetch: Optional[Callable[[np.ndarray, np.ndarray], Any]] = None,
+) -> Dict:
+    """Score a polygon.
+
+    ``factor_fn(lat, lon)`` returns the per-point factor dict (see
+    app._compute_factors); ``score_fn`` maps an (N, 8) factor matrix in
+    FACTOR_ORDER to N scores. Samples are evaluated through ``executor`` when
+    given; ``prefetch(lats, lons)``, when given, runs first for each round of
+    samples (e.g. batched Overpass lookups filling the factor cache).
+    """
+    polygons = polygon_rings(geometry)
+    all_pts = np.concatenate([r for rings in polygons for r in rings[:1]])
+    west, south = all_pts.min(axis=0)
+    east, north = all_pts.max(axis=0)
+    h0 = max(east - west, north - south) / max(int(initial_grid), 1)
+    if h0 <= 0:
+        raise ValueError("polygon is degenerate")
+
+    def _grid(cx: np.ndarray, cy: np.ndarray, h: float):
+        keep = points_in_polygons(cy, cx, polygons)
+        return cy[keep], cx[keep], np.full(int(keep.sum()), h)
+
+    nx = max(int(math.ceil((east - west) / h0)), 1)
+    ny = max(int(math.ceil((north - south) / h0)), 1)
+    gx, gy = np.meshgrid(west + (np.arange(nx) + 0.5) * h0, south + (np.arange(ny) + 0.5) * h0)
+    lats, lons, sizes = _grid(gx.ravel(), gy.ravel(), h0)
+    if len(lats) == 0:
+        # Thin polygon: fall back to its vertex centroid.
+        lats, lons, sizes = np.array([all_pts[:, 1].mean()]), np.array([all_pts[:, 0].mean()]), np.array([h0])
+    depth = np.zeros(len(lats), dtype=np.int64)
+    degraded = [0]
+
+    def _evaluate(lat_arr, lon_arr):
+        if prefetch is not None and len(lat_arr):
+            prefetch(lat_arr, lon_arr)
+        pairs = list(zip(lat_arr.tolist(), lon_arr.tolist()))
+        results = list(executor.map(lambda p: factor_fn(*p), pairs)) if executor else [factor_fn(*p) for p in pairs]
+        F = np.full((len(results), len(FACTOR_ORDER)), np.nan)
+        water = np.zeros(len(results), dtype=bool)
+        for i, r in enumerate(results):
+            degraded[0] += bool(r.get("degraded"))
+            water[i] = bool(r.get("on_water"))
+            if not water[i]:
+                F[i] = [np.nan if r.get(name) is None else float(r[name]) for name in FACTOR_ORDER]
+        return F, water
+
+    F, water = _evaluate(lats, lons)
+    refined = 0
+
+    def _scores(F, water):
+        s = np.zeros(len(F))
+        land = ~water
+        if land.any():
+            s[land] = score_fn(F[land])
+        return s
+
+    scores = _scores(F, water)
+    while len(lats) < max_samples:
+        budget = (max_samples - len(lats)) // 3  # each split nets +3 samples
+        if budget <= 0:
+            break
+        # Largest score difference to any neighbouring sample (vectorized pairwise).
+        reach = 1.5 * np.maximum(sizes[:, None], sizes[None, :])
+        near = (np.abs(lats[:, None] - lats[None, :]) <= reach) & (np.abs(lons[:, None] - lons[None, :]) <= reach)
+        variation = np.where(near, np.abs(scores[:, None] - scores[None, :]), 0.0).max(axis=1)
+        variation[depth >= max_depth] = -1.0
+        split = np.argsort(-variation)[:budget]
+        split = split[variation[split] >= min_variation]
+        if len(split) == 0:
+            break
+        q = sizes[split] / 4.0
+        offsets = np.array([(-1, -1), (-1, 1), (1, -1), (1, 1)], dtype=np.float64)
+        c_lat = (lats[split][:, None] + offsets[None, :, 0] * q[:, None]).ravel()
+        c_lon = (lons[split][:, None] + offsets[None, :, 1] * q[:, None]).ravel()
+        c_size = np.repeat(sizes[split] / 2.0, 4)
+        c_depth = np.repeat(depth[split] + 1, 4)
+        keep = points_in_polygons(c_lat, c_lon, polygons)
+        inside = keep.reshape(-1, 4).any(axis=1)
+        # A parent is replaced only if at least one child lies inside the
+        # polygon; one with none stays and is never picked again.
+        depth[split[~inside]] = max_depth
+        if not inside.any():
+            break
+        c_lat, c_lon, c_size, c_depth = c_lat[keep], c_lon[keep], c_size[keep], c_depth[keep]
+        cF, cwater = _evaluate(c_lat, c_lon)
+        stay = np.ones(len(lats), dtype=bool)
+        stay[split[inside]] = False
+        lats = np.concatenate([lats[stay], c_lat])
+        lons = np.concatenate([lons[stay], c_lon])
+        sizes = np.concatenate([sizes[stay], c_size])
+        depth = np.concatenate([depth[stay], c_depth])
+        F = np.concatenate([F[stay], cF])
+        water = np.concatenate([water[stay], cwater])
+        scores = np.concatenate([scores[stay], _scores(cF, cwater)])
+        refined += int(inside.sum())
+
+    # Cell area weights (degrees² scaled by cos(lat) for longitude shrinkage)
+    weights = sizes ** 2 * np.cos(np.radians(lats))
+    weights = weights / weights.sum()
+    p10, p25, p50, p75, p90 = _weighted_percentiles(scores, weights, (10, 25, 50, 75, 90))
+
+    land = ~water
+    factor_means = {}
+    if land.any():
+        lw = weights[land] / weights[land].sum()
+        Fl = F[land]
+        valid = ~np.isnan(Fl)
+        sums = np.where(valid, Fl, 0.0).T @ lw
+        norms = valid.T.astype(np.float64) @ lw
+        for k, name in enumerate(FACTOR_ORDER):
+            if norms[k] > 0:
+                factor_means[name] = round(float(sums[k] / norms[k]), 2)
+    worst = min(factor_means.items(), key=lambda kv: kv[1]) if factor_means else None
+
+    out = {
+        "samples": int(len(lats)),
+        "refined_cells": int(refined),
+        "area_km2": round(polygon_area_km2(polygons), 4),
+        "score": {
+            "min": round(float(scores.min()), 2),
+            "mean": round(float(np.dot(scores, weights)), 2),
+            "max": round(float(scores.max()), 2),
+            "p10": round(p10, 2),
+            "p25": round(p25, 2),
+            "p50": round(p50, 2),
+            "p75": round(p75, 2),
+            "p90": round(p90, 2),
+        },
+        "factor_means": factor_means,
+        "worst_factor": {"name": worst[0], "mean": worst[1]} if worst else None,
+        "water_fraction": round(float(np.dot(water.astype(np.float64), weights)), 4),
+        "degraded_samples": degraded[0],
+    }
+    if include_samples:
+        out["sample_points"] = [
+            {"latitude": float(a), "longitude": float(b), "score": round(float(c), 2), "on_water": bool(d)}
+            for a, b, c, d in zip(lats, lons, scores, water)
+        ]
+    return out
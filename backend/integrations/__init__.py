@@ -6,28 +6,78 @@ dependencies are unavailable, returning sensible defaults.
 """
 
 from .paths import get_workspace_root, get_project_path
-from .aggregator import compute_suitability_score
+from .aggregator import compute_suitability_score, score_matrix, normalize_weights, FACTOR_ORDER, FACTOR_WEIGHTS
 from .floodml_adapter import estimate_flood_risk_score
 from .pylusat_adapter import compute_proximity_score
-from .pylandslide_adapter import estimate_landslide_risk_score
-from .water_adapter import estimate_water_proximity_score
-from .pollution_adapter import estimate_pollution_score
+from .pylandslide_adapter import estimate_landslide_risk_score, sync_landslide_catalogue, start_landslide_sync
+from .water_adapter import estimate_water_proximity_score, is_on_water, load_water_mask
+from .pollution_adapter import estimate_pollution_score, sync_air_quality_stations, start_air_quality_sync
 from .landuse_adapter import infer_landuse_score
 from .soil_adapter import estimate_soil_quality_score
 from .rainfall_adapter import estimate_rainfall_score
+from .pipeline import run_factor_pipeline, evaluate_factor, preload_local_data, FACTOR_SPECS, FactorSpec, WATER_VETO_KM
+from .cache import cached_factor, peek_factor, peek_factor_matrix, stored_factor_matrix, stored_cells_in_bbox, factor_cache, cell_key, FACTOR_RESOLUTION_DEG, load_cache_snapshot, save_cache_snapshot
+from .request_context import deadline_scope, DeadlineExceeded
+from .upstreams import enable_rate_limits, configure_rate_limits
+from .tracing import span, trace_scope
+from .factor_store import factor_store, load_factor_store, start_factor_store_snapshots
+from .overpass_batch import prefetch_overpass, OVERPASS_LAYERS, load_tile_snapshot, save_tile_snapshot
+from .result_memo import configure_result_memo, get_result_memo, MEMO_REUSE_KM
 
 __all__ = [
 	"get_workspace_root",
 	"get_project_path",
 	"compute_suitability_score",
+	"score_matrix",
+	"normalize_weights",
+	"FACTOR_ORDER",
+	"FACTOR_WEIGHTS",
 	"estimate_flood_risk_score",
 	"compute_proximity_score",
 	"estimate_landslide_risk_score",
+	"sync_landslide_catalogue",
+	"start_landslide_sync",
 	"estimate_water_proximity_score",
+	"is_on_water",
+	"load_water_mask",
 	"estimate_pollution_score",
+	"sync_air_quality_stations",
+	"start_air_quality_sync",
 	"infer_landuse_score",
 	"estimate_soil_quality_score",
 	"estimate_rainfall_score",
+	"run_factor_pipeline",
+	"evaluate_factor",
+	"preload_local_data",
+	"FACTOR_SPECS",
+	"FactorSpec",
+	"WATER_VETO_KM",
+	"cached_factor",
+	"peek_factor",
+	"peek_factor_matrix",
+	"stored_factor_matrix",
+	"stored_cells_in_bbox",
+	"factor_cache",
+	"cell_key",
+	"FACTOR_RESOLUTION_DEG",
+	"load_cache_snapshot",
+	"save_cache_snapshot",
+	"deadline_scope",
+	"DeadlineExceeded",
+	"enable_rate_limits",
+	"configure_rate_limits",
+	"span",
+	"trace_scope",
+	"factor_store",
+	"load_factor_store",
+	"start_factor_store_snapshots",
+	"prefetch_overpass",
+	"OVERPASS_LAYERS",
+	"load_tile_snapshot",
+	"save_tile_snapshot",
+	"configure_result_memo",
+	"get_result_memo",
+	"MEMO_REUSE_KM",
 ]
 
 
@@ -1,4 +1,31 @@
 from typing import Dict, Optional
+import numpy as np
+
+# Canonical factor order shared by the ML feature vector, the training dataset
+# and every vectorized scoring path.
+FACTOR_ORDER = (
+	"rainfall",
+	"flood",
+	"landslide",
+	"soil",
+	"proximity",
+	"water",
+	"pollution",
+	"landuse",
+)
+
+# Simple weighted sum (weights sum to 1.0)
+FACTOR_WEIGHTS = {
+	"rainfall": 0.12,
+	"flood": 0.20,
+	"landslide": 0.10,
+	"soil": 0.18,
+	"proximity": 0.10,
+	"water": 0.10,
+	"pollution": 0.10,
+	"landuse": 0.10,
+}
+
 def _normalize_optional(value: Optional[float], default: float) -> float:
 	if value is None:
 		return default
@@ -46,17 +73,7 @@ def compute_suitability_score(
 	pollution = _normalize_optional(pollution_score, 50.0)
 	landuse = _normalize_optional(landuse_score, 50.0)
 
-	# Simple weighted sum (weights sum to 1.0)
-	weights = {
-		"rainfall": 0.12,
-		"flood": 0.20,
-		"landslide": 0.10,
-		"soil": 0.18,
-		"proximity": 0.10,
-		"water": 0.10,
-		"pollution": 0.10,
-		"landuse": 0.10,
-	}
+	weights = FACTOR_WEIGHTS
 
 	score = (
 		rainfall * weights["rainfall"]
@@ -82,3 +99,39 @@ def compute_suitability_score(
 	}
 
 
+def normalize_weights(weights: Dict[str, float], normalize: bool = True) -> Dict[str, float]:
+	"""Validate user-supplied weights: known factors only, non-negative, not
+	all zero. Factors left out weigh 0; with ``normalize`` they are scaled
+	to sum to 1 so scores stay in [0, 100]."""
+	unknown = sorted(set(weights) - set(FACTOR_ORDER))
+	if unknown:
+		raise ValueError(f"unknown factors in weights: {', '.join(unknown)}")
+	out = {}
+	for name in FACTOR_ORDER:
+		value = float(weights.get(name, 0.0))
+		if not np.isfinite(value) or value < 0:
+			raise ValueError(f"weight for {name} must be a non-negative number")
+		out[name] = value
+	total = sum(out.values())
+	if total <= 0:
+		raise ValueError("weights must not all be zero")
+	if normalize:
+		out = {name: value / total for name, value in out.items()}
+	return out
+
+
+def weight_vector(weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+	"""Return weights as an array in FACTOR_ORDER (defaults to FACTOR_WEIGHTS)."""
+	weights = weights or FACTOR_WEIGHTS
+	return np.array([float(weights.get(name, 0.0)) for name in FACTOR_ORDER], dtype=np.float64)
+
+
+def score_matrix(factors: np.ndarray, weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+	"""Vectorized compute_suitability_score over an (N, 8) array in FACTOR_ORDER.
+
+	NaN entries are treated as missing and replaced with the neutral 50, values
+	are clipped to [0, 100] and scores are rounded like the scalar version.
+	"""
+	f = np.asarray(factors, dtype=np.float64)
+	f = np.clip(np.where(np.isnan(f), 50.0, f), 0.0, 100.0)
+	return np.round(f @ weight_vector(weights), 2)
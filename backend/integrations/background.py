@@ -0,0 +1,87 @@
+"""Periodic background jobs (data syncs) running on daemon threads."""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Generic, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+_jobs: Dict[str, threading.Thread] = {}
+_lock = threading.Lock()
+
+
+def start_periodic(name: str, interval_s: float, fn: Callable[[], object], initial_delay_s: float = 0.0) -> bool:
+	"""Run ``fn`` every ``interval_s`` seconds on a daemon thread.
+
+	Idempotent per ``name`` within a process; returns False if already running.
+	Exceptions are logged and never stop the schedule.
+	"""
+	with _lock:
+		if name in _jobs and _jobs[name].is_alive():
+			return False
+
+		def _loop():
+			stop = threading.Event()
+			if initial_delay_s:
+				stop.wait(initial_delay_s)
+			while True:
+				try:
+					fn()
+				except Exception as e:
+					logger.warning(f"background job {name} failed: {e}")
+				stop.wait(interval_s)
+
+		t = threading.Thread(target=_loop, name=f"geoai-{name}", daemon=True)
+		_jobs[name] = t
+		t.start()
+		return True
+
+
+T = TypeVar("T")
+
+
+class ReloadingStore(Generic[T]):
+	"""In-memory value built from a store file and rebuilt when the file changes.
+
+	Syncs run in one process (the worker holding the sync lock under
+	serve.py); every other process notices the rewritten file by its mtime,
+	checked at most every ``check_interval_s``, so lookups stay a plain
+	attribute read.
+	"""
+
+	def __init__(self, path: str, build: Callable[[], T], check_interval_s: float = 30.0):
+		self.path = path
+		self._build = build
+		self.check_interval_s = check_interval_s
+		self._value: Optional[T] = None
+		self._mtime: Optional[float] = None
+		self._checked_at = 0.0
+		self._lock = threading.Lock()
+
+	def _file_mtime(self) -> Optional[float]:
+		try:
+			return os.stat(self.path).st_mtime
+		except OSError:
+			return None
+
+	def get(self) -> T:
+		now = time.monotonic()
+		if self._value is not None and now - self._checked_at < self.check_interval_s:
+			return self._value
+		with self._lock:
+			if self._value is None or now - self._checked_at >= self.check_interval_s:
+				mtime = self._file_mtime()
+				if self._value is None or mtime != self._mtime:
+					self._value = self._build()
+					self._mtime = mtime
+				self._checked_at = now
+			return self._value
+
+	def set(self, value: T) -> None:
+		"""Install a value this process just built and wrote to the file."""
+		with self._lock:
+			self._value = value
+			self._mtime = self._file_mtime()
+			self._checked_at = time.monotonic()
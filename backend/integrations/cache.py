@@ -0,0 +1,369 @@
+"""Per-cell factor cache shared by all scoring endpoints.
+
+Each factor is cached on its own lat/lon grid: slowly varying factors
+(rainfall, pollution) use coarse cells, the local rasters fine ones. A value
+computed for any point in a cell is reused for every later point in that
+cell until it expires. Water distance and road proximity are not cached
+here: they change within metres, so they are computed per exact point from
+features cached per tile (overpass_tiles.py) and only recorded in the
+factor store.
+
+Slowly changing factors additionally have a soft window
+(stale-while-revalidate): past it, the cached value is still returned
+immediately while a background worker refreshes the cell; only past the
+hard expiry does a request wait for the upstream.
+
+Values are also written through to the compact factor store
+(factor_store.py), which outlives the process via memory-mapped snapshots;
+a cache miss is answered from it when it holds a fresh value for the point
+and its cells are no coarser than the factor's cache cells.
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+from .aggregator import FACTOR_ORDER
+from .factor_store import STORE_ENABLED, factor_store
+from .paths import get_data_path
+from .request_context import cancelled
+from .tracing import annotate
+
+# Cell size in degrees per factor (~111 km per degree of latitude).
+FACTOR_RESOLUTION_DEG: Dict[str, float] = {
+	"rainfall": 0.1,
+	"pollution": 0.05,
+	"landslide": 0.05,
+	"flood": 0.001,
+	"soil": 0.001,
+	"landuse": 0.002,
+}
+
+# Hard expiry: seconds a cached value may be served at all.
+FACTOR_TTL_S: Dict[str, float] = {
+	"rainfall": 6 * 3600,
+	"pollution": 3600,
+	"landslide": 24 * 3600,
+	"flood": 7 * 24 * 3600,
+	"soil": 7 * 24 * 3600,
+	"landuse": 24 * 3600,
+	"proximity": 24 * 3600,
+	"water": 24 * 3600,
+}
+
+# Soft window: seconds after which a value is refreshed in the background
+# (factors not listed are never served stale).
+FACTOR_SOFT_TTL_S: Dict[str, float] = {
+	"rainfall": 3600,
+	"pollution": 900,
+	"landslide": 6 * 3600,
+}
+
+
+def _apply_window_overrides(spec: str) -> None:
+	"""GEOAI_CACHE_WINDOWS="rainfall=1800:21600,pollution=600:3600" (soft:hard seconds)."""
+	for part in spec.split(","):
+		if not part.strip():
+			continue
+		name, _, windows = part.partition("=")
+		soft, _, hard = windows.partition(":")
+		name = name.strip()
+		if hard.strip():
+			FACTOR_TTL_S[name] = float(hard)
+		if soft.strip():
+			FACTOR_SOFT_TTL_S[name] = float(soft)
+
+
+_apply_window_overrides(os.getenv("GEOAI_CACHE_WINDOWS", ""))
+
+CACHE_MAX_ENTRIES = int(os.getenv("GEOAI_FACTOR_CACHE_SIZE", "200000"))
+
+# Written by tools/prewarm.py, loaded by the server at startup.
+CACHE_SNAPSHOT_PATH = get_data_path("stores", "factor_cache.json")
+
+logger = logging.getLogger(__name__)
+
+CellKey = Tuple[str, int, int]
+
+
+def cell_key(factor: str, lat: float, lon: float) -> CellKey:
+	res = FACTOR_RESOLUTION_DEG.get(factor, 0.001)
+	return factor, int(math.floor(lat / res)), int(math.floor(lon / res))
+
+
+def cell_center(key: CellKey) -> Tuple[float, float]:
+	factor, i, j = key
+	res = FACTOR_RESOLUTION_DEG.get(factor, 0.001)
+	return (i + 0.5) * res, (j + 0.5) * res
+
+
+class FactorCache:
+	"""Thread-safe TTL + LRU map of cell key -> (value, stored_at)."""
+
+	def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+		self.max_entries = max_entries
+		self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, key: CellKey, default=None):
+		item = self.get_item(key)
+		return default if item is None else item[0]
+
+	def get_item(self, key: CellKey) -> Optional[Tuple[Any, float]]:
+		"""(value, stored_at) unless missing or past the hard expiry."""
+		ttl = FACTOR_TTL_S.get(key[0], 3600)
+		with self._lock:
+			item = self._data.get(key)
+			if item is None:
+				return None
+			if time.time() - item[1] > ttl:
+				del self._data[key]
+				return None
+			self._data.move_to_end(key)
+			return item
+
+	def set(self, key: CellKey, value) -> None:
+		with self._lock:
+			self._data[key] = (value, time.time())
+			self._data.move_to_end(key)
+			while len(self._data) > self.max_entries:
+				self._data.popitem(last=False)
+
+	def __len__(self) -> int:
+		return len(self._data)
+
+	def items(self):
+		"""Snapshot of (key, value, stored_at) for unexpired entries."""
+		now = time.time()
+		with self._lock:
+			return [
+				(key, value, stored_at)
+				for key, (value, stored_at) in self._data.items()
+				if now - stored_at <= FACTOR_TTL_S.get(key[0], 3600)
+			]
+
+	def load_items(self, items) -> int:
+		"""Merge (key, value, stored_at) entries, keeping the newer of each
+		cell and skipping expired ones. Returns the number taken."""
+		now = time.time()
+		taken = 0
+		with self._lock:
+			for key, value, stored_at in items:
+				if now - stored_at > FACTOR_TTL_S.get(key[0], 3600):
+					continue
+				current = self._data.get(key)
+				if current is not None and current[1] >= stored_at:
+					continue
+				self._data[key] = (value, stored_at)
+				taken += 1
+			while len(self._data) > self.max_entries:
+				self._data.popitem(last=False)
+		return taken
+
+
+factor_cache = FactorCache()
+
+
+def _store_serves(factor: str) -> bool:
+	"""Whether a factor store cell may stand in for the factor's cache cell:
+	only when it is no coarser, and never for factors not cached per cell
+	(water, proximity), whose stored values hold for one exact point."""
+	res = FACTOR_RESOLUTION_DEG.get(factor)
+	return res is not None and factor_store.resolution_deg <= res + 1e-12
+
+
+def peek_factor(factor: str, lat: float, lon: float, default=None):
+	"""Cached value for the point's cell without computing anything."""
+	return factor_cache.get(cell_key(factor, lat, lon), default)
+
+
+def peek_factor_matrix(lats, lons) -> np.ndarray:
+	"""(N, 8) known factor scores in FACTOR_ORDER for points, from the factor
+	store (for the factors it may serve, see _store_serves) and the cache,
+	without computing anything; NaN where unknown."""
+	lats = np.asarray(lats, dtype=np.float64).reshape(-1)
+	lons = np.asarray(lons, dtype=np.float64).reshape(-1)
+	if STORE_ENABLED:
+		matrix = factor_store.factor_matrix(lats, lons, FACTOR_TTL_S)
+		matrix[:, [not _store_serves(name) for name in FACTOR_ORDER]] = np.nan
+	else:
+		matrix = np.full((len(lats), len(FACTOR_ORDER)), np.nan)
+	return _fill_from_cache(matrix, lats, lons)
+
+
+def _fill_from_cache(matrix: np.ndarray, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+	# Coarse cells (rainfall, pollution, ...) often cover points the fine
+	# store grid has never seen.
+	for k, name in enumerate(FACTOR_ORDER):
+		for i in np.flatnonzero(np.isnan(matrix[:, k])):
+			value = factor_cache.get(cell_key(name, lats[i], lons[i]))
+			score = value[0] if isinstance(value, tuple) else value
+			if score is not None:
+				matrix[i, k] = float(score)
+	return matrix
+
+
+def _stored_water_km(records: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+	"""Stored water distance behind each known water score; NaN elsewhere."""
+	known = ~np.isnan(matrix[:, FACTOR_ORDER.index("water")])
+	return np.where(known, records["water_distance_km"].astype(np.float64), np.nan)
+
+
+def stored_factor_matrix(lats, lons) -> Tuple[np.ndarray, np.ndarray]:
+	"""((N, 8) scores, (N,) water distance km) as earlier requests left them
+	in the points' factor store cells, gaps filled from the cache; NaN where
+	unknown. For what-if re-scoring: unlike peek_factor_matrix it includes
+	the stored water and proximity values, which were computed for some
+	point of the cell rather than this one."""
+	lats = np.asarray(lats, dtype=np.float64).reshape(-1)
+	lons = np.asarray(lons, dtype=np.float64).reshape(-1)
+	if not STORE_ENABLED:
+		matrix = np.full((len(lats), len(FACTOR_ORDER)), np.nan)
+		return _fill_from_cache(matrix, lats, lons), np.full(len(lats), np.nan)
+	records, _ = factor_store.lookup(lats, lons)
+	matrix = factor_store.records_matrix(records, FACTOR_TTL_S)
+	water_km = _stored_water_km(records, matrix)
+	return _fill_from_cache(matrix, lats, lons), water_km
+
+
+def stored_cells_in_bbox(west: float, south: float, east: float, north: float):
+	"""(lats, lons, (N, 8) scores, (N,) water distance km) of every factor
+	store cell in the bbox with at least one unexpired factor; cell centres,
+	NaN where unknown."""
+	if not STORE_ENABLED:
+		return np.empty(0), np.empty(0), np.empty((0, len(FACTOR_ORDER))), np.empty(0)
+	records = factor_store.query_bbox(west, south, east, north)
+	matrix = factor_store.records_matrix(records, FACTOR_TTL_S)
+	keep = ~np.isnan(matrix).all(axis=1)
+	lats, lons = factor_store.cell_center(records["cell"][keep])
+	return lats, lons, matrix[keep], _stored_water_km(records[keep], matrix[keep])
+
+
+def save_cache_snapshot(path: str = CACHE_SNAPSHOT_PATH, cache: Optional[FactorCache] = None) -> int:
+	"""Write the cache to ``path`` (atomically). Returns the entry count."""
+	entries = (cache or factor_cache).items()
+	rows = [
+		[key[0], key[1], key[2], list(value) if isinstance(value, tuple) else value, isinstance(value, tuple), stored_at]
+		for key, value, stored_at in entries
+	]
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	with open(path + ".tmp", "w", encoding="utf-8") as f:
+		json.dump({"saved_at": time.time(), "entries": rows}, f)
+	os.replace(path + ".tmp", path)
+	return len(rows)
+
+
+def load_cache_snapshot(path: str = CACHE_SNAPSHOT_PATH, cache: Optional[FactorCache] = None) -> int:
+	"""Merge a snapshot written by save_cache_snapshot; 0 if there is none."""
+	try:
+		with open(path, "r", encoding="utf-8") as f:
+			rows = json.load(f).get("entries") or []
+	except (OSError, ValueError):
+		return 0
+	return (cache or factor_cache).load_items(
+		((factor, int(i), int(j)), tuple(value) if is_tuple else value, float(stored_at))
+		for factor, i, j, value, is_tuple, stored_at in rows
+	)
+
+
+def _cacheable(value) -> bool:
+	# Adapters signal upstream failure with None (or a None first evidence
+	# value in (score, evidence, ...) tuples); those must not pin a fallback
+	# into the cache.
+	if value is None:
+		return False
+	if isinstance(value, tuple) and len(value) > 1 and value[1] is None:
+		return False
+	return True
+
+
+_refresh_executor = ThreadPoolExecutor(
+	max_workers=int(os.getenv("GEOAI_CACHE_REFRESH_WORKERS", "4")),
+	thread_name_prefix="geoai-refresh",
+)
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def _store(key: CellKey, lat: float, lon: float, value) -> None:
+	factor_cache.set(key, value)
+	if STORE_ENABLED:
+		factor_store.put(key[0], lat, lon, value)
+
+
+def _from_store(key: CellKey, lat: float, lon: float) -> Optional[Tuple[Any, float]]:
+	"""Fresh (value, stored_at) from the factor store, seeded into the cache."""
+	if not STORE_ENABLED or not _store_serves(key[0]):
+		return None
+	item = factor_store.get(key[0], lat, lon)
+	if item is None or time.time() - item[1] > FACTOR_TTL_S.get(key[0], 3600):
+		return None
+	factor_cache.load_items([(key, item[0], item[1])])
+	return item
+
+
+def _refresh(key: CellKey, lat: float, lon: float, compute: Callable[[float, float], Any]) -> None:
+	try:
+		value = compute(lat, lon)
+		if _cacheable(value):
+			_store(key, lat, lon, value)
+	except Exception as e:
+		logger.warning(f"Background refresh of {key[0]} failed: {e}")
+	finally:
+		with _refreshing_lock:
+			_refreshing.discard(key)
+
+
+def _schedule_refresh(key: CellKey, lat: float, lon: float, compute: Callable[[float, float], Any]) -> None:
+	with _refreshing_lock:
+		if key in _refreshing:
+			return
+		_refreshing.add(key)
+	# Plain submit: the refresh must not inherit the request's deadline or
+	# cancel flag, it outlives the request by design.
+	_refresh_executor.submit(_refresh, key, lat, lon, compute)
+
+
+def cached_factor(factor: str, lat: float, lon: float, compute: Callable[[float, float], Any]):
+	"""Return the cached value for the point's cell, computing it on a miss.
+
+	A value past the factor's soft window is returned as is and refreshed in
+	the background (one refresh per cell at a time).
+
+	Exceptions from ``compute`` propagate and nothing is cached for them, nor
+	for values computed after the request was cancelled or ran out of time
+	(adapters return partial answers then).
+	"""
+	key = cell_key(factor, lat, lon)
+	item = factor_cache.get_item(key) or _from_store(key, lat, lon)
+	if item is not None:
+		soft = FACTOR_SOFT_TTL_S.get(factor)
+		if soft is not None and time.time() - item[1] > soft:
+			annotate(cache="stale")
+			_schedule_refresh(key, lat, lon, compute)
+		else:
+			annotate(cache="hit")
+		return item[0]
+	annotate(cache="miss")
+	value = compute(lat, lon)
+	if _cacheable(value) and not cancelled():
+		_store(key, lat, lon, value)
+	return value
+
+
+def store_factor(factor: str, lat: float, lon: float, value) -> bool:
+	"""Record a value computed for (lat, lon) in the factor store only, for
+	factors not cached per cell; False (and nothing stored) for failure
+	values or after the request was cancelled."""
+	if not STORE_ENABLED or not _cacheable(value) or cancelled():
+		return False
+	factor_store.put(factor, lat, lon, value)
+	return True
@@ -0,0 +1,391 @@
+"""Compact per-cell store of factor values.
+
+One fixed-width record per grid cell (STORE_RESOLUTION_DEG, ~110 m by
+default) in a NumPy structured array sorted by integer cell id:
+
+    cell        int64    row * columns + column on the store grid
+    scores      uint16x8 factor scores in hundredths, FACTOR_ORDER, 0xFFFF = unknown
+    <evidence>  float    raw values behind the scores (rainfall total, water
+                         distance, PM2.5, interpolation confidences), NaN = unknown
+    stored_at   uint16x8 minutes since the store's epoch per factor, 0 = unknown
+
+52 bytes a cell, so a million cells take ~50 MB where the equivalent dicts
+take well over a kilobyte each. Lookups binary-search the sorted array; new
+cells go to an append buffer that is merged in once it grows large.
+
+Snapshots are plain ``.npy`` files loaded with ``mmap_mode="c"``: a
+restarted worker maps the file and is warm at once, pages are read on
+demand, and writes land in private copy-on-write pages. Workers each save
+periodically, merging with what is on disk (newer value per factor wins),
+so the snapshot accumulates every worker's cells.
+
+The per-cell factor cache (cache.py) writes through to this store and
+falls back to it on a miss; ranking and re-weighting read it directly.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from .aggregator import FACTOR_ORDER
+from .paths import get_data_path
+
+try:
+	import fcntl
+except ImportError:  # Windows: snapshots are not merged across processes
+	fcntl = None
+
+logger = logging.getLogger(__name__)
+
+STORE_RESOLUTION_DEG = float(os.getenv("GEOAI_STORE_RESOLUTION_DEG", "0.001"))
+STORE_SNAPSHOT_PATH = os.getenv("GEOAI_FACTOR_STORE_PATH") or get_data_path("stores", "factor_store.npy")
+
+# Evidence fields per factor, in the order they follow the score in the
+# adapter's (score, evidence, ...) value.
+STORE_EVIDENCE: Dict[str, Tuple[str, ...]] = {
+	"rainfall": ("rainfall_total_mm_60d", "rainfall_interpolation_confidence"),
+	"water": ("water_distance_km",),
+	"pollution": ("pm25_ugm3", "pm25_interpolation_confidence"),
+}
+
+STORE_DTYPE = np.dtype([
+	("cell", "<i8"),
+	("scores", "<u2", (len(FACTOR_ORDER),)),
+	("rainfall_total_mm_60d", "<f2"),
+	("rainfall_interpolation_confidence", "<f2"),
+	("water_distance_km", "<f4"),
+	("pm25_ugm3", "<f2"),
+	("pm25_interpolation_confidence", "<f2"),
+	("stored_at", "<u2", (len(FACTOR_ORDER),)),
+])
+
+_NO_SCORE = 0xFFFF
+_FACTOR_INDEX = {name: k for k, name in enumerate(FACTOR_ORDER)}
+# uint16 minutes cover 45 days; past REBASE_AFTER_S the epoch moves forward,
+# dropping stamps older than KEEP_S (longer than any factor's TTL).
+_MAX_MINUTES = 0xFFFF
+REBASE_AFTER_S = 30 * 86400
+KEEP_S = 8 * 86400
+BUFFER_LIMIT = int(os.getenv("GEOAI_FACTOR_STORE_BUFFER", "65536"))
+
+
+def _empty(n: int) -> np.ndarray:
+	records = np.zeros(n, dtype=STORE_DTYPE)
+	records["scores"] = _NO_SCORE
+	for fields in STORE_EVIDENCE.values():
+		for field in fields:
+			records[field] = np.nan
+	return records
+
+
+def _rebase(records: np.ndarray, from_epoch: float, to_epoch: float) -> None:
+	"""Re-express stamps relative to ``to_epoch`` in place (stamps that fall
+	before it become unknown)."""
+	shift = int(round((to_epoch - from_epoch) / 60.0))
+	if shift == 0 or len(records) == 0:
+		return
+	stamps = records["stored_at"].astype(np.int64)
+	known = stamps > 0
+	stamps = np.where(known, stamps - shift, 0)
+	stamps[known & (stamps < 1)] = 0
+	records["stored_at"] = np.clip(stamps, 0, _MAX_MINUTES).astype(np.uint16)
+
+
+def merge_records(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+	"""Union of two cell-sorted record arrays with the same epoch; for cells
+	in both, each factor keeps the newer value."""
+	both = np.concatenate([a, b])
+	both = both[np.argsort(both["cell"], kind="stable")]
+	if len(both) < 2:
+		return both
+	dup = np.flatnonzero(both["cell"][1:] == both["cell"][:-1])
+	if len(dup) == 0:
+		return both
+	first, second = both[dup], both[dup + 1]
+	take = second["stored_at"] > first["stored_at"]
+	first["scores"] = np.where(take, second["scores"], first["scores"])
+	first["stored_at"] = np.where(take, second["stored_at"], first["stored_at"])
+	for factor, fields in STORE_EVIDENCE.items():
+		newer = take[:, _FACTOR_INDEX[factor]]
+		for field in fields:
+			first[field] = np.where(newer, second[field], first[field])
+	both[dup] = first
+	return np.delete(both, dup + 1)
+
+
+class FactorStore:
+	"""Sorted record array plus an append buffer; thread-safe."""
+
+	def __init__(self, resolution_deg: float = STORE_RESOLUTION_DEG, buffer_limit: int = BUFFER_LIMIT):
+		self.resolution_deg = resolution_deg
+		self.buffer_limit = buffer_limit
+		self._columns = int(round(360.0 / resolution_deg)) + 1
+		self.epoch = float(int(time.time() - KEEP_S) // 60 * 60)
+		self._main = _empty(0)
+		self._buffer = _empty(1024)
+		self._buffer_rows: Dict[int, int] = {}
+		self._lock = threading.RLock()
+
+	def __len__(self) -> int:
+		return len(self._main) + len(self._buffer_rows)
+
+	@property
+	def nbytes(self) -> int:
+		return self._main.nbytes + self._buffer.nbytes
+
+	def cell_ids(self, lat, lon) -> np.ndarray:
+		"""Vectorized lat/lon -> cell id on the store grid."""
+		row = np.floor((np.asarray(lat, dtype=np.float64) + 90.0) / self.resolution_deg).astype(np.int64)
+		col = np.floor((np.asarray(lon, dtype=np.float64) + 180.0) / self.resolution_deg).astype(np.int64)
+		return row * self._columns + col
+
+	def cell_center(self, cells) -> Tuple[np.ndarray, np.ndarray]:
+		cells = np.asarray(cells, dtype=np.int64)
+		row, col = np.divmod(cells, self._columns)
+		return (row + 0.5) * self.resolution_deg - 90.0, (col + 0.5) * self.resolution_deg - 180.0
+
+	def _stamp(self, t: float) -> int:
+		if t - self.epoch >= REBASE_AFTER_S:
+			new_epoch = float(int(t - KEEP_S) // 60 * 60)
+			_rebase(self._main, self.epoch, new_epoch)
+			_rebase(self._buffer[: len(self._buffer_rows)], self.epoch, new_epoch)
+			self.epoch = new_epoch
+		return int(min(max(round((t - self.epoch) / 60.0), 1), _MAX_MINUTES))
+
+	def _row(self, cell: int, create: bool):
+		"""(array, index) holding ``cell``; appended to the buffer if asked."""
+		i = int(np.searchsorted(self._main["cell"], cell))
+		if i < len(self._main) and self._main["cell"][i] == cell:
+			return self._main, i
+		j = self._buffer_rows.get(cell)
+		if j is not None:
+			return self._buffer, j
+		if not create:
+			return None, -1
+		j = len(self._buffer_rows)
+		if j == len(self._buffer):
+			grown = _empty(len(self._buffer) * 2)
+			grown[:j] = self._buffer
+			self._buffer = grown
+		self._buffer["cell"][j] = cell
+		self._buffer_rows[cell] = j
+		return self._buffer, j
+
+	def put(self, factor: str, lat: float, lon: float, value: Any, stored_at: Optional[float] = None) -> bool:
+		"""Store an adapter value (score or (score, evidence, ...)) for the
+		point's cell. Returns False for values it cannot hold."""
+		k = _FACTOR_INDEX.get(factor)
+		parts = value if isinstance(value, tuple) else (value,)
+		if k is None or parts[0] is None:
+			return False
+		cell = int(self.cell_ids(lat, lon))
+		with self._lock:
+			records, i = self._row(cell, create=True)
+			records["scores"][i, k] = int(round(min(max(float(parts[0]), 0.0), 100.0) * 100))
+			records["stored_at"][i, k] = self._stamp(time.time() if stored_at is None else stored_at)
+			for n, field in enumerate(STORE_EVIDENCE.get(factor, ()), 1):
+				v = parts[n] if n < len(parts) else None
+				records[field][i] = np.nan if v is None else float(v)
+			if len(self._buffer_rows) >= self.buffer_limit:
+				self.compact()
+		return True
+
+	def get(self, factor: str, lat: float, lon: float) -> Optional[Tuple[Any, float]]:
+		"""(value in the adapter's shape, stored_at) or None."""
+		k = _FACTOR_INDEX.get(factor)
+		if k is None:
+			return None
+		with self._lock:
+			records, i = self._row(int(self.cell_ids(lat, lon)), create=False)
+			if records is None or records["stored_at"][i, k] == 0:
+				return None
+			record = records[i].copy()
+			epoch = self.epoch
+		score = float(record["scores"][k]) / 100.0
+		stored_at = epoch + float(record["stored_at"][k]) * 60.0
+		fields = STORE_EVIDENCE.get(factor)
+		if not fields:
+			return score, stored_at
+		evidence = tuple(None if np.isnan(record[f]) else round(float(record[f]), 4) for f in fields)
+		return (score,) + evidence, stored_at
+
+	def compact(self) -> None:
+		"""Merge the append buffer into the sorted array."""
+		with self._lock:
+			n = len(self._buffer_rows)
+			if n == 0:
+				return
+			buffered = self._buffer[:n]
+			buffered = buffered[np.argsort(buffered["cell"], kind="stable")]
+			self._main = merge_records(self._main, buffered)
+			self._buffer = _empty(1024)
+			self._buffer_rows = {}
+
+	def records(self) -> Tuple[np.ndarray, float]:
+		"""(all records sorted by cell, epoch). Compacts first, so it is meant
+		for whole-store readers (snapshots, training); lookup and query_bbox
+		read the sorted array and the buffer as they are."""
+		with self._lock:
+			self.compact()
+			return self._main, self.epoch
+
+	def lookup(self, lats, lons) -> Tuple[np.ndarray, np.ndarray]:
+		"""Vectorized: (records, found) for arrays of points; rows of points
+		without a stored cell are blank and ``found`` is False there."""
+		cells = self.cell_ids(lats, lons).reshape(-1)
+		out = _empty(len(cells))
+		main = self._main
+		idx = np.searchsorted(main["cell"], cells)
+		idx_c = np.minimum(idx, max(len(main) - 1, 0))
+		found = (idx < len(main)) & (main["cell"][idx_c] == cells) if len(main) else np.zeros(len(cells), dtype=bool)
+		out[found] = main[idx_c[found]]
+		with self._lock:
+			if self._buffer_rows:
+				# A cell lives in the sorted array or in the buffer, never both.
+				rows = np.fromiter((self._buffer_rows.get(c, -1) for c in cells.tolist()), dtype=np.int64, count=len(cells))
+				buffered = (rows >= 0) & ~found
+				out[buffered] = self._buffer[rows[buffered]]
+				found |= buffered
+		out["cell"] = cells
+		return out, found
+
+	def records_matrix(self, records: np.ndarray, max_age_s: Optional[Dict[str, float]] = None) -> np.ndarray:
+		"""(N, 8) scores in FACTOR_ORDER from ``records``; NaN where unknown or
+		older than ``max_age_s[factor]``."""
+		scores = records["scores"].astype(np.float64) / 100.0
+		stamps = records["stored_at"]
+		unknown = (records["scores"] == _NO_SCORE) | (stamps == 0)
+		if max_age_s:
+			limits = np.array([max_age_s.get(name, np.inf) for name in FACTOR_ORDER])
+			ages = time.time() - (self.epoch + stamps.astype(np.float64) * 60.0)
+			unknown |= ages > limits
+		scores[unknown] = np.nan
+		return scores
+
+	def factor_matrix(self, lats, lons, max_age_s: Optional[Dict[str, float]] = None) -> np.ndarray:
+		"""Vectorized (N, 8) stored scores for points; NaN where unknown."""
+		return self.records_matrix(self.lookup(lats, lons)[0], max_age_s)
+
+	def query_bbox(self, west: float, south: float, east: float, north: float) -> np.ndarray:
+		"""Records of every stored cell inside the bbox, sorted by cell."""
+		r0, c0 = np.divmod(int(self.cell_ids(south, west)), self._columns)
+		r1, c1 = np.divmod(int(self.cell_ids(north, east)), self._columns)
+		main = self._main
+		parts = []
+		if len(main):
+			rows = np.arange(r0, r1 + 1, dtype=np.int64)
+			# Cells of one row are contiguous in id space: one range per row.
+			lo = np.searchsorted(main["cell"], rows * self._columns + c0, side="left")
+			hi = np.searchsorted(main["cell"], rows * self._columns + c1, side="right")
+			parts.extend(main[a:b] for a, b in zip(lo, hi) if b > a)
+		with self._lock:
+			buffered = self._buffer[: len(self._buffer_rows)]
+			row, col = np.divmod(buffered["cell"], self._columns)
+			inside = (row >= r0) & (row <= r1) & (col >= c0) & (col <= c1)
+			if inside.any():
+				parts.append(buffered[inside])  # fancy indexing copies
+		if not parts:
+			return _empty(0)
+		out = np.concatenate(parts)
+		return out[np.argsort(out["cell"], kind="stable")]
+
+	def save(self, path: str = STORE_SNAPSHOT_PATH) -> int:
+		"""Merge into the snapshot at ``path`` (atomically). Returns its cell count."""
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		lock_file = open(path + ".lock", "a+")
+		try:
+			if fcntl is not None:
+				fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+			records, epoch = self.records()
+			on_disk = _read_snapshot_locked(path, self.resolution_deg)
+			if on_disk is not None:
+				other, other_epoch = on_disk
+				other = np.array(other)  # materialize before the file is replaced
+				_rebase(other, other_epoch, epoch)
+				records = merge_records(records, other)
+			tmp = path + ".tmp.npy"
+			np.save(tmp, records)
+			with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+				json.dump({"epoch": epoch, "resolution_deg": self.resolution_deg, "cells": len(records), "saved_at": time.time()}, f)
+			os.replace(tmp, path)
+			os.replace(path + ".json.tmp", path + ".json")
+			return len(records)
+		finally:
+			lock_file.close()
+
+	def load(self, path: str = STORE_SNAPSHOT_PATH) -> int:
+		"""Map a snapshot copy-on-write and merge it in. Returns the cells added."""
+		on_disk = _read_snapshot(path, self.resolution_deg)
+		if on_disk is None:
+			return 0
+		mapped, epoch = on_disk
+		with self._lock:
+			before = len(self)
+			if len(self) == 0:
+				# Keep the mapping itself: nothing is read until used.
+				self._main, self.epoch = mapped, epoch
+			else:
+				other = np.array(mapped)
+				_rebase(other, epoch, self.epoch)
+				self.compact()
+				self._main = merge_records(self._main, other)
+			return len(self) - before
+
+
+def _read_snapshot(path: str, resolution_deg: Optional[float] = None):
+	"""(memory-mapped records, epoch) or None if absent or incompatible.
+
+	Holds the snapshot lock shared while reading: save replaces the array
+	and its json (which holds the epoch) one after the other, and records
+	paired with the other file's epoch would have every stamp shifted. The
+	mapping stays valid after the lock is released.
+	"""
+	try:
+		lock_file = open(path + ".lock", "a+")
+	except OSError:
+		return None
+	try:
+		if fcntl is not None:
+			fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH)
+		return _read_snapshot_locked(path, resolution_deg)
+	finally:
+		lock_file.close()
+
+
+def _read_snapshot_locked(path: str, resolution_deg: Optional[float] = None):
+	try:
+		with open(path + ".json", "r", encoding="utf-8") as f:
+			meta = json.load(f)
+		records = np.load(path, mmap_mode="c")
+	except (OSError, ValueError):
+		return None
+	if records.dtype != STORE_DTYPE or (resolution_deg is not None and meta.get("resolution_deg") != resolution_deg):
+		logger.warning(f"Ignoring factor store snapshot {path}: different layout or resolution")
+		return None
+	return records, float(meta["epoch"])
+
+
+factor_store = FactorStore()
+
+# Write-through from the factor cache (GEOAI_FACTOR_STORE=0 disables the store).
+STORE_ENABLED = os.getenv("GEOAI_FACTOR_STORE", "1") == "1"
+
+
+def load_factor_store(path: str = STORE_SNAPSHOT_PATH) -> int:
+	return factor_store.load(path) if STORE_ENABLED else 0
+
+
+def start_factor_store_snapshots(interval_s: Optional[float] = None) -> bool:
+	"""Save the store every GEOAI_FACTOR_STORE_SNAPSHOT_S seconds (default
+	600) on a daemon thread of this process."""
+	from .background import start_periodic
+
+	if not STORE_ENABLED:
+		return False
+	interval = interval_s or float(os.getenv("GEOAI_FACTOR_STORE_SNAPSHOT_S", "600"))
+	return start_periodic("factor-store-snapshot", interval, factor_store.save, initial_delay_s=interval)
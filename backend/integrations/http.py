@@ -0,0 +1,39 @@
+"""Deadline-aware wrappers around ``requests`` used by every adapter.
+
+Each call's timeout is clamped to the time left on the current request's
+deadline (see request_context), and no call is started once it has passed.
+Calls also wait for the upstream host's rate budget, shared across worker
+processes, and a 429 answer holds every process off that host (see
+upstreams). Each call is recorded as an "http" tracing span.
+"""
+
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from .request_context import request_timeout
+from .tracing import span
+from .upstreams import note_throttled, throttle
+
+
+def _call(name: str, method, url: str, timeout: float, kwargs) -> requests.Response:
+	with span("http", method=name, host=urlsplit(url).hostname) as s:
+		t = time.perf_counter()
+		throttle(url)
+		s.set(throttle_wait_ms=round((time.perf_counter() - t) * 1000, 1))
+		timeout = request_timeout(timeout)
+		s.set(timeout_s=round(timeout, 3))
+		resp = method(url, timeout=timeout, **kwargs)
+		s.set(status=resp.status_code)
+		if resp.status_code == 429:
+			note_throttled(url, resp.headers.get("Retry-After"))
+		return resp
+
+
+def get(url: str, *, timeout: float, **kwargs) -> requests.Response:
+	return _call("GET", requests.get, url, timeout, kwargs)
+
+
+def post(url: str, *, timeout: float, **kwargs) -> requests.Response:
+	return _call("POST", requests.post, url, timeout, kwargs)
@@ -0,0 +1,113 @@
+"""Spatial interpolation of smooth, continuous factor inputs.
+
+Sixty-day rainfall totals and PM2.5 vary slowly over a few kilometres, so
+once observations have been fetched around an area, a new point can be
+answered by inverse-distance weighting its neighbours instead of another
+upstream call. Each estimate carries a confidence in [0, 1] built from
+
+- coverage: how close the neighbours are relative to the search radius,
+- agreement: how consistent their values are (weighted coefficient of
+  variation),
+- surround: whether they lie on all sides of the point rather than one,
+  where IDW would be extrapolating.
+
+Adapters use an estimate only with enough neighbours and confidence,
+otherwise they call the upstream and add the answer as a new observation.
+"""
+
+import os
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from .spatial import RecentPointIndex
+
+
+class Estimate(NamedTuple):
+	value: float
+	confidence: float
+	neighbours: int
+	nearest_km: float
+
+
+def interpolate(lat: float, lon: float, lats, lons, distances_km, values, max_km: float,
+				power: float = 2.0, min_km: float = 0.05) -> Estimate:
+	"""IDW estimate and confidence at (lat, lon) from neighbour arrays."""
+	lats = np.asarray(lats, dtype=np.float64)
+	lons = np.asarray(lons, dtype=np.float64)
+	d = np.asarray(distances_km, dtype=np.float64)
+	v = np.asarray(values, dtype=np.float64)
+	w = 1.0 / np.power(np.maximum(d, min_km), power)
+	w_sum = w.sum()
+	value = float(np.dot(w, v) / w_sum)
+
+	# Falls off slowly near the point and steeply towards the search radius.
+	coverage = float(np.clip(1.0 - (np.dot(w, d) / w_sum / max_km) ** 2, 0.0, 1.0))
+	spread = float(np.sqrt(np.dot(w, (v - value) ** 2) / w_sum))
+	agreement = 1.0 / (1.0 + spread / max(abs(value), 1e-6))
+	if d.min() <= min_km:
+		surround = 1.0  # observed (almost) at the point itself
+	else:
+		# Weighted mean of unit bearings in a local equirectangular frame:
+		# length 0 when neighbours surround the point, 1 when all on one side.
+		dx = (lons - lon) * np.cos(np.radians(lat))
+		dy = lats - lat
+		norm = np.hypot(dx, dy)
+		resultant = np.hypot(np.dot(w, dx / norm), np.dot(w, dy / norm)) / w_sum
+		surround = 1.0 - 0.5 * float(resultant)
+	confidence = round(coverage * agreement * surround, 3)
+	return Estimate(value, confidence, int(len(d)), float(d.min()))
+
+
+class ObservationField:
+	"""Recent observations of one quantity, queried by location."""
+
+	def __init__(self, name: str, max_km: float, min_neighbours: int = 3, neighbours: int = 8,
+				 min_confidence: float = 0.5, max_age_s: float = 6 * 3600, capacity: int = 50000):
+		self.name = name
+		self.max_km = max_km
+		self.min_neighbours = min_neighbours
+		self.neighbours = neighbours
+		self.min_confidence = min_confidence
+		self._points = RecentPointIndex(capacity, max_age_s)
+
+	def __len__(self) -> int:
+		return len(self._points)
+
+	def add(self, lat: float, lon: float, value: float, observed_at: Optional[float] = None) -> None:
+		if value is not None and np.isfinite(value):
+			self._points.add(lat, lon, float(value), observed_at)
+
+	def neighbours_of(self, lat: float, lon: float):
+		"""(lats, lons, distances_km, values) of the nearest observations."""
+		near = self._points.nearest(lat, lon, self.neighbours, self.max_km)
+		return (
+			np.array([p.lat for _, p in near]),
+			np.array([p.lon for _, p in near]),
+			np.array([d for d, _ in near]),
+			np.array([p.item for _, p in near]),
+		)
+
+	def estimate(self, lat: float, lon: float, extra=None) -> Optional[Estimate]:
+		"""Estimate from stored observations (plus ``extra`` neighbour arrays
+		in the ``neighbours_of`` shape), or None when coverage is too sparse
+		or confidence below ``min_confidence``."""
+		lats, lons, dist, values = self.neighbours_of(lat, lon)
+		if extra is not None:
+			lats, lons, dist, values = (np.concatenate([a, np.asarray(b, dtype=np.float64)]) for a, b in zip((lats, lons, dist, values), extra))
+			order = np.argsort(dist)[: self.neighbours]
+			lats, lons, dist, values = lats[order], lons[order], dist[order], values[order]
+		if len(dist) < self.min_neighbours:
+			return None
+		est = interpolate(lat, lon, lats, lons, dist, values, self.max_km)
+		return est if est.confidence >= self.min_confidence else None
+
+
+# 60-day precipitation totals (mm) from Open-Meteo answers.
+rainfall_field = ObservationField(
+	"rainfall_total_mm_60d",
+	max_km=float(os.getenv("GEOAI_RAIN_INTERP_KM", "15")),
+	min_neighbours=int(os.getenv("GEOAI_RAIN_INTERP_MIN_NEIGHBOURS", "3")),
+	min_confidence=float(os.getenv("GEOAI_RAIN_INTERP_MIN_CONFIDENCE", "0.6")),
+	max_age_s=6 * 3600,
+)
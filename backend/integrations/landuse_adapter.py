@@ -1,5 +1,5 @@
-import requests
 from typing import Optional
+from . import http
 
 
 OVERPASS_URL = "https://overpass-api.de/api/interpreter"
@@ -18,7 +18,7 @@ def infer_landuse_score(latitude: float, longitude: float) -> Optional[float]:
 	out tags 5;
 	"""
 	try:
-		resp = requests.post(OVERPASS_URL, data={"data": query}, timeout=5)
+		resp = http.post(OVERPASS_URL, data={"data": query}, timeout=5)
 		resp.raise_for_status()
 		js = resp.json()
 		if not js.get("elements"):
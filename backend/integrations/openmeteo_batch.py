@@ -0,0 +1,173 @@
+"""Micro-batching of Open-Meteo lookups across concurrent requests.
+
+Open-Meteo endpoints take comma-separated coordinate lists, so lookups that
+arrive within a few milliseconds of each other (the five elevation points of
+one slope estimate, rainfall for the samples of an area, concurrent clicks)
+can share one HTTP call. A ``MicroBatcher`` collects the keys submitted
+within ``window_s`` of the first one, or until ``max_size`` distinct keys,
+resolves them with a single ``fetch`` call on a flush thread and hands each
+caller its own result. Every call still goes through the host's rate budget
+(upstreams.py), now once per batch instead of once per coordinate.
+
+Callers wait at most for what is left of their own request deadline; the
+flush itself is not tied to any one request, so a short deadline on one
+caller does not cut the lookup short for the others.
+
+One bad coordinate must not fail the lookup for everyone batched with it:
+keys the batcher's ``validate`` rejects never join a batch, and a batch the
+upstream rejects outright (HTTP 4xx) is split in halves and retried until
+the offending keys are isolated. Other failures (timeouts, 5xx, 429) are
+not split, since more calls would only add load to a failing host.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import requests
+
+from .request_context import cancelled, remaining_s
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+# How long the first lookup of a batch waits for company (0 = no batching).
+OPENMETEO_BATCH_WINDOW_MS = float(os.getenv("GEOAI_OPENMETEO_BATCH_WINDOW_MS", "25"))
+# Coordinates per request; a full batch is sent without waiting out the window.
+OPENMETEO_BATCH_MAX = int(os.getenv("GEOAI_OPENMETEO_BATCH_MAX", "100"))
+# Longest a caller without a request deadline waits for its batch.
+_MAX_WAIT_S = 60.0
+
+_flush_executor = ThreadPoolExecutor(
+	max_workers=int(os.getenv("GEOAI_OPENMETEO_BATCH_WORKERS", "8")),
+	thread_name_prefix="geoai-openmeteo",
+)
+
+
+class _Batch:
+	__slots__ = ("futures", "full")
+
+	def __init__(self):
+		self.futures: Dict[Hashable, Future] = {}
+		self.full = threading.Event()
+
+
+def _rejected(e: Exception) -> bool:
+	"""The upstream refused the request itself (4xx other than 429), so some
+	key in it is likely at fault."""
+	resp = getattr(e, "response", None) if isinstance(e, requests.HTTPError) else None
+	return resp is not None and 400 <= resp.status_code < 500 and resp.status_code != 429
+
+
+class MicroBatcher:
+	"""Resolves keys in batches with ``fetch(keys) -> results`` (same order,
+	None for keys it could not answer). Keys failing ``validate`` resolve to
+	None without joining a batch."""
+
+	def __init__(self, name: str, fetch: Callable[[List[Hashable]], Sequence[Any]],
+				 window_s: float = OPENMETEO_BATCH_WINDOW_MS / 1000.0, max_size: int = OPENMETEO_BATCH_MAX,
+				 validate: Optional[Callable[[Hashable], bool]] = None):
+		self.name = name
+		self.fetch = fetch
+		self.validate = validate
+		self.window_s = window_s
+		self.max_size = max(int(max_size), 1)
+		self.requests = 0
+		self.lookups = 0
+		self._lock = threading.Lock()
+		self._open: Optional[_Batch] = None
+
+	@property
+	def enabled(self) -> bool:
+		return self.window_s > 0 and self.max_size > 1
+
+	def _fetch(self, keys: List[Hashable]) -> List[Any]:
+		self.requests += 1
+		self.lookups += len(keys)
+		try:
+			results = list(self.fetch(keys))
+		except Exception as e:
+			if len(keys) > 1 and _rejected(e) and not cancelled():
+				logger.debug(f"{self.name} batch of {len(keys)} rejected, splitting: {e}")
+				half = len(keys) // 2
+				return self._fetch(keys[:half]) + self._fetch(keys[half:])
+			logger.debug(f"{self.name} batch of {len(keys)} failed: {e}")
+			return [None] * len(keys)
+		return (results + [None] * len(keys))[: len(keys)]
+
+	def _flush_after(self, batch: _Batch) -> None:
+		batch.full.wait(self.window_s)
+		with self._lock:
+			if self._open is batch:
+				self._open = None
+			keys = list(batch.futures)
+		for key, result in zip(keys, self._fetch(keys)):
+			batch.futures[key].set_result(result)
+
+	def submit(self, key: Hashable) -> Future:
+		"""Future for ``key``'s result, resolved with the batch it joins."""
+		with self._lock:
+			batch = self._open
+			if batch is None:
+				batch = self._open = _Batch()
+				# Plain submit: the flush serves several requests and must not
+				# inherit any one caller's deadline or cancel flag.
+				_flush_executor.submit(self._flush_after, batch)
+			future = batch.futures.get(key)
+			if future is None:
+				future = batch.futures[key] = Future()
+				if len(batch.futures) >= self.max_size:
+					self._open = None
+					batch.full.set()
+		return future
+
+	def get_many(self, keys: Sequence[Hashable]) -> List[Any]:
+		"""Results for ``keys``; None for keys not answered before the
+		caller's deadline."""
+		keys = list(keys)
+		valid = [i for i, k in enumerate(keys) if self.validate is None or self.validate(k)]
+		out: List[Any] = [None] * len(keys)
+		if not valid:
+			return out
+		if len(valid) < len(keys):
+			logger.debug(f"{self.name}: {len(keys) - len(valid)} invalid keys not fetched")
+		if not self.enabled:
+			for i, result in zip(valid, self._fetch([keys[i] for i in valid])):
+				out[i] = result
+			return out
+		with span("openmeteo.batch", batcher=self.name, keys=len(valid)):
+			futures = [self.submit(keys[i]) for i in valid]
+			left = remaining_s()
+			timeout = _MAX_WAIT_S if left is None else max(min(left, _MAX_WAIT_S), 0.0)
+			wait(futures, timeout=timeout)
+		if cancelled():
+			return out
+		for i, f in zip(valid, futures):
+			out[i] = f.result() if f.done() else None
+		return out
+
+	def get(self, key: Hashable) -> Any:
+		return self.get_many([key])[0]
+
+
+def valid_coordinate(lat: float, lon: float) -> bool:
+	"""Finite latitude in [-90, 90] and longitude in [-180, 180]."""
+	return -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0
+
+
+def coordinate_params(points: Sequence[Tuple[float, float]]) -> Dict[str, str]:
+	"""``latitude``/``longitude`` query parameters for a list of (lat, lon)."""
+	return {
+		"latitude": ",".join(f"{lat:.5f}" for lat, _ in points),
+		"longitude": ",".join(f"{lon:.5f}" for _, lon in points),
+	}
+
+
+def split_locations(payload: Any) -> List[dict]:
+	"""Per-location response objects: Open-Meteo answers a single location
+	with an object and several with a list, in request order."""
+	if isinstance(payload, list):
+		return [p or {} for p in payload]
+	return [payload or {}]
@@ -0,0 +1,96 @@
+"""Spatially batched Overpass lookups for many points at once.
+
+The water and road-proximity adapters measure each point against the
+features of its tile (overpass_tiles.py), fetching a missing tile with one
+query per search radius. Scoring a polygon or ranking a few hundred
+candidates touches many tiles at once, so here the tiles of all the points
+are fetched ahead of the pipeline in blocks, one bounding-box query per
+block and radius; the per-point adapters then answer from memory. Tiles a
+batch could not fetch (upstream failure, deadline) are left alone and take
+the per-point path as before.
+
+The fetched tiles can be saved to and loaded from a snapshot, so features
+fetched by tools/prewarm.py are available to the server after a restart.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from .overpass_tiles import FeatureTiles
+from .paths import get_data_path
+from .pylusat_adapter import road_tiles
+from .tracing import span
+from .water_adapter import water_tiles
+
+logger = logging.getLogger(__name__)
+
+OVERPASS_BATCH_ENABLED = os.getenv("GEOAI_OVERPASS_BATCH", "1") != "0"
+
+OVERPASS_LAYERS: Dict[str, FeatureTiles] = {
+	"water": water_tiles,
+	"proximity": road_tiles,
+}
+
+# Written by tools/prewarm.py, loaded by the server at startup.
+TILE_SNAPSHOT_PATH = get_data_path("stores", "overpass_tiles.json")
+
+
+def prefetch_overpass(lats, lons, factors: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, int]]:
+	"""Fetch the tiles the Overpass-backed ``factors`` (default all) need for
+	every point; {factor: stats}. Factors without a tile layer are ignored."""
+	lats = np.asarray(lats, dtype=np.float64).reshape(-1)
+	lons = np.asarray(lons, dtype=np.float64).reshape(-1)
+	out: Dict[str, Dict[str, int]] = {}
+	if not OVERPASS_BATCH_ENABLED:
+		return out
+	for factor in factors or OVERPASS_LAYERS:
+		tiles = OVERPASS_LAYERS.get(factor)
+		if tiles is None:
+			continue
+		stats = {"points": int(len(lats)), "tiles": 0, "queries": 0}
+		out[factor] = stats
+		if len(lats) == 0:
+			continue
+		with span("overpass.batch", factor=factor, points=int(len(lats))):
+			dist = tiles.nearest_km(lats, lons, stats)
+		stats["answered"] = int(np.count_nonzero(~np.isnan(dist)))
+		logger.info(f"Overpass batch {factor}: {stats['points']} points, {stats['tiles']} tiles, "
+					f"{stats['queries']} queries, {stats['answered']} answered")
+	return out
+
+
+def save_tile_snapshot(path: str = TILE_SNAPSHOT_PATH) -> int:
+	"""Write every layer's unexpired tiles to ``path`` (atomically). Returns
+	the entry count."""
+	rows = [
+		[factor, key[0], key[1], key[2], np.round(f_lats, 6).tolist(), np.round(f_lons, 6).tolist(), fetched_at]
+		for factor, tiles in OVERPASS_LAYERS.items()
+		for key, f_lats, f_lons, fetched_at in tiles.items()
+	]
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	with open(path + ".tmp", "w", encoding="utf-8") as f:
+		json.dump({"saved_at": time.time(), "entries": rows}, f)
+	os.replace(path + ".tmp", path)
+	return len(rows)
+
+
+def load_tile_snapshot(path: str = TILE_SNAPSHOT_PATH) -> int:
+	"""Merge a snapshot written by save_tile_snapshot; 0 if there is none."""
+	try:
+		with open(path, "r", encoding="utf-8") as f:
+			rows = json.load(f).get("entries") or []
+	except (OSError, ValueError):
+		return 0
+	taken = 0
+	for factor, tiles in OVERPASS_LAYERS.items():
+		taken += tiles.load_items(
+			((int(row), int(col), int(radius_m)), f_lats, f_lons, float(fetched_at))
+			for name, row, col, radius_m, f_lats, f_lons, fetched_at in rows
+			if name == factor
+		)
+	return taken
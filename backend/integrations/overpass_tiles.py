@@ -0,0 +1,222 @@
+"""Overpass features cached per coarse tile, for exact per-point distances.
+
+Water and road proximity depend on the distance from the exact point to the
+nearest mapped feature, and the water veto acts on distances of a few
+metres, so a distance found for one point must not be handed to its
+neighbours. What is shared instead are the features: the map is split into
+tiles of ``OVERPASS_TILE_DEG`` and, per tile and search radius, one
+bounding-box query fetches every feature within that radius of any point of
+the tile. Every later point in the tile gets its own nearest distance from a
+KD-tree over those features, without another upstream call.
+
+Lookups for many points at once (area sampling, ranking, prewarm) fetch the
+tiles they miss in blocks of ``OVERPASS_TILE_BLOCK`` x ``OVERPASS_TILE_BLOCK``
+tiles, one query per block, and split the answer per tile.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .request_context import cancelled
+from .spatial import EARTH_RADIUS_KM, PointIndex
+from .tracing import span
+
+# Tile edge in degrees (~2 km of latitude).
+OVERPASS_TILE_DEG = float(os.getenv("GEOAI_OVERPASS_TILE_DEG", "0.02"))
+# Tiles per block side fetched with one query by multi-point lookups.
+OVERPASS_TILE_BLOCK = max(int(os.getenv("GEOAI_OVERPASS_TILE_BLOCK", "3")), 1)
+# Seconds a tile's features are used before they are fetched again.
+OVERPASS_TILE_TTL_S = float(os.getenv("GEOAI_OVERPASS_TILE_TTL_S", str(24 * 3600)))
+# (tile, radius) entries kept per layer.
+OVERPASS_TILE_CACHE_SIZE = int(os.getenv("GEOAI_OVERPASS_TILE_CACHE_SIZE", "20000"))
+# Per-query timeout; bbox answers are larger than single-point ones.
+OVERPASS_TILE_TIMEOUT_S = float(os.getenv("GEOAI_OVERPASS_TILE_TIMEOUT_S", "30"))
+
+KM_PER_DEG = math.pi * EARTH_RADIUS_KM / 180.0
+
+# (tile row, tile column, search radius in metres)
+TileKey = Tuple[int, int, int]
+
+
+def padded_bbox(lats, lons, radius_km: float) -> Tuple[float, float, float, float]:
+	"""(south, west, north, east) around the points, grown by ``radius_km``
+	so it contains everything within that distance of any of them."""
+	dlat = radius_km / KM_PER_DEG
+	south = max(float(np.min(lats)) - dlat, -90.0)
+	north = min(float(np.max(lats)) + dlat, 90.0)
+	cos_lat = math.cos(math.radians(max(abs(south), abs(north))))
+	dlon = radius_km / (KM_PER_DEG * max(cos_lat, 0.01))
+	return south, float(np.min(lons)) - dlon, north, float(np.max(lons)) + dlon
+
+
+def build_bbox_query(selectors: Sequence[str], bbox: Tuple[float, float, float, float], timeout_s: float) -> str:
+	s, w, n, e = (round(v, 6) for v in bbox)
+	clauses = "\n".join(f"  {sel}({s},{w},{n},{e});" for sel in selectors)
+	return f"[out:json][timeout:{int(timeout_s)}];\n(\n{clauses}\n);\nout center;\n"
+
+
+def element_points(elements) -> Tuple[np.ndarray, np.ndarray]:
+	"""(lats, lons) of Overpass elements: node coordinates or way/relation centres."""
+	lats, lons = [], []
+	for el in elements or ():
+		pt = el if "lat" in el and "lon" in el else el.get("center") or {}
+		if "lat" in pt and "lon" in pt:
+			lats.append(pt["lat"])
+			lons.append(pt["lon"])
+	return np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)
+
+
+def _group(rows: np.ndarray, cols: np.ndarray) -> List[Tuple[Tuple[int, int], np.ndarray]]:
+	"""((row, col), member indices) for each distinct (row, col) pair."""
+	if len(rows) == 0:
+		return []
+	pairs, labels = np.unique(np.stack([rows, cols], axis=1), axis=0, return_inverse=True)
+	labels = labels.reshape(-1)
+	order = np.argsort(labels, kind="stable")
+	groups = np.split(order, np.flatnonzero(np.diff(labels[order])) + 1)
+	return [((int(pairs[labels[g[0]]][0]), int(pairs[labels[g[0]]][1])), g) for g in groups]
+
+
+class FeatureTiles:
+	"""Features of one Overpass layer per (tile, search radius); thread-safe
+	TTL + LRU.
+
+	``run_query(query, timeout_s)`` returns the Overpass JSON, or None when
+	it failed or was cancelled; nothing is cached then. Points with nothing
+	inside a radius go on to the next, wider one.
+	"""
+
+	def __init__(self, name: str, selectors: Sequence[str], radii_m: Sequence[int],
+				 run_query: Callable[[str, float], Optional[dict]], tile_deg: float = OVERPASS_TILE_DEG,
+				 max_entries: int = OVERPASS_TILE_CACHE_SIZE, ttl_s: float = OVERPASS_TILE_TTL_S):
+		self.name = name
+		self.selectors = tuple(selectors)
+		self.radii_m = tuple(radii_m)
+		self.run_query = run_query
+		self.tile_deg = tile_deg
+		self.max_entries = max_entries
+		self.ttl_s = ttl_s
+		self._data: "OrderedDict[TileKey, Tuple[PointIndex, float]]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	def __len__(self) -> int:
+		return len(self._data)
+
+	def tile(self, lat: float, lon: float) -> Tuple[int, int]:
+		return int(math.floor(lat / self.tile_deg)), int(math.floor(lon / self.tile_deg))
+
+	def tile_bbox(self, row: int, col: int, radius_km: float) -> Tuple[float, float, float, float]:
+		"""The tile grown by ``radius_km``: holds every feature within that
+		distance of a point of the tile."""
+		south, west = row * self.tile_deg, col * self.tile_deg
+		return padded_bbox([south, south + self.tile_deg], [west, west + self.tile_deg], radius_km)
+
+	def get(self, key: TileKey) -> Optional[PointIndex]:
+		"""Features of a tile and radius, unless missing or expired."""
+		with self._lock:
+			item = self._data.get(key)
+			if item is None:
+				return None
+			if time.time() - item[1] > self.ttl_s:
+				del self._data[key]
+				return None
+			self._data.move_to_end(key)
+			return item[0]
+
+	def _put(self, key: TileKey, index: PointIndex, fetched_at: float) -> None:
+		with self._lock:
+			self._data[key] = (index, fetched_at)
+			self._data.move_to_end(key)
+			while len(self._data) > self.max_entries:
+				self._data.popitem(last=False)
+
+	def fetch(self, tiles: Sequence[Tuple[int, int]], radius_m: int, stats: Optional[Dict[str, int]] = None) -> bool:
+		"""Fetch the features within ``radius_m`` of ``tiles`` with one query
+		and cache them per tile; False if the query failed."""
+		radius_km = radius_m / 1000.0
+		boxes = [self.tile_bbox(row, col, radius_km) for row, col in tiles]
+		bbox = (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+		query = build_bbox_query(self.selectors, bbox, OVERPASS_TILE_TIMEOUT_S)
+		with span("overpass.tiles", layer=self.name, radius_m=radius_m, tiles=len(tiles)):
+			data = self.run_query(query, OVERPASS_TILE_TIMEOUT_S)
+		if stats is not None:
+			stats["queries"] = stats.get("queries", 0) + 1
+		if data is None:
+			return False
+		f_lats, f_lons = element_points(data.get("elements"))
+		now = time.time()
+		for (row, col), (s, w, n, e) in zip(tiles, boxes):
+			inside = (f_lats >= s) & (f_lats <= n) & (f_lons >= w) & (f_lons <= e)
+			self._put((row, col, radius_m), PointIndex(f_lats[inside], f_lons[inside]), now)
+		return True
+
+	def nearest_km(self, lats, lons, stats: Optional[Dict[str, int]] = None) -> np.ndarray:
+		"""Distance (km) from each point to the nearest feature: inf when none
+		lies within the widest radius, NaN when undetermined (a query failed
+		or the request was cancelled)."""
+		lats = np.asarray(lats, dtype=np.float64).reshape(-1)
+		lons = np.asarray(lons, dtype=np.float64).reshape(-1)
+		out = np.full(len(lats), np.nan)
+		rows = np.floor(lats / self.tile_deg).astype(np.int64)
+		cols = np.floor(lons / self.tile_deg).astype(np.int64)
+		stats = stats if stats is not None else {}
+		pending = np.arange(len(lats))
+		for radius_m in self.radii_m:
+			if len(pending) == 0 or cancelled():
+				return out
+			tiles = _group(rows[pending], cols[pending])
+			stats["tiles"] = stats.get("tiles", 0) + len(tiles)
+			missing = [t for t, _ in tiles if self.get((t[0], t[1], radius_m)) is None]
+			if missing:
+				missing = np.asarray(missing, dtype=np.int64)
+				for _, block in _group(missing[:, 0] // OVERPASS_TILE_BLOCK, missing[:, 1] // OVERPASS_TILE_BLOCK):
+					if cancelled():
+						return out
+					self.fetch([tuple(t) for t in missing[block].tolist()], radius_m, stats)
+			still = []
+			for (row, col), members in tiles:
+				index = self.get((row, col, radius_m))
+				if index is None:
+					# Fetch failed: these points stay undetermined.
+					continue
+				members = pending[members]
+				dist = index.nearest_distances(lats[members], lons[members], radius_m / 1000.0)
+				found = np.isfinite(dist)
+				out[members[found]] = dist[found]
+				still.append(members[~found])
+			pending = np.concatenate(still) if still else np.empty(0, dtype=np.int64)
+		out[pending] = np.inf
+		return out
+
+	def items(self) -> List[Tuple[TileKey, np.ndarray, np.ndarray, float]]:
+		"""Snapshot of (key, feature lats, feature lons, fetched_at) for
+		unexpired entries."""
+		now = time.time()
+		with self._lock:
+			return [
+				(key, index.lats, index.lons, fetched_at)
+				for key, (index, fetched_at) in self._data.items()
+				if now - fetched_at <= self.ttl_s
+			]
+
+	def load_items(self, items) -> int:
+		"""Merge (key, lats, lons, fetched_at) entries, keeping the newer of
+		each and skipping expired ones. Returns the number taken."""
+		now = time.time()
+		taken = 0
+		for key, lats, lons, fetched_at in items:
+			if now - fetched_at > self.ttl_s:
+				continue
+			with self._lock:
+				current = self._data.get(key)
+				if current is not None and current[1] >= fetched_at:
+					continue
+			self._put(key, PointIndex(lats, lons), fetched_at)
+			taken += 1
+		return taken
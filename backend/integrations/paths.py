@@ -21,3 +21,14 @@ def get_project_path(project_name: str) -> Optional[str]:
 	return candidate if os.path.exists(candidate) else None
 
 
+
+
+def get_data_path(*parts: str) -> str:
+	"""Return a path inside the local data directory (rasters, indexes, stores).
+
+	Defaults to <backend>/data; override with GEOAI_DATA_DIR.
+	"""
+	base = os.getenv("GEOAI_DATA_DIR") or os.path.join(
+		os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"
+	)
+	return os.path.join(base, *parts)
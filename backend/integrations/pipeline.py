@@ -0,0 +1,228 @@
+"""Dependency-aware factor pipeline.
+
+Every factor adapter is declared with a relative cost and, optionally, a
+veto predicate: a value that on its own makes the site unsuitable (the
+point is on a waterbody). Local lookups (cost 0) run inline first; the
+remaining adapters run concurrently, veto factors submitted first. As soon
+as a veto fires, queued adapters are cancelled and running ones see
+``cancelled()`` so their retry loops stop early, letting waterbody points
+return in the time of a single check.
+
+Under a request deadline (``request_context.deadline_scope``) the pipeline
+waits only for the time remaining; factors still running then, or finished
+only after it passed, keep their fallback values and are reported as
+``degraded``.
+"""
+
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence, Tuple, Union
+
+from .cache import cached_factor, store_factor
+from .floodml_adapter import FLOOD_HAZARD_DIR, estimate_flood_risk_score
+from .landuse_adapter import infer_landuse_score
+from .pollution_adapter import estimate_pollution_score, station_store
+from .pylandslide_adapter import catalogue_store, estimate_landslide_risk_score
+from .pylusat_adapter import compute_proximity_score
+from .rainfall_adapter import estimate_rainfall_score
+from .raster import open_raster, open_tiled_raster
+from .request_context import DeadlineExceeded, new_cancel_scope, remaining_s, submit_in_context
+from .soil_adapter import SOIL_RASTER_PATH, estimate_soil_quality_score
+from .tracing import span
+from .water_adapter import estimate_water_proximity_score, is_on_water, load_water_mask
+
+logger = logging.getLogger(__name__)
+
+# Relative cost classes
+COST_LOCAL = 0     # memory-mapped rasters / in-process indexes
+COST_REMOTE = 1    # typically one upstream call
+COST_HEAVY = 2     # several radii x mirrors x retries
+
+
+class FactorSpec(NamedTuple):
+	name: str
+	compute: Callable[[float, float], Any]
+	cost: int
+	fallback: Any
+	# Key(s) under which the trailing elements of a (score, evidence, ...)
+	# result are reported.
+	evidence: Union[str, Tuple[str, ...], None] = None
+	# Returns True when the (non-fallback) value alone makes the site unsuitable.
+	veto: Optional[Callable[[Any], bool]] = None
+	# Go through the per-cell factor cache (which writes to the factor store).
+	cached: bool = True
+	# Uncached factors only: still record values in the factor store, for
+	# ranking, reweighting and training.
+	stored: bool = False
+	# Report as a response factor (False for pure checks like the water mask).
+	report: bool = True
+
+
+# Water closer than this (km, ~20 m) vetoes the site.
+WATER_VETO_KM = 0.02
+
+
+def _on_water_distance(value) -> bool:
+	distance = value[1] if isinstance(value, tuple) else None
+	return distance is not None and distance < WATER_VETO_KM
+
+
+FACTOR_SPECS: Sequence[FactorSpec] = (
+	FactorSpec("water_mask", is_on_water, COST_LOCAL, None, veto=bool, cached=False, report=False),
+	FactorSpec("flood", estimate_flood_risk_score, COST_LOCAL, 0),
+	FactorSpec("soil", estimate_soil_quality_score, COST_LOCAL, 0),
+	# Exact per-point distances to features cached per tile (overpass_tiles.py)
+	FactorSpec("water", estimate_water_proximity_score, COST_HEAVY, (0, None), evidence="water_distance_km",
+			   veto=_on_water_distance, cached=False, stored=True),
+	FactorSpec("proximity", compute_proximity_score, COST_HEAVY, 0, cached=False, stored=True),
+	FactorSpec("rainfall", estimate_rainfall_score, COST_REMOTE, (50.0, None, None),
+			   evidence=("rainfall_total_mm_60d", "rainfall_interpolation_confidence")),
+	FactorSpec("landslide", estimate_landslide_risk_score, COST_REMOTE, 0),
+	FactorSpec("pollution", estimate_pollution_score, COST_REMOTE, (0, None, None),
+			   evidence=("pm25_ugm3", "pm25_interpolation_confidence")),
+	FactorSpec("landuse", infer_landuse_score, COST_REMOTE, 0),
+)
+
+SPECS_BY_NAME: Dict[str, FactorSpec] = {s.name: s for s in FACTOR_SPECS}
+
+_executor = ThreadPoolExecutor(
+	max_workers=int(os.getenv("GEOAI_FACTOR_WORKERS", "32")),
+	thread_name_prefix="geoai-factor",
+)
+
+
+def preload_local_data() -> None:
+	"""Open the local datasets (rasters, water mask, station and landslide
+	indexes) now rather than on first use. serve.py calls this before forking
+	so workers share the pages copy-on-write."""
+	load_water_mask()
+	open_raster(SOIL_RASTER_PATH)
+	open_tiled_raster(FLOOD_HAZARD_DIR)
+	station_store.get()
+	catalogue_store.get()
+
+
+def _deadline_passed() -> bool:
+	left = remaining_s()
+	return left is not None and left <= 0
+
+
+def _run_spec(spec: FactorSpec, lat: float, lon: float):
+	"""Returns (value, failed, degraded)."""
+	with span(f"factor.{spec.name}", cost=spec.cost) as s:
+		value, failed, degraded = _evaluate_spec(spec, lat, lon)
+		if failed or degraded:
+			s.set(failed=failed, degraded=degraded)
+		return value, failed, degraded
+
+
+def _evaluate_spec(spec: FactorSpec, lat: float, lon: float):
+	try:
+		if spec.cached:
+			value = cached_factor(spec.name, lat, lon, spec.compute)
+		else:
+			value = spec.compute(lat, lon)
+	except DeadlineExceeded:
+		return spec.fallback, True, True
+	except Exception as e:
+		logger.error(f"{spec.name} factor error: {e}")
+		return spec.fallback, True, False
+	if _deadline_passed():
+		# Adapters cut their retries short at the deadline; whatever came
+		# back is a partial answer.
+		return (spec.fallback if value is None else value), value is None, True
+	if value is None:
+		# No data for this point (no local raster, upstream gave up).
+		return spec.fallback, True, False
+	if spec.stored:
+		store_factor(spec.name, lat, lon, value)
+	return value, False, False
+
+
+def evaluate_factor(name: str, latitude: float, longitude: float):
+	"""Evaluate one factor on its own (cached, traced, deadline-aware), for
+	callers that schedule factors themselves.
+
+	Returns (score, vetoed, degraded); score is None when the adapter failed.
+	"""
+	spec = SPECS_BY_NAME[name]
+	value, failed, degraded = _run_spec(spec, latitude, longitude)
+	vetoed = not failed and spec.veto is not None and bool(spec.veto(value))
+	if failed:
+		return None, vetoed, degraded
+	return (value[0] if isinstance(value, tuple) else value), vetoed, degraded
+
+
+def run_factor_pipeline(latitude: float, longitude: float, specs: Sequence[FactorSpec] = FACTOR_SPECS,
+						prefilled: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+	"""Evaluate all factors for a point.
+
+	Returns factor values keyed by spec name, evidence values, ``on_water`` /
+	``vetoed_by`` when a veto fired (other factors are then absent),
+	``cancelled``: the factors abandoned because of it, and ``degraded``: the
+	factors answered with their fallback because of the deadline.
+
+	``prefilled`` maps spec names to values known already (e.g. reused from a
+	nearby result, see result_memo.py); those adapters are not run, though
+	their vetoes still apply. ``computed`` lists the factors this call
+	actually evaluated without failing.
+	"""
+	result: Dict[str, Any] = {"on_water": False, "vetoed_by": None, "cancelled": [], "degraded": [], "computed": {}}
+	prefilled = prefilled or {}
+	cancel = new_cancel_scope()
+
+	def _record(spec: FactorSpec, value, failed: bool, degraded: bool = False, computed: bool = True) -> bool:
+		if degraded and spec.report:
+			result["degraded"].append(spec.name)
+		if computed and not (failed or degraded) and spec.report:
+			result["computed"][spec.name] = value
+		if spec.evidence:
+			keys = (spec.evidence,) if isinstance(spec.evidence, str) else spec.evidence
+			parts = value if isinstance(value, tuple) else (value,)
+			result[spec.name] = parts[0]
+			for k, key in enumerate(keys, 1):
+				result[key] = parts[k] if k < len(parts) else None
+		elif spec.report:
+			result[spec.name] = value
+		if not failed and spec.veto is not None and spec.veto(value):
+			result["on_water"] = True
+			result["vetoed_by"] = spec.name
+			result.setdefault("water_distance_km", 0.0)
+			return True
+		return False
+
+	for spec in specs:
+		if spec.name in prefilled and _record(spec, prefilled[spec.name], False, computed=False):
+			result["cancelled"] = [s.name for s in specs if s.report and s.name not in result]
+			return result
+
+	local = [s for s in specs if s.cost == COST_LOCAL and s.name not in prefilled]
+	remote = sorted((s for s in specs if s.cost != COST_LOCAL and s.name not in prefilled), key=lambda s: (s.veto is None, -s.cost))
+
+	for spec in local:
+		if _record(spec, *_run_spec(spec, latitude, longitude)):
+			result["cancelled"] = [s.name for s in specs if s.report and s.name not in result]
+			return result
+
+	futures = {submit_in_context(_executor, _run_spec, s, latitude, longitude): s for s in remote}
+	pending = set(futures)
+	while pending:
+		left = remaining_s()
+		done, pending = wait(pending, timeout=None if left is None else max(left, 0.0), return_when=FIRST_COMPLETED)
+		if not done:
+			# Deadline: stop waiting and answer with fallbacks.
+			cancel.set()
+			for fut in pending:
+				fut.cancel()
+				_record(futures[fut], futures[fut].fallback, True, True)
+			break
+		for fut in done:
+			if _record(futures[fut], *fut.result()):
+				cancel.set()
+				for other in pending:
+					other.cancel()
+				result["cancelled"] = sorted(futures[f].name for f in pending)
+				return result
+	result["degraded"].sort()
+	return result
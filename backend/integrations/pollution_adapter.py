@@ -1,43 +1,214 @@
-import requests
-from typing import Optional
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .background import ReloadingStore, start_periodic
+from .interpolation import Estimate, ObservationField
+from .paths import get_data_path
+from .spatial import PointIndex
+from .tracing import annotate
+from . import http
 
 
 OPENAQ_URL = "https://api.openaq.org/v2/latest"
 
+AQ_STORE_PATH = get_data_path("stores", "aq_stations.json")
+# Stations further than this from the point do not count as local coverage.
+AQ_MAX_KM = float(os.getenv("GEOAI_AQ_MAX_KM", "10"))
+AQ_NEIGHBOURS = int(os.getenv("GEOAI_AQ_NEIGHBOURS", "4"))
+AQ_MAX_AGE_H = float(os.getenv("GEOAI_AQ_MAX_AGE_H", "72"))
+# Below this interpolation confidence OpenAQ is asked live (0 = any nearby station will do).
+AQ_MIN_CONFIDENCE = float(os.getenv("GEOAI_AQ_MIN_CONFIDENCE", "0"))
+_SYNC_RADIUS_M = 25000  # OpenAQ maximum for coordinate queries
+
+logger = logging.getLogger(__name__)
+
+
+def _pm25_to_score(v: float) -> float:
+	if v < 10:
+		return 90.0
+	elif v < 25:
+		return 70.0
+	elif v < 50:
+		return 50.0
+	else:
+		return 30.0
+
+
+def _parse_ts(value) -> float:
+	try:
+		return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+	except Exception:
+		return 0.0
+
+
+def _load_store() -> dict:
+	try:
+		with open(AQ_STORE_PATH, "r", encoding="utf-8") as f:
+			return json.load(f)
+	except (OSError, ValueError):
+		return {"synced_at": None, "stations": []}
+
+
+def _build_index(stations: List[dict]) -> Tuple[PointIndex, np.ndarray]:
+	cutoff = time.time() - AQ_MAX_AGE_H * 3600
+	fresh = [s for s in stations if s.get("pm25") is not None and s.get("updated", 0) >= cutoff]
+	return (
+		PointIndex([s["lat"] for s in fresh], [s["lon"] for s in fresh]),
+		np.array([float(s["pm25"]) for s in fresh], dtype=np.float64),
+	)
+
+
+# KD-tree over fresh stations, rebuilt when another process re-syncs the store.
+station_store: ReloadingStore[Tuple[PointIndex, np.ndarray]] = ReloadingStore(
+	AQ_STORE_PATH, lambda: _build_index(_load_store().get("stations") or [])
+)
+
+
+# Stations seen in live OpenAQ answers, between syncs.
+pm25_field = ObservationField(
+	"pm25",
+	max_km=AQ_MAX_KM,
+	min_neighbours=1,
+	neighbours=AQ_NEIGHBOURS,
+	min_confidence=AQ_MIN_CONFIDENCE,
+	max_age_s=AQ_MAX_AGE_H * 3600,
+)
 
-def estimate_pollution_score(latitude: float, longitude: float) -> Optional[float]:
-	"""Query OpenAQ for PM2.5 near the coordinate and map to a 0-100 score.
-	If API fails, return None.
+
+def configured_regions() -> List[Tuple[float, float, float, float]]:
+	"""Regions from GEOAI_AQ_REGIONS as "W,S,E,N;W,S,E,N"."""
+	regions = []
+	for part in os.getenv("GEOAI_AQ_REGIONS", "").split(";"):
+		if part.strip():
+			west, south, east, north = (float(v) for v in part.split(","))
+			regions.append((west, south, east, north))
+	return regions
+
+
+def _region_centers(west: float, south: float, east: float, north: float):
+	"""Query centres whose 25 km circles cover the bbox (~0.3° spacing)."""
+	step = 0.3
+	lat = south + step / 2
+	while lat < north + step / 2:
+		lon = west + step / 2
+		while lon < east + step / 2:
+			yield round(min(lat, north), 4), round(min(lon, east), 4)
+			lon += step
+		lat += step
+
+
+def sync_air_quality_stations(regions: Optional[List[Tuple[float, float, float, float]]] = None) -> int:
+	"""Pull latest PM2.5 for every station in ``regions`` into the local store
+	and swap in a fresh KD-tree. Returns the number of stations stored."""
+	regions = regions if regions is not None else configured_regions()
+	stations = {s["id"]: s for s in (_load_store().get("stations") or [])}
+	for west, south, east, north in regions:
+		for lat, lon in _region_centers(west, south, east, north):
+			page = 1
+			while True:
+				params = {
+					"coordinates": f"{lat},{lon}",
+					"radius": _SYNC_RADIUS_M,
+					"parameter": "pm25",
+					"limit": 1000,
+					"page": page,
+				}
+				try:
+					resp = http.get(OPENAQ_URL, params=params, timeout=15)
+					resp.raise_for_status()
+					results = resp.json().get("results") or []
+				except Exception as e:
+					logger.warning(f"OpenAQ sync failed at {lat},{lon}: {e}")
+					break
+				for r in results:
+					coords = r.get("coordinates") or {}
+					if coords.get("latitude") is None or coords.get("longitude") is None:
+						continue
+					for m in r.get("measurements", []):
+						if m.get("parameter") in ("pm25", "pm2.5", "pm_25") and m.get("value") is not None:
+							sid = f"{r.get('location')}@{coords['latitude']:.5f},{coords['longitude']:.5f}"
+							stations[sid] = {
+								"id": sid,
+								"lat": float(coords["latitude"]),
+								"lon": float(coords["longitude"]),
+								"pm25": float(m["value"]),
+								"updated": _parse_ts(m.get("lastUpdated")),
+							}
+							break
+				if len(results) < params["limit"]:
+					break
+				page += 1
+
+	store = {"synced_at": time.time(), "stations": list(stations.values())}
+	os.makedirs(os.path.dirname(AQ_STORE_PATH), exist_ok=True)
+	with open(AQ_STORE_PATH + ".tmp", "w", encoding="utf-8") as f:
+		json.dump(store, f)
+	os.replace(AQ_STORE_PATH + ".tmp", AQ_STORE_PATH)
+	new_index = _build_index(store["stations"])
+	station_store.set(new_index)
+	logger.info(f"Air-quality sync stored {len(stations)} stations ({len(new_index[1])} fresh)")
+	return len(stations)
+
+
+def start_air_quality_sync(interval_s: Optional[float] = None) -> bool:
+	"""Start the periodic station sync if GEOAI_AQ_REGIONS is configured."""
+	if not configured_regions():
+		return False
+	interval = interval_s or float(os.getenv("GEOAI_AQ_SYNC_INTERVAL_S", "3600"))
+	return start_periodic("aq-sync", interval, sync_air_quality_stations)
+
+
+def _local_pm25(latitude: float, longitude: float) -> Optional[Estimate]:
+	"""PM2.5 interpolated from synced and recently seen stations within
+	AQ_MAX_KM, or None if they do not cover the point."""
+	index, values = station_store.get()
+	dist, idx = index.nearest(latitude, longitude, k=AQ_NEIGHBOURS, max_km=AQ_MAX_KM)
+	return pm25_field.estimate(latitude, longitude, extra=(index.lats[idx], index.lons[idx], dist, values[idx]))
+
+
+def estimate_pollution_score(latitude: float, longitude: float) -> Optional[Tuple[float, float, Optional[float]]]:
+	"""PM2.5 near the coordinate mapped to a 0-100 score.
+
+	Returns (score, pm25, interpolation_confidence). Answers from the local
+	station index (nearest stations, inverse-distance weighted) and only
+	queries OpenAQ live for areas the sync does not cover; confidence is None
+	for a live reading. If API fails, return None.
 	"""
+	try:
+		estimate = _local_pm25(latitude, longitude)
+		if estimate is not None:
+			annotate(interpolated=True, confidence=estimate.confidence, neighbours=estimate.neighbours)
+			return _pm25_to_score(estimate.value), round(estimate.value, 1), estimate.confidence
+	except Exception:
+		pass
 	try:
 		params = {
 			"coordinates": f"{latitude},{longitude}",
 			"radius": 10000,
 			"limit": 1,
 		}
-		resp = requests.get(OPENAQ_URL, params=params, timeout=5)
+		resp = http.get(OPENAQ_URL, params=params, timeout=5)
 		resp.raise_for_status()
 		js = resp.json()
 		if not js.get("results"):
 			return None
-		meas = js["results"][0].get("measurements", [])
+		station = js["results"][0]
 		pm25 = None
-		for m in meas:
+		for m in station.get("measurements", []):
 			if m.get("parameter") in ("pm25", "pm2.5", "pm_25"):
 				pm25 = m.get("value")
 				break
 		if pm25 is None:
 			return None
-		v = float(pm25)
-		if v < 10:
-			return 90.0
-		elif v < 25:
-			return 70.0
-		elif v < 50:
-			return 50.0
-		else:
-			return 30.0
+		coords = station.get("coordinates") or {}
+		if coords.get("latitude") is not None and coords.get("longitude") is not None:
+			pm25_field.add(float(coords["latitude"]), float(coords["longitude"]), float(pm25), _parse_ts(m.get("lastUpdated")) or None)
+		return _pm25_to_score(float(pm25)), float(pm25), None
 	except Exception:
 		return None
-
-
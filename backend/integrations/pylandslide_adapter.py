@@ -4,38 +4,80 @@ Get free key: console.cloud.google.com/apis/library/elevation-backend.googleapis
 Fallback to Open-Meteo if no key.
 """
 
-from typing import Optional
+from typing import List, Optional, Tuple
+import datetime as _dt
+import logging
+import os
+import time
 import requests
 import json
 import math
+import numpy as np
 
-def get_elevation(lat: float, lon: float, google_key: Optional[str] = None) -> Optional[float]:
-    """Primary: Google (high-res); fallback Open-Meteo."""
-    if google_key:
-        url = "https://maps.googleapis.com/maps/api/elevation/json"
-        params = {'locations': f"{lat},{lon}", 'key': google_key}
-        try:
-            resp = requests.get(url, params=params, timeout=5)
-            data = resp.json()
-            if data['status'] == 'OK':
-                return data['results'][0]['elevation']
-        except requests.RequestException:
-            pass
-    url = "https://api.open-meteo.com/v1/elevation"
-    params = {'latitude': lat, 'longitude': lon, 'format': 'json'}
+from .background import ReloadingStore, start_periodic
+from .openmeteo_batch import MicroBatcher, coordinate_params, valid_coordinate
+from .paths import get_data_path
+from .spatial import GridIndex
+from . import http
+
+EONET_URL = "https://eonet.gsfc.nasa.gov/api/v3/events"
+LANDSLIDE_STORE_PATH = get_data_path("stores", "landslide_events.json")
+# Local catalogue is trusted only if it was synced within this many hours.
+LANDSLIDE_MAX_STALENESS_H = float(os.getenv("GEOAI_LANDSLIDE_MAX_STALENESS_H", "72"))
+_HISTORY_DAYS = 3650
+_RECENT_SINCE_YEAR = 2023
+
+logger = logging.getLogger(__name__)
+
+
+ELEVATION_URL = "https://api.open-meteo.com/v1/elevation"
+
+
+def _fetch_open_meteo_elevations(points: List[Tuple[float, float]]) -> List[Optional[float]]:
+    params = coordinate_params(points)
+    params['format'] = 'json'
+    resp = http.get(ELEVATION_URL, params=params, timeout=5)
+    resp.raise_for_status()
+    return [None if v is None else float(v) for v in (resp.json().get('elevation') or [])]
+
+
+# Concurrent lookups (and the five points of one slope) share one request.
+_elevation_batcher = MicroBatcher("open-meteo-elevation", _fetch_open_meteo_elevations,
+                                 validate=lambda key: valid_coordinate(key[0], key[1]))
+
+
+def _google_elevation(lat: float, lon: float, google_key: str) -> Optional[float]:
+    url = "https://maps.googleapis.com/maps/api/elevation/json"
+    params = {'locations': f"{lat},{lon}", 'key': google_key}
     try:
-        resp = requests.get(url, params=params, timeout=5)
-        resp.raise_for_status()
-        elevation_list = resp.json().get('elevation')
-        return float(elevation_list[0]) if elevation_list else None
-    except (requests.RequestException, IndexError, ValueError):
-        return None
+        resp = http.get(url, params=params, timeout=5)
+        data = resp.json()
+        if data['status'] == 'OK':
+            return data['results'][0]['elevation']
+    except requests.RequestException:
+        pass
+    return None
+
+
+def get_elevations(points: List[Tuple[float, float]], google_key: Optional[str] = None) -> List[Optional[float]]:
+    """Primary: Google (high-res); fallback Open-Meteo, batched."""
+    elevations = [_google_elevation(lat, lon, google_key) if google_key else None for lat, lon in points]
+    missing = [i for i, e in enumerate(elevations) if e is None]
+    if missing:
+        found = _elevation_batcher.get_many([(round(points[i][0], 5), round(points[i][1], 5)) for i in missing])
+        for i, e in zip(missing, found):
+            elevations[i] = e
+    return elevations
+
+
+def get_elevation(lat: float, lon: float, google_key: Optional[str] = None) -> Optional[float]:
+    return get_elevations([(lat, lon)], google_key)[0]
 
 def estimate_slope(lat: float, lon: float, google_key: Optional[str] = None) -> float:
     """High-res approx with smaller span (0.001° ~111m)."""
     delta = 0.001
     points = [(lat, lon), (lat + delta, lon), (lat, lon + delta), (lat - delta, lon), (lat, lon - delta)]
-    elevations = [get_elevation(p_lat, p_lon, google_key) for p_lat, p_lon in points]
+    elevations = get_elevations(points, google_key)
     elevations = [e for e in elevations if e is not None]
     if len(elevations) < 2:
         return 0.0
@@ -45,18 +87,126 @@ def estimate_slope(lat: float, lon: float, google_key: Optional[str] = None) ->
     avg_gradient = sum(deltas) / len(deltas)
     return round(avg_gradient * 100, 2)
 
+
+def _event_point(event: dict) -> Optional[Tuple[float, float, str]]:
+    """(lat, lon, date) of an EONET event from its latest geometry."""
+    geoms = [g for g in (event.get('geometry') or []) if g.get('coordinates')]
+    if not geoms:
+        return None
+    g = max(geoms, key=lambda g: g.get('date') or '')
+    coords = g['coordinates']
+    if g.get('type') != 'Point':
+        ring = np.asarray(coords[0] if g.get('type') == 'Polygon' else coords, dtype=float).reshape(-1, 2)
+        coords = ring.mean(axis=0)
+    return float(coords[1]), float(coords[0]), (g.get('date') or event.get('date') or '')[:10]
+
+
+def _load_catalogue_file() -> dict:
+    try:
+        with open(LANDSLIDE_STORE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'synced_at': None, 'synced_through': None, 'events': []}
+
+
+def _index_catalogue(store: dict) -> dict:
+    events = store.get('events') or []
+    years = np.array([int(e['date'][:4]) if e.get('date') else 0 for e in events], dtype=np.int32)
+    ordinals = np.array(
+        [_dt.date.fromisoformat(e['date']).toordinal() if e.get('date') else 0 for e in events], dtype=np.int64
+    )
+    return {
+        'synced_at': store.get('synced_at'),
+        'grid': GridIndex([e['lat'] for e in events], [e['lon'] for e in events], cell_deg=0.1),
+        'years': years,
+        'ordinals': ordinals,
+    }
+
+
+# Indexed catalogue, rebuilt when another process re-syncs the store.
+catalogue_store: ReloadingStore[dict] = ReloadingStore(
+    LANDSLIDE_STORE_PATH, lambda: _index_catalogue(_load_catalogue_file())
+)
+
+
+def sync_landslide_catalogue() -> int:
+    """Incrementally pull EONET landslide events newer than the last sync into
+    the local catalogue and re-index it. Returns the number of stored events."""
+    store = _load_catalogue_file()
+    events = {e['id']: e for e in store.get('events') or []}
+    today = _dt.date.today()
+    if store.get('synced_through'):
+        # One day of overlap; duplicates collapse on the event id.
+        start = _dt.date.fromisoformat(store['synced_through']) - _dt.timedelta(days=1)
+    else:
+        start = today - _dt.timedelta(days=_HISTORY_DAYS)
+    params = {'category': 'landslides', 'status': 'all', 'start': start.isoformat(), 'end': today.isoformat()}
+    resp = http.get(EONET_URL, params=params, timeout=60)
+    resp.raise_for_status()
+    for e in resp.json().get('events', []):
+        point = _event_point(e)
+        if point is None or not e.get('id'):
+            continue
+        lat, lon, date = point
+        events[e['id']] = {'id': e['id'], 'lat': lat, 'lon': lon, 'date': date}
+
+    cutoff = (today - _dt.timedelta(days=_HISTORY_DAYS)).isoformat()
+    store = {
+        'synced_at': time.time(),
+        'synced_through': today.isoformat(),
+        'events': [e for e in events.values() if e['date'] >= cutoff],
+    }
+    os.makedirs(os.path.dirname(LANDSLIDE_STORE_PATH), exist_ok=True)
+    with open(LANDSLIDE_STORE_PATH + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(store, f)
+    os.replace(LANDSLIDE_STORE_PATH + '.tmp', LANDSLIDE_STORE_PATH)
+    catalogue_store.set(_index_catalogue(store))
+    logger.info(f"Landslide catalogue synced: {len(store['events'])} events")
+    return len(store['events'])
+
+
+def start_landslide_sync(interval_s: Optional[float] = None) -> bool:
+    """Start the periodic catalogue sync (disable with GEOAI_LANDSLIDE_SYNC=0)."""
+    if os.getenv("GEOAI_LANDSLIDE_SYNC", "1") != "1":
+        return False
+    interval = interval_s or float(os.getenv("GEOAI_LANDSLIDE_SYNC_INTERVAL_S", "21600"))
+    return start_periodic("landslide-sync", interval, sync_landslide_catalogue)
+
+
+def count_landslide_events(west: float, south: float, east: float, north: float) -> Optional[Tuple[int, int]]:
+    """(events in the last ten years, events since _RECENT_SINCE_YEAR) inside
+    the bbox from the local catalogue, or None if it is missing or stale."""
+    cat = catalogue_store.get()
+    synced_at = cat.get('synced_at')
+    if not synced_at or time.time() - synced_at > LANDSLIDE_MAX_STALENESS_H * 3600:
+        return None
+    idx = cat['grid'].query_bbox(west, south, east, north)
+    min_ordinal = (_dt.date.today() - _dt.timedelta(days=_HISTORY_DAYS)).toordinal()
+    in_window = idx[cat['ordinals'][idx] >= min_ordinal]
+    recent = int(np.count_nonzero(cat['years'][in_window] >= _RECENT_SINCE_YEAR))
+    return int(len(in_window)), recent
+
+
+def _fetch_event_counts(latitude: float, longitude: float, delta_bbox: float) -> Tuple[int, int]:
+    bbox = f"{longitude - delta_bbox},{latitude - delta_bbox},{longitude + delta_bbox},{latitude + delta_bbox}"
+    params = {'category': 'landslides', 'bbox': bbox, 'days': _HISTORY_DAYS, 'limit': 50}
+    resp = http.get(EONET_URL, params=params, timeout=10)
+    resp.raise_for_status()
+    points = [_event_point(e) for e in resp.json().get('events', []) if e.get('geometry')]
+    recent = sum(1 for p in points if p and p[2][:4].isdigit() and int(p[2][:4]) >= _RECENT_SINCE_YEAR)
+    return len(points), recent
+
+
 def estimate_landslide_risk_score(latitude: float, longitude: float, api_key: Optional[str] = None, google_key: Optional[str] = None) -> Optional[float]:
     delta_bbox = 0.2
-    bbox = f"{longitude - delta_bbox},{latitude - delta_bbox},{longitude + delta_bbox},{latitude + delta_bbox}"
-    url = "https://eonet.gsfc.nasa.gov/api/v3/events"
-    params = {'category': 'landslides', 'bbox': bbox, 'days': 3650, 'limit': 50}
     num_events = 0
     try:
-        resp = requests.get(url, params=params, timeout=10)
-        resp.raise_for_status()
-        events = [e for e in resp.json().get('events', []) if e.get('geometry')]
-        num_events = len(events)
-        recent = sum(1 for e in events if int(e.get('date', '2025')[:4]) >= 2023)
+        counts = count_landslide_events(
+            longitude - delta_bbox, latitude - delta_bbox, longitude + delta_bbox, latitude + delta_bbox
+        )
+        if counts is None:
+            counts = _fetch_event_counts(latitude, longitude, delta_bbox)
+        num_events, recent = counts
         event_penalty = min((num_events * 8) + (recent * 4), 40)
     except requests.RequestException:
         event_penalty = 0
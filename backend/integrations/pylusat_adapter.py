@@ -1,6 +1,13 @@
 from typing import Optional
-import time
-import requests
+import logging
+import math
+
+from .overpass_tiles import FeatureTiles
+from .request_context import cancelled, sleep_within_deadline
+from .tracing import span
+from . import http
+
+logger = logging.getLogger(__name__)
 
 _MIRRORS = [
 	"https://overpass-api.de/api/interpreter",
@@ -13,23 +20,25 @@ _HEADERS = {
 	"Accept": "application/json",
 }
 
-def _build_roads_query(lat: float, lon: float, radius_m: int) -> str:
-	return f"""
-	[out:json][timeout:25];
-	(
-	  way["highway"~"^(motorway|trunk|primary|secondary|tertiary)$"](around:{radius_m},{lat},{lon});
-	  node["highway"~"^(motorway|trunk|primary|secondary|tertiary)$"](around:{radius_m},{lat},{lon});
-	);
-	out center 20;
-	"""
+# Major roads; each selector is followed by an (s,w,n,e) tile filter
+# (overpass_tiles.py).
+ROAD_SELECTORS = (
+	'way["highway"~"^(motorway|trunk|primary|secondary|tertiary)$"]',
+	'node["highway"~"^(motorway|trunk|primary|secondary|tertiary)$"]',
+)
+
+# Search radii, widened until a road is found.
+ROAD_RADII_M = (1000, 3000, 6000)
 
-def _query_roads(lat: float, lon: float, radius_m: int) -> Optional[dict]:
-	q = _build_roads_query(lat, lon, radius_m)
+def run_roads_query(q: str, timeout: float = 15) -> Optional[dict]:
 	last_err: Optional[Exception] = None
 	for attempt in range(3):
 		for base in _MIRRORS:
+			if cancelled():
+				return None
 			try:
-				resp = requests.post(base, data={"data": q}, headers=_HEADERS, timeout=15)
+				with span("overpass.attempt", attempt=attempt + 1):
+					resp = http.post(base, data={"data": q}, headers=_HEADERS, timeout=timeout)
 				if resp.status_code == 429:
 					last_err = Exception("429 Too Many Requests")
 					continue
@@ -38,47 +47,29 @@ def _query_roads(lat: float, lon: float, radius_m: int) -> Optional[dict]:
 			except Exception as e:
 				last_err = e
 				continue
-		time.sleep(0.8 * (attempt + 1))
+		if not sleep_within_deadline(0.8 * (attempt + 1)):
+			break
+	logger.warning(f"Overpass roads query failed after retries: {last_err}")
 	return None
 
-def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-	from math import radians, sin, cos, sqrt, atan2
-	R = 6371.0
-	phi1, phi2 = radians(lat1), radians(lat2)
-	dphi = radians(lat2 - lat1)
-	dlambda = radians(lon2 - lon1)
-	a = (sin(dphi / 2) ** 2) + cos(phi1) * cos(phi2) * (sin(dlambda / 2) ** 2)
-	c = 2 * atan2(sqrt(a), sqrt(1 - a))
-	return R * c
+# Major-road features per coarse tile; distances are computed per exact point.
+road_tiles = FeatureTiles("proximity", ROAD_SELECTORS, ROAD_RADII_M, run_roads_query)
 
 def compute_proximity_score(latitude: float, longitude: float) -> Optional[float]:
 	"""Estimate access proximity to major roads.
 
 	Closer to major roads is considered better for access/markets.
-	Returns a score in [0, 100].
+	Returns a score in [0, 100], or None if no major road lies within the
+	widest radius or Overpass could not be reached.
 	"""
-	elements = None
-	for radius in (1000, 3000, 6000):
-		data = _query_roads(latitude, longitude, radius)
-		if data and data.get("elements"):
-			elements = data["elements"]
-			break
-	if not elements:
+	min_km = float(road_tiles.nearest_km([latitude], [longitude])[0])
+	if not math.isfinite(min_km):
 		return None
+	return proximity_distance_score(min_km)
 
-	min_km = None
-	for el in elements:
-		if "lat" in el and "lon" in el:
-			d = _haversine_km(latitude, longitude, el["lat"], el["lon"])
-		elif "center" in el and "lat" in el["center"] and "lon" in el["center"]:
-			d = _haversine_km(latitude, longitude, el["center"]["lat"], el["center"]["lon"])
-		else:
-			continue
-		min_km = d if min_km is None else min(min_km, d)
-	if min_km is None:
-		return None
 
-	# Map distance to score (closer = better access)
+def proximity_distance_score(min_km: float) -> float:
+	"""Map distance (km) to the nearest major road to a score (closer = better access)."""
 	if min_km < 0.1:
 		score = 92.0
 	elif min_km < 0.3:
@@ -1,6 +1,9 @@
 import datetime as _dt
-from typing import Optional, Tuple
-import requests
+from typing import List, Optional, Tuple
+from . import http
+from .interpolation import rainfall_field
+from .openmeteo_batch import MicroBatcher, coordinate_params, split_locations, valid_coordinate
+from .tracing import annotate
 
 _HEADERS = {
     "User-Agent": "GeoAI/1.0 (contact: support@example.com)",
@@ -12,38 +15,57 @@ def _daterange_days(days: int) -> Tuple[str, str]:
     start = end - _dt.timedelta(days=days)
     return start.isoformat(), end.isoformat()
 
-def _fetch_open_meteo_sum(lat: float, lon: float, days: int = 60) -> Optional[float]:
-    start, end = _daterange_days(days)
-    url = (
-        "https://archive-api.open-meteo.com/v1/archive"
-        f"?latitude={lat}&longitude={lon}&start_date={start}&end_date={end}"
-        "&daily=precipitation_sum&timezone=auto"
-    )
-    try:
-        resp = requests.get(url, headers=_HEADERS, timeout=20)
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+
+def _fetch_open_meteo_sums(keys: List[Tuple[float, float, int]]) -> List[Optional[float]]:
+    """Precipitation totals for (lat, lon, days) keys, one request per
+    distinct ``days`` covering all of its coordinates."""
+    totals: List[Optional[float]] = [None] * len(keys)
+    for days in sorted({k[2] for k in keys}):
+        idx = [i for i, k in enumerate(keys) if k[2] == days]
+        start, end = _daterange_days(days)
+        params = coordinate_params([keys[i][:2] for i in idx])
+        params.update({"start_date": start, "end_date": end, "daily": "precipitation_sum", "timezone": "auto"})
+        # Failures propagate so the batcher can isolate a rejected key.
+        resp = http.get(ARCHIVE_URL, params=params, headers=_HEADERS, timeout=20)
         resp.raise_for_status()
-        data = resp.json() or {}
-        daily = (data.get("daily") or {})
-        values = daily.get("precipitation_sum") or []
-        if not values:
-            return None
-        total_mm = float(sum(v for v in values if v is not None))
-        return total_mm
-    except Exception:
-        return None
-
-def estimate_rainfall_score(latitude: float, longitude: float) -> Tuple[float, Optional[float]]:
+        locations = split_locations(resp.json())
+        for i, data in zip(idx, locations):
+            values = (data.get("daily") or {}).get("precipitation_sum") or []
+            if values:
+                totals[i] = float(sum(v for v in values if v is not None))
+    return totals
+
+# Concurrent lookups share one multi-location archive request.
+_archive_batcher = MicroBatcher("open-meteo-archive", _fetch_open_meteo_sums,
+                               validate=lambda key: valid_coordinate(key[0], key[1]))
+
+def _fetch_open_meteo_sum(lat: float, lon: float, days: int = 60) -> Optional[float]:
+    return _archive_batcher.get((round(lat, 5), round(lon, 5), days))
+
+def estimate_rainfall_score(latitude: float, longitude: float) -> Tuple[float, Optional[float], Optional[float]]:
     """
-    Returns (score_0_100, total_mm_60d).
+    Returns (score_0_100, total_mm_60d, interpolation_confidence).
     Scoring heuristic (lower rainfall is generally safer for construction/flooding):
       - > 800 mm in 60 days => 20
       - 400–800 mm => 40
       - 100–400 mm => 70
       - < 100 mm => 85
+
+    The total is interpolated from nearby totals fetched earlier when they
+    cover the point well enough (see interpolation.py); confidence is None
+    for a total fetched for the point itself.
     """
-    total_mm = _fetch_open_meteo_sum(latitude, longitude, 60)
-    if total_mm is None:
-        return 50.0, None
+    confidence = None
+    estimate = rainfall_field.estimate(latitude, longitude)
+    if estimate is not None:
+        total_mm, confidence = estimate.value, estimate.confidence
+        annotate(interpolated=True, confidence=confidence, neighbours=estimate.neighbours)
+    else:
+        total_mm = _fetch_open_meteo_sum(latitude, longitude, 60)
+        if total_mm is None:
+            return 50.0, None, None
+        rainfall_field.add(latitude, longitude, total_mm)
     if total_mm > 800:
         score = 20.0
     elif total_mm > 400:
@@ -52,5 +74,5 @@ def estimate_rainfall_score(latitude: float, longitude: float) -> Tuple[float, O
         score = 70.0
     else:
         score = 85.0
-    return score, round(total_mm, 1)
+    return score, round(total_mm, 1), confidence
 
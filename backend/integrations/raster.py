@@ -0,0 +1,373 @@
+"""Memory-mapped gridded rasters for local, constant-time factor lookups.
+
+A raster is stored as two files sharing a base path:
+- ``<base>.json``: header with the grid origin (``west``/``north``), cell size
+  in degrees (``res_x``/``res_y``), ``rows``/``cols``, ``dtype`` and ``nodata``
+- ``<base>.bin``: row-major cell values, row 0 being the northernmost row
+
+Large coverages are split into a TiledRaster: a directory holding
+``index.json`` (grid origin, resolution, tile size and the list of tiles
+present) plus one GridRaster per tile, opened lazily through an LRU.
+
+Binary layers (e.g. land/water) use a BitMask: the same header with
+``"bits": 1`` and the cells packed eight per byte (``np.packbits`` order).
+
+Files are produced by ``tools/build_raster.py`` and opened once per process.
+"""
+
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+class GridRaster:
+	"""Read-only lat/lon grid backed by ``np.memmap``."""
+
+	def __init__(self, base_path: str):
+		with open(base_path + ".json", "r", encoding="utf-8") as f:
+			header = json.load(f)
+		self.header = header
+		self.west = float(header["west"])
+		self.north = float(header["north"])
+		self.res_x = float(header["res_x"])
+		self.res_y = float(header["res_y"])
+		self.rows = int(header["rows"])
+		self.cols = int(header["cols"])
+		self.nodata = header.get("nodata")
+		self.data = np.memmap(
+			base_path + ".bin",
+			dtype=np.dtype(header["dtype"]),
+			mode="r",
+			shape=(self.rows, self.cols),
+		)
+
+	@property
+	def bounds(self):
+		"""(west, south, east, north) in degrees."""
+		return (
+			self.west,
+			self.north - self.rows * self.res_y,
+			self.west + self.cols * self.res_x,
+			self.north,
+		)
+
+	def contains(self, lat: float, lon: float) -> bool:
+		west, south, east, north = self.bounds
+		return west <= lon < east and south < lat <= north
+
+	def _valid(self, v) -> bool:
+		if self.nodata is not None and v == self.nodata:
+			return False
+		return not (isinstance(v, float) and math.isnan(v))
+
+	def cell(self, lat: float, lon: float) -> Optional[float]:
+		"""Value of the cell containing the point, or None outside/no-data."""
+		row = int((self.north - lat) // self.res_y)
+		col = int((lon - self.west) // self.res_x)
+		if row < 0 or col < 0 or row >= self.rows or col >= self.cols:
+			return None
+		v = self.data[row, col].item()
+		return float(v) if self._valid(v) else None
+
+	def bilinear(self, lat: float, lon: float) -> Optional[float]:
+		"""Bilinear interpolation between the four surrounding cell centres.
+
+		No-data neighbours are dropped and the remaining weights renormalised.
+		"""
+		if not self.contains(lat, lon):
+			return None
+		fy = (self.north - lat) / self.res_y - 0.5
+		fx = (lon - self.west) / self.res_x - 0.5
+		r0 = min(max(int(math.floor(fy)), 0), self.rows - 1)
+		c0 = min(max(int(math.floor(fx)), 0), self.cols - 1)
+		r1 = min(r0 + 1, self.rows - 1)
+		c1 = min(c0 + 1, self.cols - 1)
+		ty = min(max(fy - r0, 0.0), 1.0)
+		tx = min(max(fx - c0, 0.0), 1.0)
+		total = 0.0
+		weight = 0.0
+		for r, c, w in (
+			(r0, c0, (1 - ty) * (1 - tx)),
+			(r0, c1, (1 - ty) * tx),
+			(r1, c0, ty * (1 - tx)),
+			(r1, c1, ty * tx),
+		):
+			if w <= 0:
+				continue
+			v = self.data[r, c].item()
+			if not self._valid(v):
+				continue
+			total += float(v) * w
+			weight += w
+		if weight == 0:
+			return None
+		return total / weight
+
+	def value(self, lat: float, lon: float, bilinear: bool = False) -> Optional[float]:
+		return self.bilinear(lat, lon) if bilinear else self.cell(lat, lon)
+
+
+def write_raster(
+	base_path: str,
+	array: np.ndarray,
+	*,
+	west: float,
+	north: float,
+	res_x: float,
+	res_y: float,
+	nodata: Optional[float] = None,
+	**extra,
+) -> None:
+	"""Write a 2-D array (row 0 = north) in the GridRaster format."""
+	arr = np.ascontiguousarray(array)
+	if arr.ndim != 2:
+		raise ValueError("raster array must be 2-D")
+	directory = os.path.dirname(base_path)
+	if directory:
+		os.makedirs(directory, exist_ok=True)
+	header = {
+		"west": float(west),
+		"north": float(north),
+		"res_x": float(res_x),
+		"res_y": float(res_y),
+		"rows": int(arr.shape[0]),
+		"cols": int(arr.shape[1]),
+		"dtype": arr.dtype.str,
+		"nodata": nodata,
+	}
+	header.update(extra)
+	arr.tofile(base_path + ".bin")
+	with open(base_path + ".json.tmp", "w", encoding="utf-8") as f:
+		json.dump(header, f, indent=2)
+	os.replace(base_path + ".json.tmp", base_path + ".json")
+
+
+class TiledRaster:
+	"""Tiled lat/lon grid: tile membership is known from ``index.json``, so
+	lookups never probe the filesystem; hot tiles stay mapped in an LRU."""
+
+	def __init__(self, directory: str, max_open_tiles: int = 64):
+		with open(os.path.join(directory, "index.json"), "r", encoding="utf-8") as f:
+			index = json.load(f)
+		self.directory = directory
+		self.index = index
+		self.west = float(index["west"])
+		self.north = float(index["north"])
+		self.res_x = float(index["res_x"])
+		self.res_y = float(index["res_y"])
+		self.tile_rows = int(index["tile_rows"])
+		self.tile_cols = int(index["tile_cols"])
+		self.tiles = {tuple(t) for t in index["tiles"]}
+		self.max_open_tiles = max(1, int(max_open_tiles))
+		self._lru: "OrderedDict[Tuple[int, int], GridRaster]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def tile_name(tr: int, tc: int) -> str:
+		return f"tile_{tr}_{tc}"
+
+	def _tile(self, key: Tuple[int, int]) -> GridRaster:
+		with self._lock:
+			tile = self._lru.get(key)
+			if tile is not None:
+				self._lru.move_to_end(key)
+				return tile
+		tile = GridRaster(os.path.join(self.directory, self.tile_name(*key)))
+		with self._lock:
+			self._lru[key] = tile
+			self._lru.move_to_end(key)
+			while len(self._lru) > self.max_open_tiles:
+				self._lru.popitem(last=False)
+		return tile
+
+	def value(self, lat: float, lon: float, bilinear: bool = False) -> Optional[float]:
+		row = int((self.north - lat) // self.res_y)
+		col = int((lon - self.west) // self.res_x)
+		if row < 0 or col < 0:
+			return None
+		key = (row // self.tile_rows, col // self.tile_cols)
+		if key not in self.tiles:
+			return None
+		# Interpolation stays within the tile; edges fall back to the cell value.
+		return self._tile(key).value(lat, lon, bilinear=bilinear)
+
+
+class BitMask:
+	"""Read-only bit-packed lat/lon mask backed by ``np.memmap``."""
+
+	def __init__(self, base_path: str):
+		with open(base_path + ".json", "r", encoding="utf-8") as f:
+			header = json.load(f)
+		self.header = header
+		self.west = float(header["west"])
+		self.north = float(header["north"])
+		self.res_x = float(header["res_x"])
+		self.res_y = float(header["res_y"])
+		self.rows = int(header["rows"])
+		self.cols = int(header["cols"])
+		self.bits = np.memmap(base_path + ".bin", dtype=np.uint8, mode="r")
+
+	def is_set(self, lat: float, lon: float) -> Optional[bool]:
+		"""Bit of the cell containing the point; None outside the mask."""
+		row = int((self.north - lat) // self.res_y)
+		col = int((lon - self.west) // self.res_x)
+		if row < 0 or col < 0 or row >= self.rows or col >= self.cols:
+			return None
+		i = row * self.cols + col
+		return bool((int(self.bits[i >> 3]) >> (7 - (i & 7))) & 1)
+
+
+def write_bitmask(
+	base_path: str,
+	mask: np.ndarray,
+	*,
+	west: float,
+	north: float,
+	res_x: float,
+	res_y: float,
+	**extra,
+) -> None:
+	"""Pack a 2-D boolean array (row 0 = north) into the BitMask format."""
+	arr = np.asarray(mask, dtype=bool)
+	if arr.ndim != 2:
+		raise ValueError("mask array must be 2-D")
+	directory = os.path.dirname(base_path)
+	if directory:
+		os.makedirs(directory, exist_ok=True)
+	header = {
+		"west": float(west),
+		"north": float(north),
+		"res_x": float(res_x),
+		"res_y": float(res_y),
+		"rows": int(arr.shape[0]),
+		"cols": int(arr.shape[1]),
+		"bits": 1,
+	}
+	header.update(extra)
+	np.packbits(arr.reshape(-1)).tofile(base_path + ".bin")
+	with open(base_path + ".json.tmp", "w", encoding="utf-8") as f:
+		json.dump(header, f, indent=2)
+	os.replace(base_path + ".json.tmp", base_path + ".json")
+
+
+def write_tiled_raster(
+	directory: str,
+	array: np.ndarray,
+	*,
+	west: float,
+	north: float,
+	res_x: float,
+	res_y: float,
+	tile_cells: int,
+	nodata: Optional[float] = None,
+	**extra,
+) -> int:
+	"""Split a 2-D array into ``tile_cells``-square GridRaster tiles.
+
+	Tiles that are entirely no-data are not written. Returns the tile count.
+	"""
+	arr = np.asarray(array)
+	os.makedirs(directory, exist_ok=True)
+	tiles = []
+	for r0 in range(0, arr.shape[0], tile_cells):
+		for c0 in range(0, arr.shape[1], tile_cells):
+			block = arr[r0:r0 + tile_cells, c0:c0 + tile_cells]
+			empty = bool(np.isnan(block).all()) if block.dtype.kind == "f" else False
+			if nodata is not None and not empty:
+				empty = bool((block == nodata).all())
+			if empty:
+				continue
+			key = (r0 // tile_cells, c0 // tile_cells)
+			write_raster(
+				os.path.join(directory, TiledRaster.tile_name(*key)),
+				block,
+				west=west + c0 * res_x,
+				north=north - r0 * res_y,
+				res_x=res_x,
+				res_y=res_y,
+				nodata=nodata,
+			)
+			tiles.append(list(key))
+	index = {
+		"west": float(west),
+		"north": float(north),
+		"res_x": float(res_x),
+		"res_y": float(res_y),
+		"tile_rows": int(tile_cells),
+		"tile_cols": int(tile_cells),
+		"dtype": arr.dtype.str,
+		"nodata": nodata,
+		"tiles": tiles,
+	}
+	index.update(extra)
+	with open(os.path.join(directory, "index.json.tmp"), "w", encoding="utf-8") as f:
+		json.dump(index, f)
+	os.replace(os.path.join(directory, "index.json.tmp"), os.path.join(directory, "index.json"))
+	return len(tiles)
+
+
+_open_lock = threading.Lock()
+_opened: Dict[str, Optional[GridRaster]] = {}
+
+
+def open_raster(base_path: str) -> Optional[GridRaster]:
+	"""Open (once per process) the raster at ``base_path``; None if absent."""
+	if base_path in _opened:
+		return _opened[base_path]
+	with _open_lock:
+		if base_path not in _opened:
+			raster = None
+			if os.path.exists(base_path + ".json"):
+				try:
+					raster = GridRaster(base_path)
+				except Exception:
+					raster = None
+			_opened[base_path] = raster
+	return _opened[base_path]
+
+
+_opened_tiled: Dict[str, Optional[TiledRaster]] = {}
+
+
+def open_tiled_raster(directory: str, max_open_tiles: Optional[int] = None) -> Optional[TiledRaster]:
+	"""Open (once per process) the tiled raster in ``directory``; None if absent.
+
+	The LRU size defaults to GEOAI_TILE_CACHE_SIZE (64 tiles).
+	"""
+	if directory in _opened_tiled:
+		return _opened_tiled[directory]
+	with _open_lock:
+		if directory not in _opened_tiled:
+			raster = None
+			if os.path.exists(os.path.join(directory, "index.json")):
+				try:
+					size = max_open_tiles or int(os.getenv("GEOAI_TILE_CACHE_SIZE", "64"))
+					raster = TiledRaster(directory, max_open_tiles=size)
+				except Exception:
+					raster = None
+			_opened_tiled[directory] = raster
+	return _opened_tiled[directory]
+
+
+_opened_masks: Dict[str, Optional[BitMask]] = {}
+
+
+def open_bitmask(base_path: str) -> Optional[BitMask]:
+	"""Open (once per process) the bit mask at ``base_path``; None if absent."""
+	if base_path in _opened_masks:
+		return _opened_masks[base_path]
+	with _open_lock:
+		if base_path not in _opened_masks:
+			mask = None
+			if os.path.exists(base_path + ".json"):
+				try:
+					mask = BitMask(base_path)
+				except Exception:
+					mask = None
+			_opened_masks[base_path] = mask
+	return _opened_masks[base_path]
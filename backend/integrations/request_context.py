@@ -0,0 +1,112 @@
+"""Per-request execution context shared with adapter worker threads.
+
+The factor pipeline runs adapters on a thread pool. Work submitted through
+``submit_in_context`` sees the submitting request's context, so adapters can
+cheaply check whether their result is still wanted (``cancelled()``) between
+retries instead of finishing work for a request that has already returned.
+
+A request may also carry a deadline (``deadline_scope``); HTTP timeouts are
+clamped to the time remaining (``request_timeout``) and an expired deadline
+counts as cancellation.
+"""
+
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Optional
+
+import requests
+
+from .tracing import span
+
+
+class DeadlineExceeded(requests.Timeout):
+	"""Raised instead of starting an upstream call after the deadline.
+
+	Subclasses ``requests.Timeout`` so adapters' existing
+	``except requests.RequestException`` fallbacks apply unchanged.
+	"""
+
+
+# Never hand requests a timeout shorter than this (seconds).
+_MIN_TIMEOUT_S = 0.05
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("geoai_deadline", default=None)
+
+_cancel_event: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar(
+	"geoai_cancel_event", default=None
+)
+
+
+def new_cancel_scope() -> threading.Event:
+	"""Install a fresh cancel flag for the current context and return it."""
+	event = threading.Event()
+	_cancel_event.set(event)
+	return event
+
+
+def cancelled() -> bool:
+	"""True once the current request has no further use for adapter results."""
+	event = _cancel_event.get()
+	if event is not None and event.is_set():
+		return True
+	deadline = _deadline.get()
+	return deadline is not None and time.monotonic() >= deadline
+
+
+@contextlib.contextmanager
+def deadline_scope(deadline_ms: Optional[float]):
+	"""Bound all adapter work in this context to ``deadline_ms`` from now.
+
+	``None`` leaves any enclosing deadline in place; nested scopes can only
+	shorten it.
+	"""
+	if deadline_ms is None:
+		yield
+		return
+	new = time.monotonic() + max(float(deadline_ms), 0.0) / 1000.0
+	current = _deadline.get()
+	token = _deadline.set(new if current is None else min(current, new))
+	try:
+		yield
+	finally:
+		_deadline.reset(token)
+
+
+def remaining_s() -> Optional[float]:
+	"""Seconds left before the current deadline (None without a deadline)."""
+	deadline = _deadline.get()
+	if deadline is None:
+		return None
+	return deadline - time.monotonic()
+
+
+def request_timeout(default: float) -> float:
+	"""``default`` clamped to the remaining deadline.
+
+	Raises DeadlineExceeded when the deadline has already passed.
+	"""
+	left = remaining_s()
+	if left is None:
+		return default
+	if left <= 0:
+		raise DeadlineExceeded("request deadline exceeded")
+	return max(min(default, left), _MIN_TIMEOUT_S)
+
+
+def sleep_within_deadline(seconds: float) -> bool:
+	"""Back off for ``seconds`` unless that would overrun the deadline or the
+	request is cancelled; returns False when the caller should give up."""
+	left = remaining_s()
+	if cancelled() or (left is not None and left <= seconds):
+		return False
+	with span("backoff", seconds=seconds):
+		time.sleep(seconds)
+	return True
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+	"""``executor.submit`` that runs ``fn`` inside a copy of the caller's context."""
+	ctx = contextvars.copy_context()
+	return executor.submit(ctx.run, fn, *args, **kwargs)
@@ -0,0 +1,162 @@
+"""Spatial memo of recently computed factor values.
+
+Analysts click around the same spots, so a new point often lies a few
+metres from one scored minutes ago. Every completed evaluation is kept with
+its location and time in an in-process index of recent results and, when
+configured, in MongoDB (``suitability_results`` with a ``2dsphere`` index)
+so results computed by other workers are found too.
+
+Each factor has its own reuse radius: rainfall and pollution barely change
+over a kilometre. Water and road distance are never reused, since they
+change within metres and the water veto depends on the exact value. A lookup
+returns, per factor, the value of the nearest fresh prior result inside that
+radius; the pipeline then skips those adapters. Only values the pipeline
+produced for the stored request are recorded (never memo-reused or degraded
+ones), so reuse does not chain from point to point. Those values may come
+from the per-cell factor cache (cache.py), so they are only as exact as its
+cells. The cheap local factors (flood, soil) are always recomputed.
+"""
+
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .spatial import RecentPointIndex, TimedPoint, haversine_km
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Reuse radius in km per factor (0 or absent = never reused).
+MEMO_REUSE_KM: Dict[str, float] = {
+	"rainfall": 2.0,
+	"pollution": 2.0,
+	"landslide": 1.0,
+	"landuse": 0.1,
+	"proximity": 0.0,
+	"water": 0.0,
+}
+
+
+def _apply_radius_overrides(spec: str) -> None:
+	"""GEOAI_MEMO_RADII="rainfall=5,water=0" (km)."""
+	for part in spec.split(","):
+		name, _, km = part.partition("=")
+		if name.strip() and km.strip():
+			MEMO_REUSE_KM[name.strip()] = float(km)
+
+
+_apply_radius_overrides(os.getenv("GEOAI_MEMO_RADII", ""))
+
+# Results older than this are never reused.
+MEMO_MAX_AGE_S = float(os.getenv("GEOAI_MEMO_MAX_AGE_S", "3600"))
+# Recent results kept in process.
+MEMO_CAPACITY = int(os.getenv("GEOAI_MEMO_CAPACITY", "20000"))
+# Candidates examined per lookup (results may hold only some factors).
+_NEIGHBOURS = 16
+
+
+class ResultMemo:
+	"""Recent factor values by location, with an optional MongoDB backing."""
+
+	def __init__(self, capacity: int = MEMO_CAPACITY, max_age_s: float = MEMO_MAX_AGE_S, collection=None):
+		self.max_age_s = max_age_s
+		self.collection = collection
+		self._points = RecentPointIndex(capacity, max_age_s)
+
+	def __len__(self) -> int:
+		return len(self._points)
+
+	@property
+	def max_radius_km(self) -> float:
+		return max(MEMO_REUSE_KM.values(), default=0.0)
+
+	def record(self, lat: float, lon: float, values: Dict[str, Any]) -> None:
+		"""Remember factor ``values`` (raw pipeline values, keyed by factor)
+		produced for a request at this point."""
+		values = {k: v for k, v in values.items() if MEMO_REUSE_KM.get(k, 0) > 0}
+		if not values:
+			return
+		stored_at = time.time()
+		self._points.add(lat, lon, values, stored_at)
+		if self.collection is not None:
+			try:
+				self.collection.insert_one({
+					"location": {"type": "Point", "coordinates": [lon, lat]},
+					"factors": {k: list(v) if isinstance(v, tuple) else v for k, v in values.items()},
+					"tuples": [k for k, v in values.items() if isinstance(v, tuple)],
+					"stored_at": datetime.fromtimestamp(stored_at, timezone.utc),
+				})
+			except Exception as e:
+				logger.warning(f"Result memo write failed: {e}")
+
+	def _mongo_candidates(self, lat: float, lon: float) -> List[Tuple[float, TimedPoint]]:
+		radius = self.max_radius_km
+		cutoff = time.time() - self.max_age_s
+		with span("memo.mongo"):
+			docs = self.collection.find(
+				{
+					"location": {"$nearSphere": {"$geometry": {"type": "Point", "coordinates": [lon, lat]}, "$maxDistance": radius * 1000.0}},
+					"stored_at": {"$gte": datetime.fromtimestamp(cutoff, timezone.utc)},
+				},
+				limit=_NEIGHBOURS,
+			)
+			out = []
+			for doc in docs:
+				d_lon, d_lat = doc["location"]["coordinates"]
+				values = {k: tuple(v) if k in doc.get("tuples", ()) else v for k, v in doc["factors"].items()}
+				stored_at = doc["stored_at"].replace(tzinfo=timezone.utc).timestamp()
+				out.append((float(haversine_km(lat, lon, d_lat, d_lon)), TimedPoint(d_lat, d_lon, stored_at, values)))
+			return out
+
+	def lookup(self, lat: float, lon: float, factors=None) -> Dict[str, Tuple[Any, float]]:
+		"""{factor: (value, distance_km)} for each factor (default: all) with a
+		fresh prior value inside its reuse radius."""
+		wanted = [f for f in (factors or MEMO_REUSE_KM) if MEMO_REUSE_KM.get(f, 0) > 0]
+		if not wanted:
+			return {}
+		found = self._pick(self._points.nearest(lat, lon, _NEIGHBOURS, self.max_radius_km), wanted)
+		if self.collection is not None and len(found) < len(wanted):
+			try:
+				more = self._pick(self._mongo_candidates(lat, lon), [f for f in wanted if f not in found])
+				found.update(more)
+			except Exception as e:
+				logger.debug(f"Result memo lookup in MongoDB failed: {e}")
+		return found
+
+	@staticmethod
+	def _pick(candidates, wanted) -> Dict[str, Tuple[Any, float]]:
+		found = {}
+		for distance, point in sorted(candidates, key=lambda c: c[0]):
+			for name in wanted:
+				if name not in found and name in point.item and distance <= MEMO_REUSE_KM[name]:
+					found[name] = (point.item[name], distance)
+		return found
+
+	def clear(self) -> None:
+		self._points.clear()
+
+
+result_memo = ResultMemo()
+
+
+def configure_result_memo(collection=None, enabled: bool = True) -> None:
+	"""Back the memo with a MongoDB collection (2dsphere + TTL indexes are
+	created here), or disable it with ``enabled=False``."""
+	global result_memo
+	if not enabled:
+		result_memo = None
+		return
+	if collection is not None:
+		try:
+			collection.create_index([("location", "2dsphere")])
+			collection.create_index("stored_at", expireAfterSeconds=int(max(MEMO_MAX_AGE_S, 60)))
+		except Exception as e:
+			logger.warning(f"Result memo indexes not created ({e}); using the in-process memo only")
+			collection = None
+	result_memo = ResultMemo(collection=collection)
+
+
+def get_result_memo() -> Optional[ResultMemo]:
+	return result_memo
@@ -1,12 +1,27 @@
+import os
 from typing import Optional
-import random
 
+from .paths import get_data_path
+from .raster import open_raster
 
-def estimate_soil_quality_score(latitude: float, longitude: float) -> Optional[float]:
-	"""Placeholder soil quality score. Replace with real soil datasets or APIs.
-	Currently returns a deterministic pseudo-random score based on rounded coords.
+
+SOIL_RASTER_PATH = get_data_path("rasters", "soil_quality")
+SOIL_BILINEAR = os.getenv("GEOAI_SOIL_BILINEAR", "0") == "1"
+
+
+def estimate_soil_quality_score(latitude: float, longitude: float, bilinear: Optional[bool] = None) -> Optional[float]:
+	"""Soil quality score (0-100) from the local gridded soil dataset.
+
+	The dataset is a memory-mapped raster built with ``tools/build_raster.py``
+	(values already mapped to 0-100). Lookups are O(1); ``bilinear`` (default
+	GEOAI_SOIL_BILINEAR) interpolates between neighbouring cells.
+	Returns None without a dataset or outside its coverage, so the pipeline
+	reports the factor as unavailable.
 	"""
-	seed = int(round(latitude * 1000)) ^ int(round(longitude * 1000))
-	random.seed(seed)
-	return float(round(40 + random.random() * 60, 2))
+	raster = open_raster(SOIL_RASTER_PATH)
+	if raster is not None:
+		v = raster.value(latitude, longitude, bilinear=SOIL_BILINEAR if bilinear is None else bilinear)
+		if v is not None:
+			return float(round(min(max(v, 0.0), 100.0), 2))
+	return None
 
@@ -0,0 +1,197 @@
+"""Nearest-neighbour helpers over lat/lon points.
+
+Points are embedded as unit vectors on the sphere so a KD-tree over
+Euclidean (chord) distance answers great-circle nearest-neighbour queries
+without projection artefacts near the poles or the antimeridian.
+"""
+
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def latlon_to_xyz(lat, lon) -> np.ndarray:
+	"""Vectorized lat/lon (degrees) -> (N, 3) unit vectors."""
+	lat = np.radians(np.asarray(lat, dtype=np.float64))
+	lon = np.radians(np.asarray(lon, dtype=np.float64))
+	cos_lat = np.cos(lat)
+	return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def km_to_chord(km: float) -> float:
+	return 2.0 * np.sin(min(km / EARTH_RADIUS_KM, np.pi) / 2.0)
+
+
+def chord_to_km(chord) -> np.ndarray:
+	return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2.0, 0.0, 1.0))
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+	"""Vectorized great-circle distance in km (broadcasts like NumPy)."""
+	phi1, phi2 = np.radians(lat1), np.radians(lat2)
+	dphi = phi2 - phi1
+	dlambda = np.radians(np.asarray(lon2) - np.asarray(lon1))
+	a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+	return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class PointIndex:
+	"""Immutable KD-tree over lat/lon points; build a new one to add points."""
+
+	def __init__(self, lats, lons):
+		self.lats = np.asarray(lats, dtype=np.float64).reshape(-1)
+		self.lons = np.asarray(lons, dtype=np.float64).reshape(-1)
+		self.tree = cKDTree(latlon_to_xyz(self.lats, self.lons)) if len(self.lats) else None
+
+	def __len__(self) -> int:
+		return len(self.lats)
+
+	def nearest(self, lat: float, lon: float, k: int = 1, max_km: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+		"""Return (distances_km, indices) of up to ``k`` points within ``max_km``,
+		nearest first."""
+		if self.tree is None:
+			return np.empty(0), np.empty(0, dtype=np.int64)
+		k = min(k, len(self.lats))
+		bound = km_to_chord(max_km) if max_km is not None else np.inf
+		dist, idx = self.tree.query(latlon_to_xyz(lat, lon), k=k, distance_upper_bound=bound)
+		dist, idx = np.atleast_1d(dist), np.atleast_1d(idx)
+		keep = np.isfinite(dist)
+		return chord_to_km(dist[keep]), idx[keep].astype(np.int64)
+
+	def nearest_distances(self, lats, lons, max_km: Optional[float] = None) -> np.ndarray:
+		"""Distance (km) from each query point to its nearest indexed point;
+		inf where none lies within ``max_km``."""
+		lats = np.asarray(lats, dtype=np.float64).reshape(-1)
+		if self.tree is None:
+			return np.full(len(lats), np.inf)
+		bound = km_to_chord(max_km) if max_km is not None else np.inf
+		dist, _ = self.tree.query(latlon_to_xyz(lats, lons), k=1, distance_upper_bound=bound)
+		return np.where(np.isfinite(dist), chord_to_km(np.where(np.isfinite(dist), dist, 0.0)), np.inf)
+
+	def within(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+		"""Indices of all points within ``radius_km``."""
+		if self.tree is None:
+			return np.empty(0, dtype=np.int64)
+		return np.asarray(self.tree.query_ball_point(latlon_to_xyz(lat, lon), km_to_chord(radius_km)), dtype=np.int64)
+
+
+class TimedPoint:
+	__slots__ = ("lat", "lon", "stored_at", "item")
+
+	def __init__(self, lat: float, lon: float, stored_at: float, item: Any):
+		self.lat = lat
+		self.lon = lon
+		self.stored_at = stored_at
+		self.item = item
+
+
+class RecentPointIndex:
+	"""Points added over time, each carrying an item, that expire after
+	``max_age_s``.
+
+	New points go to a short tail scanned linearly; once it holds
+	``rebuild_every`` points it is merged into a fresh KD-tree (expired points
+	dropped, the oldest beyond ``capacity`` too). Thread-safe.
+	"""
+
+	def __init__(self, capacity: int, max_age_s: float, rebuild_every: int = 256):
+		self.capacity = capacity
+		self.max_age_s = max_age_s
+		self.rebuild_every = rebuild_every
+		self._lock = threading.Lock()
+		self._indexed: List[TimedPoint] = []
+		self._index = PointIndex([], [])
+		self._tail: List[TimedPoint] = []
+
+	def __len__(self) -> int:
+		return len(self._indexed) + len(self._tail)
+
+	def _rebuild(self) -> None:
+		cutoff = time.time() - self.max_age_s
+		points = [p for p in self._indexed + self._tail if p.stored_at >= cutoff][-self.capacity:]
+		self._index = PointIndex([p.lat for p in points], [p.lon for p in points])
+		self._indexed = points
+		self._tail = []
+
+	def add(self, lat: float, lon: float, item: Any, stored_at: Optional[float] = None) -> None:
+		point = TimedPoint(lat, lon, time.time() if stored_at is None else stored_at, item)
+		with self._lock:
+			self._tail.append(point)
+			if len(self._tail) >= self.rebuild_every:
+				self._rebuild()
+
+	def nearest(self, lat: float, lon: float, k: int, max_km: float) -> List[Tuple[float, TimedPoint]]:
+		"""Up to ``k`` unexpired (distance_km, point) pairs within ``max_km``,
+		nearest first."""
+		with self._lock:
+			index, indexed, tail = self._index, self._indexed, list(self._tail)
+		cutoff = time.time() - self.max_age_s
+		dist, idx = index.nearest(lat, lon, k=k, max_km=max_km)
+		out = [(float(d), indexed[i]) for d, i in zip(dist, idx)]
+		if tail:
+			d = haversine_km(lat, lon, np.array([p.lat for p in tail]), np.array([p.lon for p in tail]))
+			out.extend((float(d[i]), tail[i]) for i in np.flatnonzero(d <= max_km))
+		out = [c for c in out if c[1].stored_at >= cutoff]
+		out.sort(key=lambda c: c[0])
+		return out[:k]
+
+	def clear(self) -> None:
+		with self._lock:
+			self._indexed, self._tail = [], []
+			self._index = PointIndex([], [])
+
+
+class GridIndex:
+	"""Uniform lat/lon grid bucketing for bounding-box queries.
+
+	Points are sorted by cell id once; a bbox query visits only the cells it
+	overlaps (binary search per cell row) and then filters exactly.
+	"""
+
+	def __init__(self, lats, lons, cell_deg: float = 0.1):
+		self.cell_deg = float(cell_deg)
+		self._ncols = int(round(360.0 / self.cell_deg)) + 1
+		lats = np.asarray(lats, dtype=np.float64).reshape(-1)
+		lons = np.asarray(lons, dtype=np.float64).reshape(-1)
+		cells = self._cell_ids(lats, lons)
+		self.order = np.argsort(cells, kind="stable")
+		self.cells = cells[self.order]
+		self.lats = lats
+		self.lons = lons
+
+	def __len__(self) -> int:
+		return len(self.lats)
+
+	def _rc(self, lat, lon):
+		row = np.floor((np.asarray(lat) + 90.0) / self.cell_deg).astype(np.int64)
+		col = np.floor((np.asarray(lon) + 180.0) / self.cell_deg).astype(np.int64)
+		return row, col
+
+	def _cell_ids(self, lat, lon) -> np.ndarray:
+		row, col = self._rc(lat, lon)
+		return row * self._ncols + col
+
+	def query_bbox(self, west: float, south: float, east: float, north: float) -> np.ndarray:
+		"""Indices (into the original arrays) of points inside the bbox."""
+		if len(self.lats) == 0:
+			return np.empty(0, dtype=np.int64)
+		r0, c0 = self._rc(south, west)
+		r1, c1 = self._rc(north, east)
+		parts = []
+		for row in range(int(r0), int(r1) + 1):
+			# Cells of one row are contiguous in id space.
+			lo = np.searchsorted(self.cells, row * self._ncols + int(c0), side="left")
+			hi = np.searchsorted(self.cells, row * self._ncols + int(c1), side="right")
+			if hi > lo:
+				parts.append(self.order[lo:hi])
+		if not parts:
+			return np.empty(0, dtype=np.int64)
+		idx = np.concatenate(parts)
+		lat, lon = self.lats[idx], self.lons[idx]
+		keep = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+		return idx[keep]
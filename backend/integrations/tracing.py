@@ -0,0 +1,195 @@
+"""Lightweight per-request tracing.
+
+A request that asks for it (``?debug=1``) runs inside ``trace_scope``; code
+on its path opens nested ``span``s (factor adapters, upstream HTTP
+attempts, model inference, MongoDB commands). Spans follow the request into
+factor worker threads through the context copied by ``submit_in_context``.
+Outside a trace ``span`` is a no-op, so instrumentation costs one
+ContextVar lookup on untraced requests.
+
+Finished traces are returned under the response's ``debug.trace`` and, when
+GEOAI_TRACE_FILE is set, appended to that file in Chrome trace-event format
+(open with chrome://tracing or https://ui.perfetto.dev).
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+	from pymongo.monitoring import CommandListener
+except ImportError:
+	CommandListener = object
+
+TRACE_FILE = os.getenv("GEOAI_TRACE_FILE")
+# Trace every scoring request (for the trace file), not only ?debug=1 ones.
+TRACE_ALL = os.getenv("GEOAI_TRACE_ALL", "0") == "1"
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("geoai_span", default=None)
+_file_lock = threading.Lock()
+
+
+class Span:
+	__slots__ = ("name", "attrs", "start", "end", "thread", "children")
+
+	def __init__(self, name: str, attrs: Dict[str, Any]):
+		self.name = name
+		self.attrs = attrs
+		self.start = time.perf_counter()
+		self.end: Optional[float] = None
+		self.thread = threading.get_ident()
+		self.children: List["Span"] = []
+
+	def set(self, **attrs) -> None:
+		self.attrs.update(attrs)
+
+	def to_dict(self, origin: Optional[float] = None) -> dict:
+		origin = self.start if origin is None else origin
+		out = {
+			"name": self.name,
+			"start_ms": round((self.start - origin) * 1000, 2),
+			"duration_ms": None if self.end is None else round((self.end - self.start) * 1000, 2),
+		}
+		if self.attrs:
+			out["attrs"] = self.attrs
+		if self.end is None:
+			out["running"] = True  # e.g. a factor abandoned at the deadline
+		if self.children:
+			out["children"] = [c.to_dict(origin) for c in list(self.children)]
+		return out
+
+	def _events(self, origin: float, origin_us: float, pid: int) -> List[dict]:
+		events = []
+		if self.end is not None:
+			events.append({
+				"name": self.name,
+				"ph": "X",
+				"ts": round(origin_us + (self.start - origin) * 1e6, 1),
+				"dur": round((self.end - self.start) * 1e6, 1),
+				"pid": pid,
+				"tid": self.thread,
+				"args": self.attrs,
+			})
+		for child in list(self.children):
+			events.extend(child._events(origin, origin_us, pid))
+		return events
+
+
+class _NoSpan:
+	"""Stand-in yielded by ``span`` outside a trace."""
+
+	def set(self, **attrs) -> None:
+		pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def active() -> bool:
+	return _current.get() is not None
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs):
+	"""Child span of the current one; a no-op when the request is not traced."""
+	parent = _current.get()
+	if parent is None:
+		yield _NO_SPAN
+		return
+	s = Span(name, attrs)
+	parent.children.append(s)
+	token = _current.set(s)
+	try:
+		yield s
+	except BaseException as e:
+		s.attrs["error"] = f"{type(e).__name__}: {e}"
+		raise
+	finally:
+		s.end = time.perf_counter()
+		_current.reset(token)
+
+
+def annotate(**attrs) -> None:
+	"""Add attributes to the current span, if any."""
+	current = _current.get()
+	if current is not None:
+		current.set(**attrs)
+
+
+@contextlib.contextmanager
+def trace_scope(name: str, enabled: bool = True, **attrs):
+	"""Root span for one request. Yields the root Span (None when disabled);
+	on exit it is appended to GEOAI_TRACE_FILE if configured."""
+	if not enabled:
+		yield None
+		return
+	root = Span(name, attrs)
+	token = _current.set(root)
+	try:
+		yield root
+	finally:
+		root.end = time.perf_counter()
+		_current.reset(token)
+		if TRACE_FILE:
+			write_chrome_trace(root, TRACE_FILE)
+
+
+def write_chrome_trace(root: Span, path: str) -> None:
+	"""Append the trace's finished spans as Chrome "complete" events.
+
+	The file is a JSON array left open, which trace viewers accept, so each
+	request is a cheap append.
+	"""
+	# Anchor perf_counter times to wall time so traces from several requests
+	# and workers line up in one file.
+	origin_us = (time.time() - (time.perf_counter() - root.start)) * 1e6
+	events = root._events(root.start, origin_us, os.getpid())
+	with _file_lock:
+		new = not os.path.exists(path) or os.path.getsize(path) == 0
+		with open(path, "a", encoding="utf-8") as f:
+			if new:
+				f.write("[\n")
+			for event in events:
+				f.write(json.dumps(event, default=str) + ",\n")
+
+
+class MongoTraceListener(CommandListener):
+	"""pymongo command listener recording each command as a span.
+
+	Register with ``MongoClient(..., event_listeners=[MongoTraceListener()])``.
+	Listener callbacks run on the thread issuing the command, so the span
+	lands in that request's trace.
+	"""
+
+	def __init__(self):
+		self._open: Dict[int, Span] = {}
+		self._lock = threading.Lock()
+
+	def started(self, event) -> None:
+		parent = _current.get()
+		if parent is None:
+			return
+		s = Span(f"mongo.{event.command_name}", {"db": event.database_name})
+		collection = event.command.get(event.command_name)
+		if isinstance(collection, str):
+			s.attrs["collection"] = collection
+		parent.children.append(s)
+		with self._lock:
+			self._open[event.request_id] = s
+
+	def _finish(self, event, **attrs) -> None:
+		with self._lock:
+			s = self._open.pop(event.request_id, None)
+		if s is not None:
+			s.end = time.perf_counter()
+			s.attrs.update(attrs)
+
+	def succeeded(self, event) -> None:
+		self._finish(event)
+
+	def failed(self, event) -> None:
+		self._finish(event, error=str(event.failure))
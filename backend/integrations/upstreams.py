@@ -0,0 +1,264 @@
+"""Outbound request budgets for the public APIs the adapters call.
+
+Every adapter request goes through ``http.py``, which calls ``throttle(url)``
+first. Each upstream host has a token bucket whose state is shared by all
+worker processes (a flock-ed file per host, or a MongoDB collection for
+multi-host deployments), so the deployment as a whole stays within each
+provider's usage policy: calls queue briefly for their token instead of
+tripping 429s and the adapters' retry loops. GEOAI_RATE_LIMITS=0 disables it.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+try:
+	import fcntl
+except ImportError:  # Windows
+	fcntl = None
+
+try:
+	from pymongo import ReturnDocument
+except ImportError:
+	ReturnDocument = None
+
+from .paths import get_data_path
+from .request_context import DeadlineExceeded, remaining_s
+
+logger = logging.getLogger(__name__)
+
+# host -> (requests per second, burst)
+UPSTREAM_RATES: Dict[str, Tuple[float, float]] = {
+	"overpass-api.de": (1.0, 2),
+	"overpass.kumi.systems": (1.0, 2),
+	"overpass.openstreetmap.ru": (0.5, 1),
+	"nominatim.openstreetmap.org": (1.0, 1),  # usage policy: max 1 req/s
+	"api.open-meteo.com": (5.0, 10),
+	"archive-api.open-meteo.com": (2.0, 5),
+	"api.openaq.org": (1.0, 5),
+	"eonet.gsfc.nasa.gov": (1.0, 5),
+	"maps.googleapis.com": (10.0, 20),
+}
+
+# Upstream hosts each factor adapter may call (local factors have none).
+FACTOR_UPSTREAMS: Dict[str, Tuple[str, ...]] = {
+	"rainfall": ("archive-api.open-meteo.com",),
+	"pollution": ("api.openaq.org",),
+	"landslide": ("api.open-meteo.com", "maps.googleapis.com", "eonet.gsfc.nasa.gov"),
+	"landuse": ("overpass-api.de",),
+	"proximity": ("overpass-api.de", "overpass.kumi.systems", "overpass.openstreetmap.ru"),
+	"water": ("overpass-api.de", "overpass.openstreetmap.ru", "overpass.kumi.systems", "nominatim.openstreetmap.org"),
+	"flood": (),
+	"soil": (),
+}
+
+
+def _apply_rate_overrides(spec: str) -> None:
+	"""GEOAI_UPSTREAM_RATES="overpass-api.de=0.5:1,api.openaq.org=2" (rate[:burst])."""
+	for part in spec.split(","):
+		if not part.strip():
+			continue
+		host, _, rate = part.partition("=")
+		rate, _, burst = rate.partition(":")
+		UPSTREAM_RATES[host.strip()] = (float(rate), float(burst) if burst.strip() else max(float(rate), 1.0))
+
+
+_apply_rate_overrides(os.getenv("GEOAI_UPSTREAM_RATES", ""))
+
+
+def _take(tokens: float, updated: float, now: float, rate: float, burst: float, max_wait: Optional[float]):
+	"""Refill, then reserve one token. Returns (wait seconds or None if over
+	``max_wait``, new token count)."""
+	tokens = min(max(burst, 1.0), tokens + max(now - updated, 0.0) * rate)
+	wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+	if max_wait is not None and wait > max_wait:
+		return None, tokens
+	# Tokens may go negative: later callers queue behind this one.
+	return wait, tokens - 1
+
+
+class LocalBuckets:
+	"""Per-process buckets (single worker, or platforms without fcntl)."""
+
+	def __init__(self):
+		self._state: Dict[str, Tuple[float, float]] = {}
+		self._lock = threading.Lock()
+
+	def reserve(self, host: str, rate: float, burst: float, max_wait: Optional[float]) -> Optional[float]:
+		with self._lock:
+			now = time.time()
+			tokens, updated = self._state.get(host, (burst, now))
+			wait, tokens = _take(tokens, updated, now, rate, burst, max_wait)
+			self._state[host] = (tokens, now)
+			return wait
+
+	def drain(self, host: str, rate: float, seconds: float) -> None:
+		with self._lock:
+			tokens, _ = self._state.get(host, (0.0, time.time()))
+			self._state[host] = (min(tokens, -seconds * rate), time.time())
+
+
+class FileBuckets:
+	"""Buckets shared by every process on the host: one small state file per
+	upstream, read-modify-written under an exclusive ``flock``."""
+
+	def __init__(self, directory: str):
+		self.directory = directory
+		os.makedirs(directory, exist_ok=True)
+
+	def _update(self, host: str, fn):
+		fd = os.open(os.path.join(self.directory, f"{host}.bucket"), os.O_RDWR | os.O_CREAT, 0o644)
+		try:
+			fcntl.flock(fd, fcntl.LOCK_EX)
+			raw = os.read(fd, 64).split()
+			now = time.time()
+			state = (float(raw[0]), float(raw[1])) if len(raw) == 2 else None
+			result, tokens = fn(state, now)
+			os.lseek(fd, 0, os.SEEK_SET)
+			os.ftruncate(fd, 0)
+			os.write(fd, f"{tokens!r} {now!r}".encode("ascii"))
+			return result
+		finally:
+			os.close(fd)  # releases the lock
+
+	def reserve(self, host: str, rate: float, burst: float, max_wait: Optional[float]) -> Optional[float]:
+		def fn(state, now):
+			tokens, updated = state or (burst, now)
+			return _take(tokens, updated, now, rate, burst, max_wait)
+		return self._update(host, fn)
+
+	def drain(self, host: str, rate: float, seconds: float) -> None:
+		self._update(host, lambda state, now: (None, min(state[0] if state else 0.0, -seconds * rate)))
+
+
+class MongoBuckets:
+	"""Buckets shared by the whole deployment: one document per upstream,
+	updated atomically with a pipeline update (MongoDB 4.2+)."""
+
+	def __init__(self, collection):
+		self.collection = collection
+
+	def reserve(self, host: str, rate: float, burst: float, max_wait: Optional[float]) -> Optional[float]:
+		now = time.time()
+		refilled = {"$min": [max(burst, 1.0), {"$add": [
+			{"$ifNull": ["$tokens", burst]},
+			{"$multiply": [{"$max": [0, {"$subtract": [now, {"$ifNull": ["$updated", now]}]}]}, rate]},
+		]}]}
+		doc = self.collection.find_one_and_update(
+			{"_id": host},
+			[{"$set": {"tokens": {"$subtract": [refilled, 1]}, "updated": now}}],
+			upsert=True,
+			return_document=ReturnDocument.AFTER,
+		)
+		tokens = float(doc["tokens"])
+		wait = 0.0 if tokens >= 0 else -tokens / rate
+		if max_wait is not None and wait > max_wait:
+			self.collection.update_one({"_id": host}, {"$inc": {"tokens": 1}})
+			return None
+		return wait
+
+	def drain(self, host: str, rate: float, seconds: float) -> None:
+		self.collection.update_one(
+			{"_id": host},
+			{"$min": {"tokens": -seconds * rate}, "$set": {"updated": time.time()}},
+			upsert=True,
+		)
+
+
+# Longest a call queues for its token (less if the request deadline is
+# nearer); past it the call fails fast and the factor degrades. Batch tools
+# raise it with set_max_queue_wait.
+MAX_QUEUE_WAIT_S = float(os.getenv("GEOAI_RATE_LIMIT_MAX_WAIT_S", "2"))
+# Longest a 429 Retry-After holds every process off a host.
+MAX_RETRY_AFTER_S = 30.0
+
+_enabled = os.getenv("GEOAI_RATE_LIMITS", "1") == "1"
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def enable_rate_limits(enabled: bool = True) -> None:
+	global _enabled
+	_enabled = enabled
+
+
+def set_max_queue_wait(seconds: float) -> None:
+	global MAX_QUEUE_WAIT_S
+	MAX_QUEUE_WAIT_S = float(seconds)
+
+
+def configure_rate_limits(kind: Optional[str] = None, mongo_collection=None) -> str:
+	"""Select the bucket store: "mongo" (needs ``mongo_collection``), "file"
+	(GEOAI_RATE_LIMIT_DIR, default data/ratelimit) or "local".
+
+	Defaults to GEOAI_RATE_LIMIT_BACKEND, else "file"; falls back to "local"
+	when the chosen store is unavailable. Returns the backend in use.
+	"""
+	global _backend
+	kind = kind or os.getenv("GEOAI_RATE_LIMIT_BACKEND", "file")
+	backend = None
+	if kind == "mongo" and mongo_collection is not None and ReturnDocument is not None:
+		backend = MongoBuckets(mongo_collection)
+	elif kind == "file" and fcntl is not None:
+		try:
+			backend = FileBuckets(os.getenv("GEOAI_RATE_LIMIT_DIR") or get_data_path("ratelimit"))
+		except OSError as e:
+			logger.warning(f"Rate limit directory unavailable ({e}); limiting per process")
+	if backend is None:
+		kind = "local"
+		backend = LocalBuckets()
+	with _backend_lock:
+		_backend = backend
+	return kind
+
+
+def _get_backend():
+	if _backend is None:
+		configure_rate_limits()
+	return _backend
+
+
+def throttle(url: str) -> None:
+	"""Wait for the host's budget; hosts without a configured rate pass through.
+
+	Raises DeadlineExceeded if the wait would outlast the request deadline
+	(or MAX_QUEUE_WAIT_S without one).
+	"""
+	if not _enabled:
+		return
+	host = urlsplit(url).hostname or ""
+	limits = UPSTREAM_RATES.get(host)
+	if limits is None:
+		return
+	left = remaining_s()
+	max_wait = MAX_QUEUE_WAIT_S if left is None else min(left, MAX_QUEUE_WAIT_S)
+	try:
+		wait = _get_backend().reserve(host, limits[0], limits[1], max_wait)
+	except Exception as e:
+		# A broken shared store must not take the adapters down with it.
+		logger.warning(f"Rate limiter unavailable for {host}: {e}")
+		return
+	if wait is None:
+		raise DeadlineExceeded(f"rate limit wait for {host} exceeds deadline")
+	if wait > 0:
+		time.sleep(wait)
+
+
+def note_throttled(url: str, retry_after: Optional[str]) -> None:
+	"""The upstream answered 429: hold every process off the host for
+	Retry-After seconds (default one token interval)."""
+	host = urlsplit(url).hostname or ""
+	limits = UPSTREAM_RATES.get(host)
+	if not _enabled or limits is None:
+		return
+	try:
+		seconds = float(retry_after) if retry_after else 1.0 / limits[0]
+	except ValueError:
+		seconds = 1.0 / limits[0]
+	try:
+		_get_backend().drain(host, limits[0], min(seconds, MAX_RETRY_AFTER_S))
+	except Exception as e:
+		logger.warning(f"Rate limiter unavailable for {host}: {e}")
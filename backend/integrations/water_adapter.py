@@ -1,8 +1,17 @@
 
-import time
-import requests
+import logging
+import math
 from typing import Optional, Tuple
 
+from .paths import get_data_path
+from .overpass_tiles import FeatureTiles
+from .raster import open_bitmask
+from .request_context import cancelled, sleep_within_deadline
+from .tracing import span
+from . import http
+
+logger = logging.getLogger(__name__)
+
 OVERPASS_URLS = [
     "https://overpass-api.de/api/interpreter",
     "https://overpass.openstreetmap.ru/api/interpreter",
@@ -16,44 +25,61 @@ _DEFAULT_HEADERS = {
 
 NOMINATIM_REVERSE_URL = "https://nominatim.openstreetmap.org/reverse"
 
-def _build_overpass_query(lat: float, lon: float, radius_m: int) -> str:
-    return f"""
-    [out:json][timeout:50];
-    (
-      node["natural"="water"](around:{radius_m},{lat},{lon});
-      way["natural"="water"](around:{radius_m},{lat},{lon});
-      relation["natural"="water"](around:{radius_m},{lat},{lon});
+WATER_MASK_PATH = get_data_path("rasters", "water_mask")
 
-      node["natural"="wetland"](around:{radius_m},{lat},{lon});
-      way["natural"="wetland"](around:{radius_m},{lat},{lon});
 
-      node["landuse"="reservoir"](around:{radius_m},{lat},{lon});
-      way["landuse"="reservoir"](around:{radius_m},{lat},{lon});
+def load_water_mask():
+    """Memory-map the land/water mask (once per process); None if not installed."""
+    return open_bitmask(WATER_MASK_PATH)
 
-      node["water"](around:{radius_m},{lat},{lon});
-      way["water"](around:{radius_m},{lat},{lon});
 
-      node["waterway"~"^(river|stream|canal|drain|ditch)$"](around:{radius_m},{lat},{lon});
-      way["waterway"~"^(river|stream|canal|drain|ditch)$"](around:{radius_m},{lat},{lon});
-    );
-    out center 60;
+def is_on_water(lat: float, lon: float) -> Optional[bool]:
     """
-
-def _query_overpass(lat: float, lon: float, radius_m: int) -> Optional[dict]:
+    O(1) lookup in the precomputed bit-packed land/water mask.
+    Returns None when no mask is installed or the point is outside it.
+    """
+    mask = load_water_mask()
+    if mask is None:
+        return None
+    return mask.is_set(lat, lon)
+
+# Overpass element selectors for water features; each is followed by an
+# (s,w,n,e) tile filter (overpass_tiles.py).
+WATER_SELECTORS = (
+    'node["natural"="water"]',
+    'way["natural"="water"]',
+    'relation["natural"="water"]',
+    'node["natural"="wetland"]',
+    'way["natural"="wetland"]',
+    'node["landuse"="reservoir"]',
+    'way["landuse"="reservoir"]',
+    'node["water"]',
+    'way["water"]',
+    'node["waterway"~"^(river|stream|canal|drain|ditch)$"]',
+    'way["waterway"~"^(river|stream|canal|drain|ditch)$"]',
+)
+
+# Search radii, widened until something is found.
+WATER_RADII_M = (1000, 3000, 7000, 12000)
+
+
+def run_overpass_query(query: str, timeout: float = 15) -> Optional[dict]:
     """
-    Query Overpass with retries across mirrors and backoff.
+    Run an Overpass query with retries across mirrors and backoff.
     """
-    query = _build_overpass_query(lat, lon, radius_m)
     last_err: Optional[Exception] = None
     for attempt in range(3):  
         for base_url in OVERPASS_URLS:
+            if cancelled():
+                return None
             try:
-                resp = requests.post(
-                    base_url,
-                    data={"data": query},
-                    headers=_DEFAULT_HEADERS,
-                    timeout=15,
-                )
+                with span("overpass.attempt", attempt=attempt + 1):
+                    resp = http.post(
+                        base_url,
+                        data={"data": query},
+                        headers=_DEFAULT_HEADERS,
+                        timeout=timeout,
+                    )
                 if resp.status_code == 429:
                     last_err = Exception("429 Too Many Requests")
                     continue
@@ -63,10 +89,15 @@ def _query_overpass(lat: float, lon: float, radius_m: int) -> Optional[dict]:
                 last_err = e
                 continue
 
-        time.sleep(0.8 * (attempt + 1))
-    print(f"Overpass query failed after retries: {last_err}")
+        if not sleep_within_deadline(0.8 * (attempt + 1)):
+            break
+    logger.warning(f"Overpass query failed after retries: {last_err}")
     return None
 
+
+# Water features per coarse tile; distances are computed per exact point.
+water_tiles = FeatureTiles("water", WATER_SELECTORS, WATER_RADII_M, run_overpass_query)
+
 def _reverse_check_on_water(lat: float, lon: float) -> bool:
     """
     Fallback: use Nominatim reverse geocoding to see if point lies on water.
@@ -81,7 +112,7 @@ def _reverse_check_on_water(lat: float, lon: float) -> bool:
             "addressdetails": 1,
             "extratags": 1,
         }
-        resp = requests.get(NOMINATIM_REVERSE_URL, params=params, headers=_DEFAULT_HEADERS, timeout=12)
+        resp = http.get(NOMINATIM_REVERSE_URL, params=params, headers=_DEFAULT_HEADERS, timeout=12)
         resp.raise_for_status()
         data = resp.json() or {}
         extra = data.get("extratags") or {}
@@ -114,51 +145,36 @@ def _reverse_check_on_water(lat: float, lon: float) -> bool:
         return False
     return False
 
-def estimate_water_proximity_score(latitude: float, longitude: float) -> Tuple[float, Optional[float]]:
+def estimate_water_proximity_score(latitude: float, longitude: float) -> Optional[Tuple[float, Optional[float]]]:
     """
     Estimate distance (km) to nearest water body and map to a suitability score.
     Returns (score_0_100, distance_km). Closer to water is riskier for construction.
-    Uses adaptive radius so we find water features if they are reasonably close.
+    The distance is measured from this exact point to the water features of
+    its tile (water_tiles), searched out to ever wider radii; None if Overpass
+    could not be reached.
     """
-    elements = None
-    detection_source = None
-    for radius_m in (1000, 3000, 7000, 12000):
-        data = _query_overpass(latitude, longitude, radius_m)
-        if data and data.get("elements"):
-            elements = data["elements"]
-            detection_source = f"overpass_{radius_m}m"
-            break
-
-    if not elements:
-        if _reverse_check_on_water(latitude, longitude):
-            return 5.0, 0.0
-        return 50.0, None
-
-    from math import radians, sin, cos, sqrt, atan2
-    def haversine_km(lat1, lon1, lat2, lon2):
-        R = 6371.0
-        phi1, phi2 = radians(lat1), radians(lat2)
-        dphi = radians(lat2 - lat1)
-        dlambda = radians(lon2 - lon1)
-        a = (sin(dphi / 2) ** 2) + cos(phi1) * cos(phi2) * (sin(dlambda / 2) ** 2)
-        c = 2 * atan2(sqrt(a), sqrt(1 - a))
-        return R * c
-
-    min_km = None
-    for el in elements:
-        if "lat" in el and "lon" in el:
-            d = haversine_km(latitude, longitude, el["lat"], el["lon"])
-        elif "center" in el and "lat" in el["center"] and "lon" in el["center"]:
-            d = haversine_km(latitude, longitude, el["center"]["lat"], el["center"]["lon"])
-        else:
-            continue
-        min_km = d if min_km is None else min(min_km, d)
-
-
-    if min_km is None:
-        return 50.0, None
-
-
+    min_km = float(water_tiles.nearest_km([latitude], [longitude])[0])
+    if math.isnan(min_km):
+        return None
+    if math.isinf(min_km):
+        return no_water_found(latitude, longitude)
+    return water_distance_score(min_km), round(min_km, 3)
+
+
+def no_water_found(latitude: float, longitude: float) -> Tuple[float, Optional[float]]:
+    """Result when Overpass finds no water within the widest radius: the
+    point may still lie on open water (sea, large lakes) that OSM maps only
+    as coastline, so check the mask, then Nominatim."""
+    on_water = is_on_water(latitude, longitude)
+    if on_water is None:
+        on_water = _reverse_check_on_water(latitude, longitude)
+    if on_water:
+        return 5.0, 0.0
+    return 50.0, None
+
+
+def water_distance_score(min_km: float) -> float:
+    """Map distance (km) to the nearest water feature to a 0-100 score."""
     if min_km < 0.02:         # ~20m: effectively on water
         score = 5.0           # Block-level risk
     elif min_km < 0.05:       # 20–50m: extremely close
@@ -174,4 +190,4 @@ def estimate_water_proximity_score(latitude: float, longitude: float) -> Tuple[f
     else:                      # Far away
         score = 92.0
 
-    return score, round(min_km, 3)
\ No newline at end of file
+    return score
\ No newline at end of file
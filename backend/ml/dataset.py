@@ -0,0 +1,158 @@
+"""
+Columnar training dataset for the suitability model.
+
+Layout (one directory per dataset):
+    meta.json        committed row count, column dtypes/shapes and source names
+    <column>.bin     raw little-endian values, one fixed-width record per row
+
+Rows are appended in chunks across runs and read back as read-only
+``np.memmap`` arrays, so tens of millions of rows never become Python objects.
+The row count in ``meta.json`` is the commit point: bytes past it (from an
+interrupted append) are ignored on load and truncated on the next append.
+"""
+
+import json
+import os
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+
+DEFAULT_DATASET_DIR = os.getenv(
+    "GEOAI_DATASET_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset"),
+)
+
+NUM_FEATURES = 8
+
+# column name -> (dtype, per-row shape)
+COLUMNS = {
+    "features": ("<f4", (NUM_FEATURES,)),
+    "label": ("<f4", ()),
+    "latitude": ("<f8", ()),
+    "longitude": ("<f8", ()),
+    "source": ("u1", ()),
+    "created": ("<i8", ()),
+}
+
+_META_FILE = "meta.json"
+
+# Location cell (degrees) that is held out or trained on as a whole, so
+# jittered copies of one location never end up on both sides of the split.
+HOLDOUT_CELL_DEG = 0.01
+HOLDOUT_FRACTION = 0.1
+
+
+def _read_meta(path: str) -> Optional[dict]:
+    meta_path = os.path.join(path, _META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_meta(path: str, meta: dict) -> None:
+    tmp = os.path.join(path, _META_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(path, _META_FILE))
+
+
+def _row_bytes(dtype: str, shape: tuple) -> int:
+    return int(np.dtype(dtype).itemsize * int(np.prod(shape, dtype=np.int64)))
+
+
+def append_rows(
+    features,
+    labels,
+    latitudes,
+    longitudes,
+    source: str,
+    path: str = DEFAULT_DATASET_DIR,
+) -> int:
+    """Append a chunk of rows to the dataset at ``path`` (created on first use).
+
+    ``source`` is a short tag such as "api", "augmented" or "production"; it is
+    stored as a one-byte code with the name table kept in ``meta.json``.
+    Returns the total committed row count.
+    """
+    features = np.ascontiguousarray(features, dtype=COLUMNS["features"][0]).reshape(-1, NUM_FEATURES)
+    n = features.shape[0]
+    if n == 0:
+        meta = _read_meta(path)
+        return int(meta["rows"]) if meta else 0
+
+    os.makedirs(path, exist_ok=True)
+    meta = _read_meta(path) or {
+        "version": 1,
+        "rows": 0,
+        "columns": {name: {"dtype": dt, "shape": list(shape)} for name, (dt, shape) in COLUMNS.items()},
+        "sources": [],
+    }
+    if source not in meta["sources"]:
+        if len(meta["sources"]) >= 255:
+            raise ValueError("too many distinct dataset sources")
+        meta["sources"].append(source)
+    source_code = meta["sources"].index(source)
+
+    chunk = {
+        "features": features,
+        "label": np.asarray(labels, dtype=COLUMNS["label"][0]).reshape(n),
+        "latitude": np.asarray(latitudes, dtype=COLUMNS["latitude"][0]).reshape(n),
+        "longitude": np.asarray(longitudes, dtype=COLUMNS["longitude"][0]).reshape(n),
+        "source": np.full(n, source_code, dtype=COLUMNS["source"][0]),
+        "created": np.full(n, int(time.time()), dtype=COLUMNS["created"][0]),
+    }
+
+    committed = int(meta["rows"])
+    for name, (dtype, shape) in COLUMNS.items():
+        col_path = os.path.join(path, f"{name}.bin")
+        with open(col_path, "ab") as f:
+            # Drop any partial tail left by an interrupted append.
+            f.truncate(committed * _row_bytes(dtype, shape))
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(chunk[name]).tobytes())
+
+    meta["rows"] = committed + n
+    _write_meta(path, meta)
+    return meta["rows"]
+
+
+def load_dataset(path: str = DEFAULT_DATASET_DIR, columns: Optional[Sequence[str]] = None) -> dict:
+    """Open the dataset as read-only memory-mapped arrays.
+
+    Returns a dict of column name -> ``np.memmap`` plus ``"sources"`` (the list
+    of source names indexed by the ``source`` column). Empty or missing
+    datasets yield zero-length arrays.
+    """
+    meta = _read_meta(path)
+    rows = int(meta["rows"]) if meta else 0
+    out: dict = {}
+    for name in columns or COLUMNS.keys():
+        dtype, shape = COLUMNS[name]
+        if rows == 0:
+            out[name] = np.empty((0,) + shape, dtype=dtype)
+            continue
+        out[name] = np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode="r", shape=(rows,) + shape)
+    out["sources"] = list(meta["sources"]) if meta else []
+    return out
+
+
+def dataset_size(path: str = DEFAULT_DATASET_DIR) -> int:
+    meta = _read_meta(path)
+    return int(meta["rows"]) if meta else 0
+
+
+def holdout_mask(lats, lons, fraction: float) -> np.ndarray:
+    """Deterministic per-location split: True for held-out rows."""
+    if fraction <= 0:
+        return np.zeros(len(lats), dtype=bool)
+    cells = (np.floor((np.asarray(lats) + 90.0) / HOLDOUT_CELL_DEG).astype(np.uint64) << np.uint64(32)) \
+        ^ np.floor((np.asarray(lons) + 180.0) / HOLDOUT_CELL_DEG).astype(np.uint64)
+    # splitmix64 finaliser: well-mixed bits from sequential cell ids.
+    with np.errstate(over="ignore"):
+        z = cells + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53) < fraction
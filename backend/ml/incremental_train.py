@@ -0,0 +1,196 @@
+"""
+Incremental retraining of the suitability model.
+
+Each run
+  1. pulls the complete factor vectors stored since the last run from the
+     factor store snapshot (integrations/factor_store.py) into the training
+     dataset (source "store"), labelled with the weighted suitability score
+     as train_model.py labels its rows;
+  2. continues boosting the live model (registry CURRENT, else the legacy
+     pickle) on the dataset rows added since the last run, adding --rounds
+     trees instead of training from scratch;
+  3. evaluates the previous and the updated model on the held-out rows
+     (dataset.holdout_mask: whole ~1 km location cells, never trained on);
+  4. publishes the update (running servers swap it in) unless its held-out
+     RMSE is worse than the previous model's by more than --max-regression.
+
+The dataset row count a model was trained through is kept in its meta.json
+and the last factor store time pulled in <dataset>/store_pull.json, so the
+cost of a run follows the new data, not the size of the dataset. A base
+model without that count (the legacy pickle, older registry versions) is
+refused; retrain it in full with ml/train_model.py first.
+
+Example:
+  python ml/incremental_train.py
+  python ml/incremental_train.py --rounds 50 --dry-run
+"""
+
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import pickle
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import xgboost as xgb
+
+from integrations import FACTOR_ORDER, score_matrix
+from integrations.factor_store import STORE_SNAPSHOT_PATH, FactorStore
+from ml.dataset import DEFAULT_DATASET_DIR, HOLDOUT_FRACTION, append_rows, dataset_size, holdout_mask, load_dataset
+from ml.registry import DEFAULT_REGISTRY_DIR, LEGACY_VERSION, current_version, load_version, publish
+
+MODEL_NAME = "suitability"
+LEGACY_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_xgboost.pkl")
+
+
+def load_base_model(root: str = DEFAULT_REGISTRY_DIR) -> Tuple[Any, Dict]:
+    """(model, meta) of the live suitability model."""
+    if current_version(MODEL_NAME, root) is not None:
+        return load_version(MODEL_NAME, root=root)
+    if not os.path.exists(LEGACY_MODEL_PATH):
+        raise FileNotFoundError("no suitability model to continue from; run ml/train_model.py first")
+    with open(LEGACY_MODEL_PATH, "rb") as f:
+        return pickle.load(f), {"version": LEGACY_VERSION}
+
+
+def _pull_state_path(dataset: str) -> str:
+    return os.path.join(dataset, "store_pull.json")
+
+
+def pull_store_rows(path: str = STORE_SNAPSHOT_PATH, dataset: str = DEFAULT_DATASET_DIR) -> int:
+    """Append store cells with all factors known and any of them stored
+    since the previous pull; returns the rows appended."""
+    state_path = _pull_state_path(dataset)
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            since = float(json.load(f).get("store_through", 0.0))
+    except (OSError, ValueError):
+        since = 0.0
+    store = FactorStore()
+    if store.load(path) == 0:
+        return 0
+    records, epoch = store.records()
+    F = store.records_matrix(records)
+    stamps = epoch + records["stored_at"].astype(np.float64) * 60.0
+    newest = stamps.max(axis=1)
+    take = ~np.isnan(F).any(axis=1) & (newest > since)
+    if not take.any():
+        return 0
+    lats, lons = store.cell_center(records["cell"][take])
+    append_rows(F[take], score_matrix(F[take]), lats, lons, source="store", path=dataset)
+    # Written after the rows are committed: a crash in between re-pulls
+    # them next time rather than losing them.
+    with open(state_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"store_through": float(newest[take].max()), "pulled_at": time.time()}, f)
+    os.replace(state_path + ".tmp", state_path)
+    return int(take.sum())
+
+
+def _holdout_rows(ds: dict, fraction: float, max_rows: int) -> np.ndarray:
+    held = np.flatnonzero(holdout_mask(ds["latitude"], ds["longitude"], fraction))
+    if len(held) > max_rows:
+        held = held[np.linspace(0, len(held) - 1, max_rows).astype(np.int64)]
+    return held
+
+
+def _errors(model, X: np.ndarray, y: np.ndarray) -> Dict[str, Optional[float]]:
+    if len(X) == 0:
+        return {"rmse": None, "mae": None}
+    err = model.predict(X) - y
+    return {"rmse": round(float(np.sqrt(np.mean(err ** 2))), 4), "mae": round(float(np.mean(np.abs(err))), 4)}
+
+
+def continue_boosting(base, X: np.ndarray, y: np.ndarray, rounds: int):
+    """A copy of ``base`` with ``rounds`` more trees fitted to (X, y)."""
+    model = xgb.XGBRegressor(**base.get_params())
+    model.set_params(n_estimators=rounds)
+    model.fit(X, y, xgb_model=base.get_booster())
+    return model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20, help="boosting rounds added per run (default 20)")
+    parser.add_argument("--holdout", type=float, default=HOLDOUT_FRACTION,
+                        help=f"fraction of locations held out (default {HOLDOUT_FRACTION}, as train_model.py)")
+    parser.add_argument("--eval-rows", type=int, default=50000, help="held-out rows evaluated at most (default 50000)")
+    parser.add_argument("--max-regression", type=float, default=0.05,
+                        help="publish only if held-out RMSE grows by at most this fraction (default 0.05)")
+    parser.add_argument("--min-rows", type=int, default=1, help="skip the run below this many new training rows")
+    parser.add_argument("--store", default=STORE_SNAPSHOT_PATH, help="factor store snapshot to pull from")
+    parser.add_argument("--no-store", action="store_true", help="only train on rows already in the dataset")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET_DIR)
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="train and evaluate, but do not publish")
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    base, base_meta = load_base_model(args.registry)
+    base_version = base_meta.get("version")
+    if "dataset_rows" not in base_meta:
+        # Legacy pickle or a model published before the row count was kept:
+        # which rows it saw is unknown, so continuing could train on rows it
+        # already fitted or on held-out ones.
+        print(f"{MODEL_NAME}/{base_version} does not record the dataset rows it was trained on; "
+              f"run ml/train_model.py for a full retrain first")
+        return 2
+    trained_rows = int(base_meta["dataset_rows"])
+    print(f"Base model: {MODEL_NAME}/{base_version} (trained through dataset row {trained_rows})")
+
+    if not args.no_store:
+        pulled = pull_store_rows(args.store, args.dataset)
+        print(f"Pulled {pulled} new factor vectors from {args.store}")
+
+    total_rows = dataset_size(args.dataset)
+    if trained_rows > total_rows:
+        print(f"Dataset has {total_rows} rows, fewer than the {trained_rows} already trained on; "
+              f"starting over from row 0 of {args.dataset}")
+        trained_rows = 0
+    ds = load_dataset(args.dataset)
+    new = np.arange(trained_rows, total_rows)
+    train = new[~holdout_mask(ds["latitude"][new], ds["longitude"][new], args.holdout)]
+    if len(train) < max(args.min_rows, 1):
+        print(f"{len(train)} new training rows (< {max(args.min_rows, 1)}); nothing to do")
+        return 0
+
+    held = _holdout_rows(ds, args.holdout, args.eval_rows)
+    X_eval, y_eval = np.asarray(ds["features"][held]), np.asarray(ds["label"][held])
+    X_new, y_new = np.asarray(ds["features"][train]), np.asarray(ds["label"][train])
+
+    t = time.time()
+    model = continue_boosting(base, X_new, y_new, args.rounds)
+    fit_s = time.time() - t
+    before, after = _errors(base, X_eval, y_eval), _errors(model, X_eval, y_eval)
+    print(f"Trained {args.rounds} rounds on {len(train)} new rows in {fit_s:.2f}s "
+          f"({model.get_booster().num_boosted_rounds()} trees in total)")
+    print(f"Held-out ({len(held)} rows): RMSE {before['rmse']} -> {after['rmse']}, MAE {before['mae']} -> {after['mae']}")
+
+    if before["rmse"] is not None and after["rmse"] > before["rmse"] * (1.0 + args.max_regression):
+        print(f"Held-out RMSE regressed by more than {args.max_regression:.0%}; not publishing")
+        return 1
+    if args.dry_run:
+        print("Dry run; not publishing")
+        return 0
+    version = publish(MODEL_NAME, model, {
+        "incremental": True,
+        "base_version": base_version,
+        "rounds": args.rounds,
+        "new_rows": int(len(train)),
+        "dataset_rows": int(total_rows),
+        "holdout_rows": int(len(held)),
+        "holdout_rmse": after["rmse"],
+        "holdout_mae": after["mae"],
+        "previous_holdout_rmse": before["rmse"],
+        "features": list(FACTOR_ORDER),
+        "dataset": args.dataset,
+        "train_seconds": round(fit_s, 3),
+    }, root=args.registry)
+    print(f"Published {MODEL_NAME}/{version} ({args.registry}) in {time.time() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Versioned model registry with atomic hot-swap.
+
+Layout (one directory per model name):
+    <name>/<version>/model.pkl     pickled estimator
+    <name>/<version>/meta.json     version, created, metrics, feature count, ...
+    <name>/CURRENT                 version string of the live model
+
+``publish`` writes a new version and (by default) moves CURRENT to it.
+Serving processes hold a ``ModelHandle``: the model and its version live in
+one tuple that is replaced in a single assignment, so a request that already
+took the old model keeps using it while new requests see the new one. A
+reload loads and warms the new version on a background thread first; the
+handle also notices CURRENT moving (checked at most every
+``check_interval_s``), so every worker follows a publish or a reload made
+through any one of them.
+"""
+
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_REGISTRY_DIR = os.getenv(
+    "GEOAI_MODEL_REGISTRY",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"),
+)
+
+LEGACY_VERSION = "legacy"
+
+logger = logging.getLogger(__name__)
+
+
+def _model_dir(name: str, root: str) -> str:
+    return os.path.join(root, name)
+
+
+def current_version(name: str, root: str = DEFAULT_REGISTRY_DIR) -> Optional[str]:
+    try:
+        with open(os.path.join(_model_dir(name, root), "CURRENT"), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def list_versions(name: str, root: str = DEFAULT_REGISTRY_DIR):
+    """Published versions, oldest first."""
+    base = _model_dir(name, root)
+    if not os.path.isdir(base):
+        return []
+    return sorted(v for v in os.listdir(base) if os.path.exists(os.path.join(base, v, "meta.json")))
+
+
+def set_current(name: str, version: str, root: str = DEFAULT_REGISTRY_DIR) -> None:
+    base = _model_dir(name, root)
+    if not os.path.exists(os.path.join(base, version, "meta.json")):
+        raise ValueError(f"unknown {name} model version: {version}")
+    with open(os.path.join(base, "CURRENT.tmp"), "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(os.path.join(base, "CURRENT.tmp"), os.path.join(base, "CURRENT"))
+
+
+def publish(name: str, model: Any, meta: Optional[Dict] = None, make_current: bool = True,
+            root: str = DEFAULT_REGISTRY_DIR) -> str:
+    """Store ``model`` as a new version and return the version string."""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    base = _model_dir(name, root)
+    version, n = stamp, 1
+    while os.path.exists(os.path.join(base, version)):
+        n += 1
+        version = f"{stamp}-{n}"
+    tmp_dir = os.path.join(base, f".{version}.tmp")
+    os.makedirs(tmp_dir)
+    with open(os.path.join(tmp_dir, "model.pkl"), "wb") as f:
+        pickle.dump(model, f)
+    info = dict(meta or {})
+    info.update({"name": name, "version": version, "created": time.time()})
+    n_features = getattr(model, "n_features_in_", None)
+    if n_features is not None:
+        info.setdefault("n_features", int(n_features))
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2, default=str)
+    # Rename last so a half-written version is never visible.
+    os.replace(tmp_dir, os.path.join(base, version))
+    if make_current:
+        set_current(name, version, root)
+    logger.info(f"Published {name} model {version}")
+    return version
+
+
+def load_version(name: str, version: Optional[str] = None, root: str = DEFAULT_REGISTRY_DIR) -> Tuple[Any, Dict]:
+    """(model, meta) for ``version`` (default: CURRENT)."""
+    version = version or current_version(name, root)
+    if version is None:
+        raise FileNotFoundError(f"no {name} model published in {root}")
+    path = os.path.join(_model_dir(name, root), version)
+    with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    with open(os.path.join(path, "model.pkl"), "rb") as f:
+        model = pickle.load(f)
+    return model, meta
+
+
+def warm_up(model: Any, n_features: Optional[int]) -> None:
+    """One prediction so lazy initialisation happens before the swap, not on
+    the first live request."""
+    n = n_features or getattr(model, "n_features_in_", None)
+    if n:
+        model.predict(np.full((1, int(n)), 50.0))
+
+
+class ModelHandle:
+    """The live (model, version) of one registry name in this process.
+
+    Without a published version the handle serves ``legacy_path`` (version
+    "legacy"), or whatever ``fallback()`` builds if that file is missing too.
+    """
+
+    def __init__(self, name: str, legacy_path: Optional[str] = None,
+                 fallback: Optional[Callable[[], Any]] = None, root: str = DEFAULT_REGISTRY_DIR,
+                 check_interval_s: float = 30.0):
+        self.name = name
+        self.legacy_path = legacy_path
+        self.fallback = fallback
+        self.root = root
+        self.check_interval_s = check_interval_s
+        self._live: Optional[Tuple[Any, str]] = None
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._checked_at = 0.0
+        self.last_reload: Dict[str, Any] = {}
+
+    def _load(self, version: Optional[str] = None) -> Tuple[Any, Dict]:
+        version = version or current_version(self.name, self.root)
+        if version is not None:
+            return load_version(self.name, version, self.root)
+        meta = {"version": LEGACY_VERSION}
+        if self.legacy_path and os.path.exists(self.legacy_path):
+            with open(self.legacy_path, "rb") as f:
+                return pickle.load(f), meta
+        if self.fallback is not None:
+            return self.fallback(), meta
+        raise FileNotFoundError(f"no {self.name} model available")
+
+    def current(self) -> Tuple[Any, str]:
+        """(model, version). Loads on first use; afterwards a plain read, plus
+        an occasional check whether CURRENT moved."""
+        live = self._live
+        if live is None:
+            with self._load_lock:
+                if self._live is None:
+                    model, meta = self._load()
+                    self._live = (model, meta["version"])
+                    self._checked_at = time.monotonic()
+                    logger.info(f"{self.name} model {self._live[1]} loaded")
+                live = self._live
+        elif time.monotonic() - self._checked_at >= self.check_interval_s:
+            self._checked_at = time.monotonic()
+            published = current_version(self.name, self.root)
+            if published is not None and published != live[1]:
+                self.reload_async(published)
+        return live
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._live[1] if self._live is not None else None
+
+    def reload(self, version: Optional[str] = None) -> str:
+        """Load and warm ``version`` (default CURRENT), then swap it in."""
+        with self._reload_lock:
+            started = time.time()
+            model, meta = self._load(version)
+            loaded = meta["version"]
+            warm_up(model, meta.get("n_features"))
+            previous = self.version
+            self._live = (model, loaded)  # atomic swap
+            self._checked_at = time.monotonic()
+            self.last_reload = {
+                "version": loaded,
+                "previous": previous,
+                "seconds": round(time.time() - started, 3),
+                "at": time.time(),
+            }
+            logger.info(f"{self.name} model swapped {previous} -> {loaded}")
+            return loaded
+
+    def reload_async(self, version: Optional[str] = None) -> bool:
+        """Reload on a background thread; False if a reload is already running."""
+        if self._reload_lock.locked():
+            return False
+
+        def _run():
+            try:
+                self.reload(version)
+            except Exception as e:
+                self.last_reload = {"error": str(e), "version": version, "at": time.time()}
+                logger.error(f"{self.name} model reload failed: {e}")
+
+        threading.Thread(target=_run, name=f"model-reload-{self.name}", daemon=True).start()
+        return True
+
@@ -6,6 +6,8 @@ import pickle
 import numpy as np
 import xgboost as xgb
 from integrations import *
+from ml.dataset import append_rows, holdout_mask, load_dataset, DEFAULT_DATASET_DIR, HOLDOUT_FRACTION
+from ml.registry import publish, DEFAULT_REGISTRY_DIR
 
 
 _cache = {}
@@ -29,8 +31,10 @@ print("Training XGBoost model with *minimal* API calls...")
 BASE_COORDS = 20        # only 20 real locations
 AUG_PER_COORD = 10      # 10 synthetic variations per location
 # Total training samples = BASE_COORDS * AUG_PER_COORD = 200
+AUG_CHUNK = 100_000     # augmented rows generated/written per chunk
 
 base_samples = []       
+base_coords = []
 
 for i in range(BASE_COORDS):
     if i % 5 == 0:
@@ -40,11 +44,11 @@ for i in range(BASE_COORDS):
     lon = random.uniform(68.0, 97.0)
 
 
-    rainfall_score, _ = safe_call(estimate_rainfall_score, lat, lon, fallback=(70.0, 150))
+    rainfall_score = safe_call(estimate_rainfall_score, lat, lon, fallback=(70.0, 150, None))[0]
     landslide_score = safe_call(estimate_landslide_risk_score, lat, lon, fallback=70.0)
     proximity_score = safe_call(compute_proximity_score, lat, lon, fallback=60.0)
     water_score, _ = safe_call(estimate_water_proximity_score, lat, lon, fallback=(75.0, 2.0))
-    pollution_score = safe_call(estimate_pollution_score, lat, lon, fallback=65.0)
+    pollution_score = (safe_call(estimate_pollution_score, lat, lon, fallback=None) or (65.0,))[0]
     landuse_score = safe_call(infer_landuse_score, lat, lon, fallback=70.0)
 
     flood_score = estimate_flood_risk_score(lat, lon) or 50.0
@@ -62,63 +66,38 @@ for i in range(BASE_COORDS):
     ]
 
     base_samples.append(base_features)
+    base_coords.append((lat, lon))
 
 print(f"Collected {len(base_samples)} base locations (real API calls done).")
 print("Now augmenting without more API calls...")
 
+# Persist the real samples so later runs can retrain/evaluate against them.
+base_X = np.array(base_samples, dtype=float)
+base_latlon = np.array(base_coords, dtype=float).reshape(-1, 2)
+append_rows(base_X, score_matrix(base_X), base_latlon[:, 0], base_latlon[:, 1], source="api")
+
 # -----------------------------------
 # STEP 2: AUGMENT (NO API CALLS HERE)
 # -----------------------------------
-X, y = [], []
-
-def jitter(v, sigma=5.0):
-    """Add small noise, keep in [0,100]."""
-    if v is None:
-        return None
-    noisy = v + random.gauss(0, sigma)
-    return max(0.0, min(100.0, noisy))
-
-for idx, base in enumerate(base_samples):
-    if idx % 5 == 0:
-        print(f"   → Augmenting {idx+1}/{len(base_samples)}")
-
-    for _ in range(AUG_PER_COORD):
-        rain_n   = jitter(base[0])
-        flood_n  = jitter(base[1])
-        land_n   = jitter(base[2])
-        soil_n   = jitter(base[3])
-        prox_n   = jitter(base[4])
-        water_n  = jitter(base[5])
-        poll_n   = jitter(base[6])
-        lu_n     = jitter(base[7])
-
-        features = [
-            rain_n,
-            flood_n,
-            land_n,
-            soil_n,
-            prox_n,
-            water_n,
-            poll_n,
-            lu_n
-        ]
-        X.append(features)
-
-        agg = compute_suitability_score(
-            rainfall_score=rain_n,
-            flood_risk_score=flood_n,
-            landslide_risk_score=land_n,
-            soil_quality_score=soil_n,
-            proximity_score=prox_n,
-            water_proximity_score=water_n,
-            pollution_score=poll_n,
-            landuse_score=lu_n,
-        )
-        y.append(agg["score"])
-
-X, y = np.array(X, dtype=float), np.array(y, dtype=float)
-
-print(f"Total training samples: {len(X)}")  
+# Jittered copies are generated and appended in NumPy chunks, then read back
+# memory-mapped, so the row count is bounded by disk rather than RAM.
+rng = np.random.default_rng()
+sigma = 5.0
+total_aug = len(base_X) * AUG_PER_COORD
+base_idx = np.repeat(np.arange(len(base_X)), AUG_PER_COORD)
+
+for lo in range(0, total_aug, AUG_CHUNK):
+    idx = base_idx[lo:lo + AUG_CHUNK]
+    print(f"   → Augmenting rows {lo + 1}-{lo + len(idx)}/{total_aug}")
+    noisy = np.clip(base_X[idx] + rng.normal(0.0, sigma, size=(len(idx), base_X.shape[1])), 0.0, 100.0)
+    append_rows(noisy, score_matrix(noisy), base_latlon[idx, 0], base_latlon[idx, 1], source="augmented")
+
+ds = load_dataset()
+# Locations held out for ml/incremental_train.py's evaluation are never trained on.
+train_rows = np.flatnonzero(~holdout_mask(ds["latitude"], ds["longitude"], HOLDOUT_FRACTION))
+X, y = ds["features"][train_rows], ds["label"][train_rows]
+
+print(f"Total training samples: {len(X)} (dataset: {DEFAULT_DATASET_DIR})")  
 # STEP 3: TRAIN XGBOOST
 model = xgb.XGBRegressor(
     n_estimators=200,
@@ -128,13 +107,18 @@ model = xgb.XGBRegressor(
 )
 model.fit(X, y)
 
-# Save model
+train_r2 = model.score(X, y)
+
+# Save model: publish a new registry version (running servers swap it in) and
+# keep the legacy pickle for servers without a registry.
+version = publish("suitability", model, {"train_r2": train_r2, "samples": len(X), "dataset_rows": len(ds["label"]), "dataset": DEFAULT_DATASET_DIR})
 os.makedirs("backend/ml", exist_ok=True)
 model_path = "backend/ml/model_xgboost.pkl"
 pickle.dump(model, open(model_path, "wb"))
 
 print("\nMODEL TRAINED SUCCESSFULLY!")
-print(f"R² Score (train): {model.score(X, y):.4f}")
+print(f"R² Score (train): {train_r2:.4f}")
+print(f"Model published: suitability/{version} ({DEFAULT_REGISTRY_DIR})")
 print(f"Model saved: {model_path}")
 print(f"File size: {os.path.getsize(model_path)/1024:.1f} KB")
 
@@ -0,0 +1,130 @@
+"""
+Low-overhead sampling profiler for the running service.
+
+A daemon thread snapshots every thread's Python stack with
+``sys._current_frames()`` at a fixed interval and counts identical stacks.
+Nothing is hooked into the profiled code; the only cost is the sampler's
+own stack walks, so it can be switched on against live traffic. Output is the collapsed-stack format
+("thread;outer;...;inner count" per line) read by flamegraph.pl, speedscope
+and most flame-graph viewers.
+
+Under serve.py each worker process is profiled separately: a request lands
+on one worker, which profiles itself.
+"""
+
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+# Leaf functions of threads parked waiting for work; excluded unless asked for.
+_IDLE_LEAVES = {"wait", "_wait_for_tstate_lock", "select", "poll", "accept", "_worker"}
+
+_active_lock = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}.{code.co_name}:{frame.f_lineno}"
+
+
+class SamplingProfiler:
+    """Samples stacks of all threads (or those accepted by ``thread_filter``)."""
+
+    def __init__(self, interval_s: float = 0.005, include_idle: bool = False,
+                 thread_filter: Optional[Callable[[int, str], bool]] = None):
+        self.interval_s = max(interval_s, 0.001)
+        self.include_idle = include_idle
+        self.thread_filter = thread_filter
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at: Optional[float] = None
+        self.duration_s = 0.0
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        names: Dict[int, str] = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            name = names.get(ident, str(ident))
+            if self.thread_filter is not None and not self.thread_filter(ident, name):
+                continue
+            if not self.include_idle and frame.f_code.co_name in _IDLE_LEAVES:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(name)
+            self.stacks[";".join(reversed(labels))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        next_at = time.perf_counter()
+        while not self._stop.is_set():
+            self._sample()
+            next_at += self.interval_s
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                next_at = time.perf_counter()  # fell behind; do not burst
+
+    def start(self) -> "SamplingProfiler":
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="geoai-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.started_at is not None:
+            self.duration_s = time.perf_counter() - self.started_at
+        return self
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, most frequent first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+@contextmanager
+def profile_slot():
+    """Claim the process's single profiling slot for the block; yields False
+    (holding nothing) if another profile is in progress."""
+    acquired = _active_lock.acquire(blocking=False)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            _active_lock.release()
+
+
+def profile_for(seconds: float, interval_s: float = 0.005, include_idle: bool = False) -> SamplingProfiler:
+    """Profile the whole process for ``seconds``. One profile runs at a time;
+    raises RuntimeError if another is in progress."""
+    with profile_slot() as acquired:
+        if not acquired:
+            raise RuntimeError("a profile is already running")
+        profiler = SamplingProfiler(interval_s, include_idle).start()
+        time.sleep(seconds)
+        return profiler.stop()
+
+
+def request_thread_filter(ident: int, pool_prefixes=("geoai-factor", "geoai-refresh")) -> Callable[[int, str], bool]:
+    """Filter for profiling one request: its own thread plus the factor pools
+    it fans out to (which concurrent requests may also be using)."""
+    return lambda tid, name: tid == ident or name.startswith(pool_prefixes)
@@ -0,0 +1,125 @@
+"""
+Top-k site ranking with bound-based pruning.
+
+Candidates are ranked by the weighted suitability score
+(integrations.aggregator): a weighted sum of eight 0-100 factors. Until all
+of a candidate's factors are known its score lies between
+
+    lower = sum(w * known) + sum(w * 0   for unknown factors)
+    upper = sum(w * known) + sum(w * 100 for unknown factors)
+
+and once k candidates have a lower bound of at least t, any candidate whose
+upper bound is below t can never enter the top k. Factors are evaluated in
+stages, cheapest first (values already cached or stored cost nothing, then
+local rasters, then single upstream calls, then Overpass); within a stage
+the most promising candidates go first, and candidates are dropped between
+batches as soon as their upper bound falls below the current threshold, so
+the expensive upstream calls are only made for sites still in contention.
+"""
+
+from collections import Counter
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from integrations import FACTOR_ORDER, score_matrix
+from integrations.aggregator import weight_vector
+from integrations.request_context import submit_in_context
+
+
+def kth_largest(values: np.ndarray, k: int) -> float:
+    if len(values) < k:
+        return -np.inf
+    return float(np.partition(values, len(values) - k)[len(values) - k])
+
+
+def rank_sites(
+    lats,
+    lons,
+    k: int,
+    stages: Sequence[str],
+    evaluate: Callable[[str, float, float], Tuple[Optional[float], bool, bool]],
+    known: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None,
+    executor=None,
+    weights: Optional[Dict[str, float]] = None,
+    batch_size: int = 64,
+    prefetch: Optional[Callable[[str, np.ndarray, np.ndarray], Any]] = None,
+    veto_factors: Sequence[str] = (),
+) -> dict:
+    """Top ``k`` candidates by weighted score.
+
+    ``stages`` lists factor names in evaluation order; names outside
+    FACTOR_ORDER are veto-only checks (e.g. the water mask). ``evaluate(name,
+    lat, lon)`` returns (score or None on failure, vetoed, degraded); failed
+    factors count as the neutral 50, vetoed candidates score 0. ``known``
+    returns an (N, 8) matrix of already-available scores (NaN = unknown).
+    ``prefetch(name, lats, lons)``, when given, runs before each batch of a
+    stage so batch-capable upstreams can answer the whole batch at once.
+    Known scores of ``veto_factors`` are ignored: a score alone does not
+    tell whether the value behind it vetoes the site, so those factors are
+    always evaluated for candidates still in contention.
+    """
+    lats = np.asarray(lats, dtype=np.float64).reshape(-1)
+    lons = np.asarray(lons, dtype=np.float64).reshape(-1)
+    n = len(lats)
+    w = weight_vector(weights)
+    F = known(lats, lons) if known is not None else np.full((n, len(FACTOR_ORDER)), np.nan)
+    F = np.where(np.isnan(F), np.nan, np.clip(F, 0.0, 100.0))
+    F[:, [FACTOR_ORDER.index(name) for name in veto_factors if name in FACTOR_ORDER]] = np.nan
+    from_cache = int(np.count_nonzero(~np.isnan(F)))
+    vetoed = np.zeros(n, dtype=bool)
+    evaluations: Counter = Counter()
+    degraded = 0
+
+    def _bounds():
+        unknown = np.isnan(F)
+        lower = np.where(unknown, 0.0, F) @ w
+        upper = lower + unknown @ (w * 100.0)
+        lower[vetoed] = 0.0
+        upper[vetoed] = 0.0
+        return lower, upper
+
+    def _run(name, batch):
+        if executor is None:
+            return [evaluate(name, lats[i], lons[i]) for i in batch]
+        futures = [submit_in_context(executor, evaluate, name, lats[i], lons[i]) for i in batch]
+        return [f.result() for f in futures]
+
+    for name in stages:
+        col = FACTOR_ORDER.index(name) if name in FACTOR_ORDER else None
+        _, upper = _bounds()
+        todo = np.flatnonzero(~vetoed & (np.isnan(F[:, col]) if col is not None else True))
+        todo = todo[np.argsort(-upper[todo], kind="stable")]
+        for start in range(0, len(todo), batch_size):
+            lower, upper = _bounds()
+            threshold = kth_largest(lower, k)
+            batch = [int(i) for i in todo[start:start + batch_size] if not vetoed[i] and upper[i] >= threshold]
+            if not batch:
+                continue
+            if prefetch is not None:
+                prefetch(name, lats[batch], lons[batch])
+            for i, (score, veto, was_degraded) in zip(batch, _run(name, batch)):
+                evaluations[name] += 1
+                degraded += int(was_degraded)
+                if veto:
+                    vetoed[i] = True
+                elif col is not None:
+                    F[i, col] = 50.0 if score is None else min(max(float(score), 0.0), 100.0)
+
+    lower, upper = _bounds()
+    threshold = kth_largest(lower, k)
+    complete = ~np.isnan(F).any(axis=1) | vetoed
+    contenders = np.flatnonzero(complete & (upper >= threshold))
+    scores = np.where(vetoed, 0.0, score_matrix(F, weights))
+    top = contenders[np.argsort(-scores[contenders], kind="stable")][:k]
+    return {
+        "top": top,
+        "scores": scores[top],
+        "factors": F[top],
+        "vetoed": vetoed[top],
+        "candidates": n,
+        "pruned": int(n - len(contenders)),
+        "from_cache": from_cache,
+        "evaluations": dict(evaluations),
+        "degraded_evaluations": degraded,
+    }
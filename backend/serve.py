@@ -0,0 +1,148 @@
+"""
+Production entry point: a pre-forking gunicorn server for the Flask app.
+
+The app, the ML model and the read-only local data (rasters, water mask,
+station and landslide indexes) are loaded once in the master before the
+workers are forked, so every worker shares those pages copy-on-write
+instead of holding its own copy. Nothing starts a thread before the fork.
+Periodic data syncs run in one worker, whichever holds the sync lock
+(GEOAI_SYNC_LOCK); if it exits, its replacement takes the lock over. The
+other workers pick up the rewritten store files (see
+integrations/background.ReloadingStore).
+
+    python serve.py                       # GEOAI_WORKERS x GEOAI_THREADS
+    GEOAI_WORKERS=8 GEOAI_THREADS=16 python serve.py
+
+Configuration (environment):
+    GEOAI_BIND            address to listen on (default 0.0.0.0:5000)
+    GEOAI_WORKERS         worker processes (default: CPU count)
+    GEOAI_THREADS         request threads per worker (default 8)
+    GEOAI_WORKER_TIMEOUT  seconds before a stuck worker is replaced (default 120)
+    GEOAI_GRACEFUL_TIMEOUT seconds workers get to finish requests on reload/stop (default 30)
+    GEOAI_SYNC_LOCK       lock file electing the worker that runs the data syncs
+                          (default <tmp>/geoai-sync.lock)
+
+Graceful reload: `kill -HUP <master pid>` replaces the workers one set at a
+time; in-flight requests finish first. A new model version needs no restart:
+publish it (ml/registry.py) and workers swap it in within GEOAI_MODEL_CHECK_S,
+or force it with POST /admin/model/reload or `kill -USR2 <worker pid>` (not
+the master, where USR2 means a binary upgrade). With gunicorn missing (e.g. on
+Windows) this falls back to the threaded Flask server.
+"""
+
+import gc
+import logging
+import multiprocessing
+import os
+import tempfile
+
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+logger = logging.getLogger("geoai.serve")
+
+SYNC_LOCK_PATH = os.getenv("GEOAI_SYNC_LOCK", os.path.join(tempfile.gettempdir(), "geoai-sync.lock"))
+
+# Open while this process holds the sync lock; flock is released with it.
+_sync_lock_file = None
+
+
+def server_settings() -> dict:
+    return {
+        "bind": os.getenv("GEOAI_BIND", "0.0.0.0:5000"),
+        "workers": int(os.getenv("GEOAI_WORKERS", str(multiprocessing.cpu_count()))),
+        "threads": int(os.getenv("GEOAI_THREADS", "8")),
+        "worker_class": "gthread",
+        "timeout": int(os.getenv("GEOAI_WORKER_TIMEOUT", "120")),
+        "graceful_timeout": int(os.getenv("GEOAI_GRACEFUL_TIMEOUT", "30")),
+        "preload_app": True,
+    }
+
+
+def preload():
+    """Import the app and load everything read-only before forking."""
+    import app as appmod
+    from integrations import preload_local_data
+
+    try:
+        # Unpickle only: running a prediction here would start the OpenMP
+        # thread pool in the master, which does not survive fork().
+        appmod._get_ml_model()
+    except Exception as e:
+        logger.warning(f"Model not preloaded ({e}); workers load it on first use")
+    preload_local_data()
+    # Keep the preloaded objects out of later collections: the GC touching
+    # their headers would un-share the pages in every worker.
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+    return appmod
+
+
+def claim_sync_lock() -> bool:
+    """Try to become the process that runs the data syncs: a non-blocking
+    exclusive flock on SYNC_LOCK_PATH, held until the process exits."""
+    global _sync_lock_file
+    import fcntl
+
+    if _sync_lock_file is not None:
+        return True
+    f = open(SYNC_LOCK_PATH, "a")
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    _sync_lock_file = f
+    return True
+
+
+def post_fork(server, worker):
+    """MongoClient is not fork-safe: give each worker its own connection."""
+    import app as appmod
+    from integrations import configure_rate_limits, configure_result_memo
+
+    appmod.client, appmod.db, appmod.collection = appmod.get_mongo_connection()
+    configure_rate_limits(mongo_collection=appmod.db["rate_limits"])
+    configure_result_memo(appmod.db["suitability_results"], enabled=os.getenv("GEOAI_RESULT_MEMO", "1") == "1")
+    # Each worker saves its own factor store cells (merged on disk); one runs the syncs
+    syncs = claim_sync_lock()
+    if syncs:
+        logger.info(f"Worker {os.getpid()} runs the data syncs")
+    appmod.start_background_jobs(syncs=syncs)
+
+
+def post_worker_init(worker):
+    """Runs after gunicorn reset the worker's signal handlers."""
+    import app as appmod
+
+    appmod.install_reload_signal()
+
+
+def main():
+    appmod = preload()
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        logger.warning("gunicorn not installed; falling back to the threaded Flask server")
+        host, _, port = os.getenv("GEOAI_BIND", "0.0.0.0:5000").rpartition(":")
+        appmod.start_background_jobs()
+        appmod.app.run(debug=False, host=host or "0.0.0.0", port=int(port), use_reloader=False, threaded=True)
+        return
+
+    class GeoAIServer(BaseApplication):
+        def load_config(self):
+            for key, value in server_settings().items():
+                self.cfg.set(key, value)
+            self.cfg.set("post_fork", post_fork)
+            self.cfg.set("post_worker_init", post_worker_init)
+
+        def load(self):
+            return appmod.app
+
+    settings = server_settings()
+    logger.info(f"Starting GeoAI on {settings['bind']}: {settings['workers']} workers x {settings['threads']} threads")
+    GeoAIServer().run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from area_scoring import score_area
+from integrations import FACTOR_ORDER
+
+
+def _diamond(lon, lat, r):
+    return [[[lon - r, lat], [lon, lat - r], [lon + r, lat], [lon, lat + r], [lon - r, lat]]]
+
+
+def _corner(lon, lat, d):
+    return [[[lon, lat], [lon + d, lat], [lon, lat + d], [lon, lat]]]
+
+
+def test_refinement_stops_when_no_child_is_inside():
+    # Small diamonds at the centres of a 2x2 coarse grid over [0, 2]²: every
+    # child of a split falls outside, so no split can add samples.
+    geometry = {
+        "type": "MultiPolygon",
+        "coordinates": [_diamond(x, y, 0.1) for x in (0.5, 1.5) for y in (0.5, 1.5)]
+                       + [_corner(0.0, 0.0, 0.01), _corner(2.0, 2.0, -0.01)],
+    }
+    calls = []
+
+    def factor_fn(lat, lon):
+        calls.append((lat, lon))
+        return {name: lat * 50.0 for name in FACTOR_ORDER}
+
+    result = score_area(geometry, factor_fn, lambda F: F.mean(axis=1), initial_grid=2, max_samples=50)
+    assert result["samples"] == 4
+    assert result["refined_cells"] == 0
+    assert len(calls) == 4
+    assert np.isclose(result["score"]["min"], 25.0) and np.isclose(result["score"]["max"], 75.0)
@@ -0,0 +1,135 @@
+"""
+Throughput benchmark for the /suitability endpoint.
+
+Against a running server:
+  python tools/bench_server.py --url http://localhost:5000 --requests 2000 --concurrency 64
+
+Scaling sweep: starts serve.py once per worker count, measures, stops it and
+prints requests/s per worker count with the speed-up over one worker:
+  python tools/bench_server.py --sweep 1,2,4,8 --requests 2000 --concurrency 64
+
+Points are drawn from --bbox. To measure the server rather than the public
+upstream APIs, pre-warm the bbox first (tools/prewarm.py) or pass a small
+--deadline-ms so slow factors degrade instead of dominating the timings.
+"""
+
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import signal
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_load(url: str, n_requests: int, concurrency: int, bbox, deadline_ms: Optional[float], seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    west, south, east, north = bbox
+    payloads = []
+    for _ in range(n_requests):
+        body = {"latitude": rng.uniform(south, north), "longitude": rng.uniform(west, east)}
+        if deadline_ms:
+            body["deadline_ms"] = deadline_ms
+        payloads.append(body)
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+
+    def _one(body):
+        t = time.perf_counter()
+        try:
+            ok = session.post(f"{url}/suitability", json=body, timeout=120).status_code == 200
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - t, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(_one, payloads))
+    elapsed = time.perf_counter() - started
+    latencies = np.array([r[0] for r in results]) * 1000.0
+    return {
+        "requests": n_requests,
+        "errors": sum(1 for r in results if not r[1]),
+        "seconds": elapsed,
+        "rps": n_requests / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout_s: float = 120.0) -> None:
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            if requests.get(f"{url}/health", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("server did not become ready")
+
+
+def sweep(worker_counts: List[int], port: int, threads: int, args) -> List[dict]:
+    rows = []
+    url = f"http://127.0.0.1:{port}"
+    for workers in worker_counts:
+        env = dict(os.environ, GEOAI_WORKERS=str(workers), GEOAI_THREADS=str(threads), GEOAI_BIND=f"127.0.0.1:{port}")
+        proc = subprocess.Popen([sys.executable, os.path.join(BACKEND_DIR, "serve.py")], env=env, cwd=BACKEND_DIR)
+        try:
+            _wait_ready(url, proc)
+            run_load(url, min(args.concurrency * 2, args.requests), args.concurrency, args.bbox, args.deadline_ms, seed=1)  # warm-up
+            row = run_load(url, args.requests, args.concurrency, args.bbox, args.deadline_ms)
+            row["workers"] = workers
+            rows.append(row)
+            print(f"workers={workers:3d}  {row['rps']:8.1f} req/s  p50={row['p50_ms']:.0f}ms  p95={row['p95_ms']:.0f}ms  errors={row['errors']}", flush=True)
+        finally:
+            proc.send_signal(signal.SIGTERM)
+            try:
+                proc.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000", help="server to load (ignored with --sweep)")
+    parser.add_argument("--sweep", help="comma-separated worker counts to start serve.py with")
+    parser.add_argument("--port", type=int, default=5055, help="port for --sweep servers")
+    parser.add_argument("--threads", type=int, default=8, help="threads per worker for --sweep servers")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--bbox", default="78.3,17.3,78.6,17.5", help="W,S,E,N to draw points from")
+    parser.add_argument("--deadline-ms", type=float, help="deadline_ms sent with every request")
+    args = parser.parse_args(argv)
+    args.bbox = tuple(float(v) for v in args.bbox.split(","))
+
+    if not args.sweep:
+        row = run_load(args.url, args.requests, args.concurrency, args.bbox, args.deadline_ms)
+        print(f"{row['rps']:.1f} req/s  p50={row['p50_ms']:.0f}ms  p95={row['p95_ms']:.0f}ms  "
+              f"p99={row['p99_ms']:.0f}ms  errors={row['errors']}/{row['requests']}")
+        return
+
+    rows = sweep([int(w) for w in args.sweep.split(",")], args.port, args.threads, args)
+    if rows:
+        base = rows[0]["rps"] / rows[0]["workers"]
+        print("\nworkers   req/s   speed-up  efficiency")
+        for row in rows:
+            speedup = row["rps"] / rows[0]["rps"]
+            print(f"{row['workers']:7d} {row['rps']:7.1f} {speedup:9.2f}x {row['rps'] / (base * row['workers']):10.0%}")
+
+
+if __name__ == "__main__":
+    main()
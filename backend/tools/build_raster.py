@@ -0,0 +1,153 @@
+"""
+Convert a source raster into the memory-mapped GridRaster format used by the
+local adapters (see integrations/raster.py).
+
+Supported inputs:
+  - ESRI ASCII grid (.asc)
+  - NumPy array (.npy, row 0 = north) together with --bounds
+  - GeoTIFF and anything else GDAL reads, if `rasterio` is installed
+
+Example (soil quality, SoilGrids-style values mapped onto 0-100):
+  python tools/build_raster.py soil.tif --rescale 0:80 --output data/rasters/soil_quality
+
+Example (flood hazard, water depth 0-2 m mapped onto hazard 0-100, 1° tiles):
+  python tools/build_raster.py flood_rp100.tif --rescale 0:2 --tile-deg 1 --output data/rasters/flood_hazard
+
+Example (land/water bit mask from surface-water occurrence %, water where >= 50):
+  python tools/build_raster.py occurrence.tif --mask-min 50 --output data/rasters/water_mask
+"""
+
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from typing import Optional, Tuple
+
+import numpy as np
+
+from integrations.raster import write_bitmask, write_raster, write_tiled_raster
+
+
+def read_ascii_grid(path: str) -> Tuple[np.ndarray, dict]:
+    header = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for _ in range(6):
+            pos = f.tell()
+            parts = f.readline().split()
+            if len(parts) != 2 or parts[0][0].isdigit() or parts[0][0] == "-":
+                f.seek(pos)
+                break
+            header[parts[0].lower()] = float(parts[1])
+        data = np.loadtxt(f, dtype=np.float64)
+    rows, cols = int(header["nrows"]), int(header["ncols"])
+    data = data.reshape(rows, cols)
+    res = header["cellsize"]
+    west = header.get("xllcorner", header.get("xllcenter", 0.0) - res / 2)
+    south = header.get("yllcorner", header.get("yllcenter", 0.0) - res / 2)
+    return data, {
+        "west": west,
+        "north": south + rows * res,
+        "res_x": res,
+        "res_y": res,
+        "nodata": header.get("nodata_value"),
+    }
+
+
+def read_npy(path: str, bounds: str) -> Tuple[np.ndarray, dict]:
+    data = np.load(path)
+    west, south, east, north = (float(v) for v in bounds.split(","))
+    return data, {
+        "west": west,
+        "north": north,
+        "res_x": (east - west) / data.shape[1],
+        "res_y": (north - south) / data.shape[0],
+        "nodata": None,
+    }
+
+
+def read_rasterio(path: str) -> Tuple[np.ndarray, dict]:
+    try:
+        import rasterio
+    except ImportError:
+        raise SystemExit("rasterio is required for this input format (pip install rasterio)")
+    with rasterio.open(path) as src:
+        if src.crs and src.crs.to_epsg() not in (None, 4326):
+            raise SystemExit(f"{path}: expected EPSG:4326 lat/lon grid, got {src.crs}")
+        data = src.read(1)
+        t = src.transform
+        return data, {
+            "west": t.c,
+            "north": t.f,
+            "res_x": t.a,
+            "res_y": -t.e,
+            "nodata": src.nodata,
+        }
+
+
+def read_source(path: str, bounds: Optional[str]) -> Tuple[np.ndarray, dict]:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".asc":
+        return read_ascii_grid(path)
+    if ext == ".npy":
+        if not bounds:
+            raise SystemExit("--bounds W,S,E,N is required for .npy input")
+        return read_npy(path, bounds)
+    return read_rasterio(path)
+
+
+def rescale(data: np.ndarray, nodata, spec: str, invert: bool) -> Tuple[np.ndarray, float]:
+    """Linearly map [lo, hi] onto [0, 100] (clipped); no-data becomes NaN."""
+    lo, hi = (float(v) for v in spec.split(":"))
+    out = data.astype(np.float32)
+    mask = ~np.isfinite(out)
+    if nodata is not None:
+        mask |= data == nodata
+    out = np.clip((out - lo) / (hi - lo) * 100.0, 0.0, 100.0)
+    if invert:
+        out = 100.0 - out
+    out[mask] = np.nan
+    return out, None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="input raster (.asc, .npy, or GDAL format via rasterio)")
+    parser.add_argument("--output", required=True, help="output base path (writes <output>.json and <output>.bin)")
+    parser.add_argument("--bounds", help="W,S,E,N for .npy input")
+    parser.add_argument("--rescale", help="LO:HI source range mapped linearly onto 0-100")
+    parser.add_argument("--invert", action="store_true", help="with --rescale, map LO->100 and HI->0")
+    parser.add_argument("--dtype", default="float32", help="output dtype when not rescaling (default float32)")
+    parser.add_argument("--tile-deg", type=float, help="write a tiled raster directory with tiles of this size (degrees)")
+    parser.add_argument("--mask-min", type=float, help="write a bit-packed mask of cells with value >= this")
+    args = parser.parse_args(argv)
+
+    data, georef = read_source(args.source, args.bounds)
+    nodata = georef.pop("nodata")
+    if args.mask_min is not None:
+        mask = np.isfinite(data) & (data >= args.mask_min)
+        if nodata is not None:
+            mask &= data != nodata
+        write_bitmask(args.output, mask, source=os.path.basename(args.source), **georef)
+        print(f"Wrote {args.output}.bin ({mask.shape[0]}x{mask.shape[1]} bits, "
+              f"{os.path.getsize(args.output + '.bin') / 1024:.1f} KB, {mask.mean() * 100:.1f}% set)")
+        return
+
+    if args.rescale:
+        data, nodata = rescale(data, nodata, args.rescale, args.invert)
+    else:
+        data = data.astype(args.dtype)
+
+    if args.tile_deg:
+        tile_cells = max(1, int(round(args.tile_deg / georef["res_x"])))
+        count = write_tiled_raster(args.output, data, tile_cells=tile_cells, nodata=nodata,
+                                   source=os.path.basename(args.source), **georef)
+        print(f"Wrote {count} tiles of {tile_cells}x{tile_cells} cells to {args.output}/")
+        return
+
+    write_raster(args.output, data, nodata=nodata, source=os.path.basename(args.source), **georef)
+    print(f"Wrote {args.output}.bin ({data.shape[0]}x{data.shape[1]} {data.dtype}, "
+          f"{os.path.getsize(args.output + '.bin') / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Pre-fetch factor values for every cache cell in a bounding box, so the first
+click on any location there is answered from cache.
+
+Cells are enumerated per factor at that factor's cache resolution
+(integrations/cache.py). Each factor runs on its own small worker pool and
+every outbound request waits for its upstream host's rate budget
+(integrations/upstreams.py), so Overpass-bound factors queue politely while
+Open-Meteo ones keep going. The Overpass-backed factors (water, proximity)
+are not cached per cell but as features per tile
+(integrations/overpass_tiles.py): their "cells" are tiles, fetched in blocks
+with one bounding-box query per block of tiles and search radius. A tile is
+warmed out to the radii that a grid of sample points in it needs.
+Progress is checkpointed; re-running the same command resumes.
+
+Results go to the factor cache snapshot (data/stores/factor_cache.json) and
+the Overpass tile snapshot (data/stores/overpass_tiles.json), which the
+server loads at startup.
+
+Example (slow-changing factors over Hyderabad):
+  python tools/prewarm.py --bbox 78.2,17.2,78.7,17.6 --factors rainfall,pollution,landslide
+
+Example (road/water proximity for a small site, one Overpass worker):
+  python tools/prewarm.py --bbox 78.40,17.40,78.42,17.42 --factors proximity,water --workers 1
+"""
+
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import hashlib
+import json
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+
+from integrations.cache import (
+    CACHE_SNAPSHOT_PATH,
+    FACTOR_RESOLUTION_DEG,
+    FACTOR_SOFT_TTL_S,
+    FACTOR_TTL_S,
+    cached_factor,
+    cell_center,
+    factor_cache,
+    load_cache_snapshot,
+    save_cache_snapshot,
+)
+from integrations.overpass_batch import OVERPASS_LAYERS, TILE_SNAPSHOT_PATH, load_tile_snapshot, save_tile_snapshot
+from integrations.paths import get_data_path
+from integrations.pipeline import COST_LOCAL, FACTOR_SPECS
+from integrations.upstreams import FACTOR_UPSTREAMS, enable_rate_limits, set_max_queue_wait
+
+BBox = Tuple[float, float, float, float]
+
+# Sample points per tile side whose searches decide which radii a tile needs.
+TILE_SAMPLES = 4
+
+
+def _resolution(factor: str) -> float:
+    """Cache cell size, or tile size for the Overpass-backed factors."""
+    if factor in OVERPASS_LAYERS:
+        return OVERPASS_LAYERS[factor].tile_deg
+    return FACTOR_RESOLUTION_DEG.get(factor, 0.001)
+
+
+def _cell_range(factor: str, bbox: BBox) -> Tuple[int, int, int, int]:
+    west, south, east, north = bbox
+    res = _resolution(factor)
+    return (
+        int(math.floor(south / res)), int(math.floor(north / res)),
+        int(math.floor(west / res)), int(math.floor(east / res)),
+    )
+
+
+def count_cells(factor: str, bbox: BBox) -> int:
+    i0, i1, j0, j1 = _cell_range(factor, bbox)
+    return (i1 - i0 + 1) * (j1 - j0 + 1)
+
+
+def enumerate_cells(factor: str, bbox: BBox, start: int = 0) -> Iterator[Tuple[int, Tuple[str, int, int]]]:
+    """(index, cell key) in row-major order from ``start``."""
+    i0, i1, j0, j1 = _cell_range(factor, bbox)
+    width = j1 - j0 + 1
+    for n in range(start, count_cells(factor, bbox)):
+        yield n, (factor, i0 + n // width, j0 + n % width)
+
+
+class FactorProgress:
+    """Counts plus a low-water mark: every cell index below ``done`` is finished."""
+
+    def __init__(self, total: int, done: int = 0):
+        self.total = total
+        self.done = done
+        self.fetched = 0
+        self.cached = 0
+        self.failed = 0
+        self._finished = set()
+        self._lock = threading.Lock()
+
+    def finish(self, index: int, outcome: str) -> None:
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self._finished.add(index)
+            while self.done in self._finished:
+                self._finished.discard(self.done)
+                self.done += 1
+
+    @property
+    def processed(self) -> int:
+        return self.fetched + self.cached + self.failed
+
+
+def _is_fresh(key) -> bool:
+    if key[0] in OVERPASS_LAYERS:
+        tiles = OVERPASS_LAYERS[key[0]]
+        return tiles.get((key[1], key[2], tiles.radii_m[0])) is not None
+    item = factor_cache.get_item(key)
+    if item is None:
+        return False
+    soft = FACTOR_SOFT_TTL_S.get(key[0], FACTOR_TTL_S.get(key[0], 3600))
+    return time.time() - item[1] <= soft
+
+
+def _warm_cell(spec, key, index: int, progress: FactorProgress) -> None:
+    if _is_fresh(key):
+        progress.finish(index, "cached")
+        return
+    lat, lon = cell_center(key)
+    try:
+        cached_factor(spec.name, lat, lon, spec.compute)
+        outcome = "fetched" if factor_cache.get_item(key) is not None else "failed"
+    except Exception:
+        outcome = "failed"
+    progress.finish(index, outcome)
+
+
+def _warm_tiles(spec, cells, progress: FactorProgress) -> None:
+    """Fetch the features of a block of (index, key) tiles out to the radii
+    their sample points need, then finish each tile."""
+    tiles = OVERPASS_LAYERS[spec.name]
+    todo = []
+    for index, key in cells:
+        if _is_fresh(key):
+            progress.finish(index, "cached")
+        else:
+            todo.append((index, key))
+    if not todo:
+        return
+    steps = (np.arange(TILE_SAMPLES) + 0.5) / TILE_SAMPLES * tiles.tile_deg
+    lats, lons = [], []
+    for _, (_, row, col) in todo:
+        grid_lat, grid_lon = np.meshgrid(row * tiles.tile_deg + steps, col * tiles.tile_deg + steps)
+        lats.append(grid_lat.ravel())
+        lons.append(grid_lon.ravel())
+    try:
+        tiles.nearest_km(np.concatenate(lats), np.concatenate(lons))
+    except Exception as e:
+        print(f"{spec.name}: block of {len(todo)} tiles failed ({e})", flush=True)
+    for index, key in todo:
+        progress.finish(index, "fetched" if _is_fresh(key) else "failed")
+
+
+def _warm_factor(spec, bbox: BBox, progress: FactorProgress, workers: int, stop: threading.Event,
+                 batch_cells: int = 0) -> None:
+    """Feed one factor's cells (or blocks of ``batch_cells`` tiles, for
+    Overpass-backed factors) to its own pool, keeping at most 2x workers queued."""
+    tiled = spec.name in OVERPASS_LAYERS
+    batch_cells = max(batch_cells, 1) if tiled else 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"prewarm-{spec.name}") as pool:
+        pending = set()
+        block = []
+        for index, key in enumerate_cells(spec.name, bbox, progress.done):
+            if stop.is_set():
+                break
+            if tiled:
+                block.append((index, key))
+                if len(block) < batch_cells:
+                    continue
+                pending.add(pool.submit(_warm_tiles, spec, block, progress))
+                block = []
+            else:
+                pending.add(pool.submit(_warm_cell, spec, key, index, progress))
+            if len(pending) >= 2 * workers:
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+        if block and not stop.is_set():
+            pending.add(pool.submit(_warm_tiles, spec, block, progress))
+        wait(pending)
+
+
+def _checkpoint_path(bbox: BBox, factors) -> str:
+    digest = hashlib.sha1(json.dumps([bbox, sorted(factors)]).encode("utf-8")).hexdigest()[:12]
+    return get_data_path("stores", f"prewarm_{digest}.json")
+
+
+def _save_checkpoint(path: str, bbox: BBox, progress: Dict[str, FactorProgress]) -> None:
+    state = {
+        "bbox": list(bbox),
+        "factors": {name: {"done": p.done, "total": p.total} for name, p in progress.items()},
+        "saved_at": time.time(),
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+def _load_checkpoint(path: str) -> Dict[str, int]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {name: int(v["done"]) for name, v in (json.load(f).get("factors") or {}).items()}
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def _format_eta(seconds: float) -> str:
+    if not math.isfinite(seconds):
+        return "?"
+    h, rem = divmod(int(seconds), 3600)
+    return f"{h}h{rem // 60:02d}m" if h else f"{rem // 60}m{rem % 60:02d}s"
+
+
+def _report(progress: Dict[str, FactorProgress], started: float, resumed: int) -> None:
+    elapsed = max(time.time() - started, 1e-6)
+    total = sum(p.total for p in progress.values())
+    done = sum(p.done for p in progress.values())
+    rate = (done - resumed) / elapsed
+    eta = (total - done) / rate if rate > 0 else float("inf")
+    parts = " ".join(f"{name}={p.done}/{p.total}" for name, p in progress.items())
+    print(f"[{elapsed:7.0f}s] {done}/{total} cells  {rate:.2f} cells/s  ETA {_format_eta(eta)}  {parts}", flush=True)
+
+
+def main(argv=None):
+    remote = [s.name for s in FACTOR_SPECS if (s.cached or s.name in OVERPASS_LAYERS) and s.cost != COST_LOCAL]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bbox", required=True, help="W,S,E,N in degrees")
+    parser.add_argument("--factors", default=",".join(remote), help=f"comma-separated (default {','.join(remote)})")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent cells per factor (default 4)")
+    parser.add_argument("--batch-cells", type=int, default=100,
+                        help="tiles per prewarm block for water/proximity (default 100)")
+    parser.add_argument("--max-cells", type=int, default=200000, help="refuse to start above this many cells")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    parser.add_argument("--snapshot", default=CACHE_SNAPSHOT_PATH, help="factor cache snapshot to extend")
+    parser.add_argument("--tile-snapshot", default=TILE_SNAPSHOT_PATH, help="Overpass tile snapshot to extend")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args(argv)
+
+    bbox = tuple(float(v) for v in args.bbox.split(","))
+    if len(bbox) != 4 or bbox[0] >= bbox[2] or bbox[1] >= bbox[3]:
+        parser.error("--bbox must be W,S,E,N with W<E and S<N")
+    specs = {s.name: s for s in FACTOR_SPECS if s.cached or s.name in OVERPASS_LAYERS}
+    factors = [f.strip() for f in args.factors.split(",") if f.strip()]
+    unknown = [f for f in factors if f not in specs]
+    if unknown:
+        parser.error(f"unknown factors: {', '.join(unknown)}")
+
+    totals = {f: count_cells(f, bbox) for f in factors}
+    for f in factors:
+        hosts = ", ".join(FACTOR_UPSTREAMS.get(f, ())) or "local"
+        print(f"{f:10s} {totals[f]:8d} {'tiles' if f in OVERPASS_LAYERS else 'cells'} at {_resolution(f)}°  ({hosts})")
+    if sum(totals.values()) > args.max_cells:
+        parser.error(f"{sum(totals.values())} cells exceeds --max-cells {args.max_cells}; shrink the bbox or drop fine factors")
+
+    enable_rate_limits()
+    # Nobody is waiting on a prewarm call: queue for the token rather than fail.
+    set_max_queue_wait(60.0)
+    loaded = load_cache_snapshot(args.snapshot)
+    print(f"Loaded {loaded} cached cells from {args.snapshot}")
+    loaded = load_tile_snapshot(args.tile_snapshot)
+    print(f"Loaded {loaded} Overpass tiles from {args.tile_snapshot}")
+    checkpoint = _checkpoint_path(bbox, factors)
+    resume = {} if args.restart else _load_checkpoint(checkpoint)
+    progress = {f: FactorProgress(totals[f], min(resume.get(f, 0), totals[f])) for f in factors}
+    resumed = sum(p.done for p in progress.values())
+    if resumed:
+        print(f"Resuming from {checkpoint} ({resumed} cells already done)")
+
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=_warm_factor, args=(specs[f], bbox, progress[f], max(args.workers, 1), stop, args.batch_cells), daemon=True)
+        for f in factors
+    ]
+    started = time.time()
+    for t in threads:
+        t.start()
+    try:
+        while any(t.is_alive() for t in threads):
+            for t in threads:
+                t.join(timeout=args.report_every / len(threads))
+            _report(progress, started, resumed)
+            _save_checkpoint(checkpoint, bbox, progress)
+            save_cache_snapshot(args.snapshot)
+            save_tile_snapshot(args.tile_snapshot)
+    except KeyboardInterrupt:
+        print("Interrupted; finishing in-flight cells and saving progress...")
+        stop.set()
+        for t in threads:
+            t.join()
+    _report(progress, started, resumed)
+    _save_checkpoint(checkpoint, bbox, progress)
+    saved = save_cache_snapshot(args.snapshot)
+    saved_tiles = save_tile_snapshot(args.tile_snapshot)
+    for f, p in progress.items():
+        print(f"{f:10s} fetched={p.fetched} cached={p.cached} failed={p.failed}")
+    print(f"Wrote {saved} cells to {args.snapshot} and {saved_tiles} tiles to {args.tile_snapshot}")
+
+
+if __name__ == "__main__":
+    main()